@@ -1,20 +1,39 @@
 import os
 import re
+import hmac
+import json
+import time
 from dotenv import load_dotenv
 load_dotenv()
 
 import hub
+import home_feed
 import metadata_engine
 import yt_engine
-from flask import Flask, request, jsonify, send_file, Response, stream_with_context
+import upstream
+import provider_health
+import source_router
+import resolution_store
+import prefetch
+import deadline
+import tracing
+import ledger
+import profiling
+import memory
+import log
+import metrics
+from provider_health import ProviderUnavailable
+from deadline import DeadlineExceeded
+from cache_manager import SnapshotStore
+from flask import Flask, request, jsonify, send_file, Response, stream_with_context, g
 from flask_cors import CORS
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
-from urllib.parse import urlparse
-import requests as req_lib
+from urllib.parse import urlparse, quote
 from requests.exceptions import RequestException
 
 app = Flask(__name__)
+logger = log.get("api")
 
 # ── CORS ──────────────────────────────────────────────────────────────────────
 # Restrict to the known frontend origin; override via CORS_ORIGIN env var.
@@ -49,6 +68,45 @@ else:
         storage_uri="memory://",
     )
 
+# ── Snapshots ─────────────────────────────────────────────────────────────────
+# /api/category/* and /api/top-artists are served from snapshots materialized
+# by refresher.py, so request threads never rebuild them. A missing snapshot
+# is a 503 while the refresher warms up; in development (or with
+# SNAPSHOTS_ONLY=false) we build on demand instead.
+snapshots = SnapshotStore()
+SNAPSHOTS_ONLY = os.getenv("SNAPSHOTS_ONLY", "false" if DEV_MODE else "true").lower() == "true"
+
+def snapshot_response(name):
+    """Response for a snapshot, a 503 if it isn't ready, or None to build on demand."""
+    entry = snapshots.read(name)
+    if entry:
+        response = jsonify(entry['payload'])
+        response.headers['X-Snapshot-Age'] = str(int(time.time() - entry['generated_at']))
+        return response
+    if SNAPSHOTS_ONLY:
+        response = jsonify({"error": "Data is being prepared, try again shortly"})
+        response.status_code = 503
+        response.headers['Retry-After'] = '30'
+        return response
+    return None
+
+# ── Request Deadlines ─────────────────────────────────────────────────────────
+# Time budget for a whole /api/play or /api/search request. Every upstream
+# call made on its behalf gets only what is left (see deadline.py), so a slow
+# provider turns into a 504 well before Gunicorn's 120s worker timeout.
+PLAY_DEADLINE = float(os.getenv("PLAY_DEADLINE", "25"))
+SEARCH_DEADLINE = float(os.getenv("SEARCH_DEADLINE", "20"))
+
+def streaming_cors_headers():
+    """
+    Flask-CORS doesn't auto-inject into manually constructed streaming
+    Response objects, so streaming routes add the header themselves.
+    """
+    request_origin = request.headers.get("Origin", "")
+    if request_origin in _cors_origins:
+        return {"Access-Control-Allow-Origin": request_origin}
+    return {}
+
 # ── Security Headers ──────────────────────────────────────────────────────────
 @app.after_request
 def add_security_headers(response):
@@ -65,10 +123,131 @@ def add_security_headers(response):
     )
     return response
 
+# ── Admin Access ──────────────────────────────────────────────────────────────
+# Diagnostic endpoints (traces, ...) need `X-Admin-Token: <ADMIN_TOKEN>`.
+# Without ADMIN_TOKEN they are only open in development.
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+def is_admin():
+    if ADMIN_TOKEN:
+        return hmac.compare_digest(request.headers.get("X-Admin-Token", ""), ADMIN_TOKEN)
+    return DEV_MODE
+
+def _require_admin():
+    """None if the caller may use admin endpoints, otherwise the 403 response."""
+    if is_admin():
+        return None
+    return jsonify({"error": "Forbidden"}), 403
+
+# ── Tracing ───────────────────────────────────────────────────────────────────
+# A sampled share of API requests (TRACE_SAMPLE_RATE; admins can force one
+# with `X-Trace: 1`) records per-stage spans, see tracing.py. The trace is
+# finished on teardown, i.e. after a streamed body is fully sent.
+_UNTRACED_PREFIXES = ('/api/ping', '/api/trace', '/api/health', '/api/metrics', '/api/admin')
+
+@app.before_request
+def start_trace():
+    if request.method == 'OPTIONS' or not request.path.startswith('/api/'):
+        return
+    if request.path.startswith(_UNTRACED_PREFIXES):
+        return
+    if tracing.sampled(force=request.headers.get('X-Trace') == '1' and is_admin()):
+        tracing.start(f"{request.method} {request.path}", query=request.query_string.decode()[:200])
+
+@app.after_request
+def add_trace_header(response):
+    trace = tracing.current()
+    if trace:
+        response.headers["X-Trace-Id"] = trace.id
+    return response
+
+# ── Profiling ─────────────────────────────────────────────────────────────────
+# An admin's `X-Profile: 1` (or PROFILE_SAMPLE_RATE) runs the request under
+# cProfile, including hub's pool work; the .prof is served by /api/profile/<id>.
+@app.before_request
+def start_profile():
+    if request.method == 'OPTIONS' or not request.path.startswith('/api/'):
+        return
+    if request.path.startswith(_UNTRACED_PREFIXES + ('/api/profile',)):
+        return
+    if profiling.sampled(force=request.headers.get('X-Profile') == '1' and is_admin()):
+        profiling.start(f"{request.method} {request.full_path.rstrip('?')[:200]}")
+
+@app.after_request
+def add_profile_header(response):
+    session = profiling.current()
+    if session:
+        response.headers["X-Profile-Id"] = session.id
+    return response
+
+@app.teardown_request
+def finish_profile(exc):
+    profiling.finish()
+
+@app.before_request
+def sample_debug_logs():
+    # Runs after start_trace: traced requests always keep their DEBUG detail
+    log.sample_request(force=tracing.current() is not None)
+
+@app.teardown_request
+def finish_trace(exc):
+    tracing.finish()
+
+# ── Metrics ───────────────────────────────────────────────────────────────────
+# Request latency per route (see metrics.py). Observed on teardown so that
+# streamed responses (search, batch play, audio) count their full duration.
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def remember_status(response):
+    g.response_status = response.status_code
+    return response
+
+# ── Slow-request log / call budget ────────────────────────────────────────────
+# Every API request gets a ledger (see ledger.py): its outbound calls are
+# charged against OUTBOUND_CALL_BUDGET and slow requests are logged with
+# their calls and stages. Finished on teardown, before the trace is closed.
+def _request_query():
+    """The request's search/play query, normalized so slow-log entries group."""
+    data = request.get_json(silent=True) if request.is_json else None
+    raw = request.args.get('q')
+    if not raw and isinstance(data, dict):
+        raw = data.get('query') or data.get('search_term')
+    return resolution_store.normalize(str(raw))[:200] if raw else None
+
+@app.before_request
+def start_ledger():
+    if request.method == 'OPTIONS' or not request.path.startswith('/api/'):
+        return
+    if request.path.startswith(_UNTRACED_PREFIXES + ('/api/profile', '/api/slow')):
+        return
+    ledger.begin(f"{request.method} {request.url_rule.rule if request.url_rule else request.path}",
+                 _request_query())
+
+@app.teardown_request
+def finish_ledger(exc):
+    trace = tracing.current()
+    ledger.finish(status=g.get('response_status', 500), trace_id=trace.id if trace else None)
+
+@app.teardown_request
+def observe_request(exc):
+    started = g.pop('request_started', None)
+    if started is None:
+        return
+    metrics.observe(
+        "volt_http_request_duration_seconds", time.perf_counter() - started,
+        route=request.url_rule.rule if request.url_rule else "unmatched",
+        method=request.method,
+        status=g.get('response_status', 500),
+    )
+
 
 
 # ── Input Sanitisation ────────────────────────────────────────────────────────
 _MAX_QUERY_LEN = 200
+YOUTUBE_ID_RE = re.compile(r'^[A-Za-z0-9_-]{11}$')  # /api/stream ?v= (never a URL)
 
 def sanitize_query(q: str) -> str | None:
     """
@@ -91,30 +270,192 @@ def api_ping():
     """Health check endpoint - no rate limit"""
     return jsonify({"status": "ok"})
 
+@app.route('/api/health/providers', methods=['GET'])
+def api_provider_health():
+    """Circuit state, latency percentiles and current timeout per upstream (this worker). Admin only."""
+    denied = _require_admin()
+    if denied:
+        return denied
+    return jsonify({"providers": provider_health.snapshot()})
+
+@app.route('/api/health/routing', methods=['GET'])
+def api_routing_health():
+    """Learned play routing: per query class hit rate, latency and match score by source. Admin only."""
+    denied = _require_admin()
+    if denied:
+        return denied
+    return jsonify({"classes": source_router.snapshot()})
+
+@app.route('/api/metrics', methods=['GET'])
+def api_metrics():
+    """Prometheus metrics, summed over all Gunicorn workers. Admin only."""
+    denied = _require_admin()
+    if denied:
+        return denied
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/trace', methods=['GET'])
+def api_traces():
+    """Newest stored traces (id, name, start, duration). Admin only."""
+    denied = _require_admin()
+    if denied:
+        return denied
+    return jsonify({"traces": tracing.recent(int(request.args.get('limit', 50)))})
+
+@app.route('/api/trace/<trace_id>', methods=['GET'])
+def api_trace(trace_id):
+    """One trace as JSON, or as a text waterfall with ?format=text. Admin only."""
+    denied = _require_admin()
+    if denied:
+        return denied
+    trace = tracing.load(trace_id)
+    if not trace:
+        return jsonify({"error": "Trace not found"}), 404
+    if request.args.get('format') == 'text':
+        return Response(tracing.waterfall(trace), mimetype='text/plain')
+    return jsonify(trace)
+
+@app.route('/api/profile', methods=['GET'])
+def api_profiles():
+    """Newest stored request profiles (id, name, start, duration). Admin only."""
+    denied = _require_admin()
+    if denied:
+        return denied
+    return jsonify({"profiles": profiling.recent(int(request.args.get('limit', 50)))})
+
+_PROFILE_SORTS = ('cumulative', 'tottime', 'calls')
+
+@app.route('/api/profile/<profile_id>', methods=['GET'])
+def api_profile(profile_id):
+    """
+    One profile as a .prof download (open with snakeviz / pstats), or the
+    top functions as text with ?format=text&sort=cumulative|tottime|calls. Admin only.
+    """
+    denied = _require_admin()
+    if denied:
+        return denied
+    path = profiling.path(profile_id)
+    if not path:
+        return jsonify({"error": "Profile not found"}), 404
+    if request.args.get('format') == 'text':
+        sort = request.args.get('sort', 'cumulative')
+        if sort not in _PROFILE_SORTS:
+            return jsonify({"error": f"sort must be one of {', '.join(_PROFILE_SORTS)}"}), 400
+        return Response(profiling.summary(profile_id, sort=sort), mimetype='text/plain')
+    return send_file(os.path.abspath(path), mimetype='application/octet-stream',
+                     as_attachment=True, download_name=f"{profile_id}.prof")
+
+@app.route('/api/admin/memory', methods=['GET'])
+def api_admin_memory():
+    """
+    RSS of every worker, plus entry counts / approximate sizes of the
+    answering worker's caches (?sizes=0 skips the size walk). Admin only.
+    """
+    denied = _require_admin()
+    if denied:
+        return denied
+    return jsonify(memory.report(sizes=request.args.get('sizes') != '0'))
+
+@app.route('/api/admin/memory/tracemalloc', methods=['GET', 'POST'])
+def api_admin_tracemalloc():
+    """
+    GET: top allocation changes on the answering worker since the baseline
+    (?limit=25&rebase=1). POST {"action": "start"|"stop"} starts tracing and
+    takes the baseline, or stops it. Admin only.
+    """
+    denied = _require_admin()
+    if denied:
+        return denied
+    if request.method == 'POST':
+        action = (request.get_json(silent=True) or {}).get('action')
+        if action == 'start':
+            memory.start()
+        elif action == 'stop':
+            memory.stop()
+        else:
+            return jsonify({"error": "action must be start or stop"}), 400
+        return jsonify({"pid": os.getpid(), "tracing": action == 'start'})
+
+    stats = memory.diff(limit=min(int(request.args.get('limit', 25)), 200),
+                        rebase=request.args.get('rebase') == '1')
+    if stats is None:
+        return jsonify({"error": "tracemalloc is not running on this worker", "pid": os.getpid()}), 409
+    return jsonify({"pid": os.getpid(), "top": stats})
+
+@app.route('/api/slow', methods=['GET'])
+def api_slow_requests():
+    """Newest slow or over-budget requests with their upstream calls and stages. Admin only."""
+    denied = _require_admin()
+    if denied:
+        return denied
+    return jsonify({
+        "threshold_ms": ledger.SLOW_REQUEST_MS,
+        "requests": ledger.recent(int(request.args.get('limit', 50))),
+    })
+
 @app.route('/api/search', methods=['POST', 'GET'])
 @limiter.limit("60 per minute")
 def api_search():
-    """Search endpoint returning categorized JSON results"""
+    """
+    Search endpoint returning categorized JSON results.
+    Opt-in streaming (stream=1): newline-delimited JSON with one
+    {"category", "items"} line per category as it completes (songs first),
+    then {"done": true}. A repeated category replaces the earlier one.
+    """
     if request.method == 'POST':
         data = request.get_json() or {}
         raw_query = data.get('query', '')
         offset = int(data.get('offset', 0))
+        stream = bool(data.get('stream', False))
     else:  # GET
         raw_query = request.args.get('q', '')
         offset = int(request.args.get('offset', 0))
+        stream = request.args.get('stream') == '1'
 
     query = sanitize_query(raw_query)
     if not query:
         return jsonify({"error": "Query is required and must be ≤ 200 characters"}), 400
+    prefetch_owner = f"search:{get_remote_address()}"
+
+    if stream:
+        def generate():
+            # The budget starts with the body, not when the Response is built
+            try:
+                with deadline.scope(SEARCH_DEADLINE):
+                    for category, items in hub.search_hybrid_stream(query, offset=offset):
+                        if category == "songs" and items:
+                            prefetch.schedule(items[:prefetch.PREFETCH_SEARCH_TOP], prefetch_owner)
+                        yield json.dumps({"category": category, "items": items}) + "\n"
+                yield json.dumps({"done": True}) + "\n"
+            except DeadlineExceeded as e:
+                logger.warning("SEARCH: Deadline exceeded while streaming: %s", e)
+                yield json.dumps({"error": "Search took too long"}) + "\n"
+            except RequestException as e:
+                logger.warning("SEARCH: Connection lost while streaming: %s", e)
+                yield json.dumps({"error": "Backend could not reach music providers"}) + "\n"
+            except Exception as e:
+                logger.error("SEARCH: Unexpected error while streaming: %s", e)
+                yield json.dumps({"error": "Internal Server Error"}) + "\n"
+
+        return Response(
+            stream_with_context(generate()),
+            mimetype='application/x-ndjson',
+            headers=streaming_cors_headers()
+        )
 
     try:
-        results = hub.search_hybrid(query, categorized=True, offset=offset)
+        with deadline.scope(SEARCH_DEADLINE):
+            results = hub.search_hybrid(query, categorized=True, offset=offset)
+        prefetch.schedule(results.get('songs', [])[:prefetch.PREFETCH_SEARCH_TOP], prefetch_owner)
         return jsonify(results)
+    except DeadlineExceeded as e:
+        logger.warning("SEARCH: Deadline exceeded: %s", e)
+        return jsonify({"error": "Search took too long"}), 504
     except RequestException as e:
-        print(f"API SEARCH: Connection lost: {e}", flush=True)
+        logger.warning("SEARCH: Connection lost: %s", e)
         return jsonify({"error": "Backend could not reach music providers"}), 502
     except Exception as e:
-        print(f"API SEARCH: Unexpected error: {e}", flush=True)
+        logger.error("SEARCH: Unexpected error: %s", e)
         return jsonify({"error": "Internal Server Error"}), 500
 
 
@@ -130,23 +471,27 @@ def api_album(album_id):
     except RequestException as e:
         return jsonify({"error": "Failed to fetch album data"}), 502
     except Exception as e:
-        print(f"API ALBUM: Error: {e}")
+        logger.error("ALBUM: Error: %s", e)
         return jsonify({"error": "Internal Server Error"}), 500
 
 
 @app.route('/api/artist/<artist_name>', methods=['GET'])
 @limiter.limit("120 per minute")
 def api_artist(artist_name):
-    """Get artist songs"""
+    """Get artist songs (pass ?id=<iTunes artistId> for a precise lookup)"""
+    artist_id = request.args.get('id', '')
+    if not artist_id.isdigit():
+        artist_id = None
+
     try:
-        artist_data = metadata_engine.get_artist_songs(artist_name)
+        artist_data = metadata_engine.get_artist_songs(artist_name, artist_id=artist_id)
         if not artist_data:
             return jsonify({"error": "Artist not found"}), 404
         return jsonify(artist_data)
     except RequestException as e:
         return jsonify({"error": "Failed to fetch artist data"}), 502
     except Exception as e:
-        print(f"API ARTIST: Error: {e}")
+        logger.error("ARTIST: Error: %s", e)
         return jsonify({"error": "Internal Server Error"}), 500
 
 
@@ -154,6 +499,13 @@ def api_artist(artist_name):
 @limiter.limit("120 per minute")
 def api_category(category_id):
     """Get curated songs for a specific category"""
+    if category_id not in metadata_engine.CATEGORY_QUERIES:
+        return jsonify({"error": "Category not found"}), 404
+
+    snapshot = snapshot_response(f"category:{category_id}")
+    if snapshot is not None:
+        return snapshot
+
     try:
         category_data = metadata_engine.get_category_songs(category_id)
         if not category_data:
@@ -162,58 +514,191 @@ def api_category(category_id):
     except RequestException as e:
         return jsonify({"error": "Failed to fetch category data"}), 502
     except Exception as e:
-        print(f"API CATEGORY: Error: {e}")
+        logger.error("CATEGORY: Error: %s", e)
         return jsonify({"error": "Internal Server Error"}), 500
 
 @app.route('/api/top-artists', methods=['GET'])
 @limiter.limit("60 per minute")
 def api_top_artists():
     """Get curated top global artists"""
+    snapshot = snapshot_response("top_artists")
+    if snapshot is not None:
+        return snapshot
+
     try:
         artists_data = metadata_engine.get_top_global_artists()
         if not artists_data:
             return jsonify({"error": "Top artists not found"}), 404
         return jsonify(artists_data)
     except Exception as e:
-        print(f"API TOP ARTISTS: Error: {e}")
+        logger.error("TOP ARTISTS: Error: %s", e)
         return jsonify({"error": "Internal Server Error"}), 500
 
+@app.route('/api/home', methods=['GET'])
+@limiter.limit("30 per minute")
+def api_home():
+    """
+    All home-page sections in one response, each with freshness metadata
+    (status, generated_at, age_seconds, stale). Sections come from snapshots
+    only; one the refresher hasn't written yet is "pending" and is never
+    built on the request thread. ?stream=1 returns newline-delimited JSON,
+    one section per line, with ready sections first.
+    """
+    now = time.time()
+    entries = {name: snapshots.read(section["snapshot"]) for name, section in home_feed.SECTIONS.items()}
+
+    if request.args.get('stream') == '1':
+        def generate():
+            ordered = sorted(entries.items(), key=lambda item: item[1] is None)
+            for name, entry in ordered:
+                yield json.dumps(home_feed.section_entry(name, entry, now)) + "\n"
+
+        return Response(
+            stream_with_context(generate()),
+            mimetype='application/x-ndjson',
+            headers=streaming_cors_headers()
+        )
+
+    sections = {name: home_feed.section_entry(name, entry, now) for name, entry in entries.items()}
+    return jsonify({"sections": sections})
+
+def play_payload(search_term, resolution):
+    """{"stream_url", "source"} for a resolution, as /api/play returns it."""
+    source = resolution['source']
+    if source == 'youtube':
+        # Don't expose the raw expiring YT URL — return a proxy URL instead
+        proxy_url = f"/api/stream?q={quote(search_term)}"
+        if resolution.get('video_id'):
+            # Lets the proxy skip the YouTube search
+            proxy_url += f"&v={quote(resolution['video_id'])}"
+        return {"stream_url": proxy_url, "source": source}
+    return {"stream_url": resolution['url'], "source": source}
+
+def play_args(data):
+    """(search_term, artist, track_id) from a play request body, or None if invalid."""
+    search_term = sanitize_query(str(data.get('search_term') or ''))
+    if not search_term:
+        return None
+    artist_name = data.get('artist', None)  # Optional artist hint from frontend
+    if not isinstance(artist_name, str):
+        artist_name = None
+    track_id = str(data.get('track_id') or '')  # Optional iTunes trackId (resolution table key)
+    return search_term, artist_name, track_id if track_id.isdigit() else None
+
 @app.route('/api/play', methods=['POST'])
 @limiter.limit("20 per minute")
 def api_play():
     """Get audio stream URL for a song"""
-    data = request.get_json() or {}
-    raw_search_term = data.get('search_term', '')
-    artist_name = data.get('artist', None)  # Optional artist hint from frontend
-
-    search_term = sanitize_query(raw_search_term)
-    if not search_term:
+    args = play_args(request.get_json() or {})
+    if not args:
         return jsonify({"error": "search_term is required and must be ≤ 200 characters"}), 400
+    search_term, artist_name, track_id = args
 
     try:
-        stream_url, source = hub.get_audio_link(search_term, artist_name=artist_name)
+        with deadline.scope(PLAY_DEADLINE):
+            prefetch.join(search_term, artist_name, track_id)
+            resolution = hub.resolve_track(search_term, artist_name=artist_name, track_id=track_id)
 
-
-        if not stream_url:
+        if not resolution:
             return jsonify({"error": "Could not find audio stream"}), 404
-
-        if source == 'youtube':
-            # Don't expose the raw expiring YT URL — return a proxy URL instead
-            from urllib.parse import quote
-            proxy_url = f"/api/stream?q={quote(search_term)}"
-            return jsonify({"stream_url": proxy_url, "source": source})
-
-        return jsonify({
-            "stream_url": stream_url,
-            "source": source
-        })
+        return jsonify(play_payload(search_term, resolution))
+    except DeadlineExceeded as e:
+        logger.warning("PLAY: Deadline exceeded: %s", e)
+        return jsonify({"error": "Timed out resolving stream"}), 504
     except RequestException as e:
-        print(f"API PLAY: Connection error: {e}")
+        logger.warning("PLAY: Connection error: %s", e)
         return jsonify({"error": "Failed to resolve stream"}), 502
     except Exception as e:
-        print(f"API PLAY: Unexpected error: {e}")
+        logger.error("PLAY: Unexpected error: %s", e)
         return jsonify({"error": "Internal Server Error"}), 500
 
+# Matches the player's look-ahead window (BATCH_AHEAD in StickyPlayer.jsx);
+# with the 10/minute limit an IP can start at most 100 resolutions a minute
+PLAY_BATCH_MAX = int(os.getenv("PLAY_BATCH_MAX", "10"))
+PLAY_BATCH_DEADLINE = float(os.getenv("PLAY_BATCH_DEADLINE", "60"))
+PLAY_BATCH_CALLS_PER_TRACK = int(os.getenv("PLAY_BATCH_CALLS_PER_TRACK", "8"))
+
+def play_error(error):
+    """Client-facing message for a failed resolution (same wording as /api/play)."""
+    if isinstance(error, DeadlineExceeded):
+        return "Timed out resolving stream"
+    if isinstance(error, RequestException):
+        return "Failed to resolve stream"
+    logger.error("PLAY BATCH: Unexpected error: %s", error)
+    return "Internal Server Error"
+
+@app.route('/api/play/batch', methods=['POST'])
+@limiter.limit("10 per minute")
+def api_play_batch():
+    """
+    Resolves the next few tracks of a queue in one request: {"tracks":
+    [{search_term, artist, track_id}, ...]}, at most PLAY_BATCH_MAX. Streams newline-delimited JSON, one line per
+    track as it resolves — {"index", "stream_url", "source"} or {"index",
+    "error"} — then {"done": true}. Repeated tracks are resolved once.
+    """
+    data = request.get_json() or {}
+    tracks = data.get('tracks')
+    if not isinstance(tracks, list) or not tracks:
+        return jsonify({"error": "tracks must be a non-empty list"}), 400
+    if len(tracks) > PLAY_BATCH_MAX:
+        return jsonify({"error": f"At most {PLAY_BATCH_MAX} tracks per batch"}), 400
+
+    valid, invalid = [], []
+    for index, track in enumerate(tracks):
+        args = play_args(track) if isinstance(track, dict) else None
+        if args:
+            valid.append((index, args))
+        else:
+            invalid.append(index)
+    # The call budget scales with the batch (a single play needs a handful)
+    ledger.set_budget(PLAY_BATCH_CALLS_PER_TRACK * max(1, len(valid)))
+
+    def generate():
+        for index in invalid:
+            yield json.dumps({"index": index, "error": "search_term is required and must be ≤ 200 characters"}) + "\n"
+        with deadline.scope(PLAY_BATCH_DEADLINE):
+            for positions, resolution, error in hub.resolve_batch([args for _, args in valid]):
+                for position in positions:
+                    index, (search_term, _, _) = valid[position]
+                    if error:
+                        line = {"index": index, "error": play_error(error)}
+                    elif resolution:
+                        line = {"index": index, **play_payload(search_term, resolution)}
+                    else:
+                        line = {"index": index, "error": "Could not find audio stream"}
+                    yield json.dumps(line) + "\n"
+        yield json.dumps({"done": True}) + "\n"
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='application/x-ndjson',
+        headers=streaming_cors_headers()
+    )
+
+
+@app.route('/api/queue', methods=['POST'])
+@limiter.limit("60 per minute")
+def api_queue():
+    """
+    The player declares its upcoming tracks ({"tracks": [{search_term,
+    artist, track_id}, ...]}, next first); the first few are resolved in
+    the background so the next-track transition is a resolution table hit.
+    Each call replaces the client's previous queue.
+    """
+    data = request.get_json() or {}
+    tracks = data.get('tracks') or []
+    if not isinstance(tracks, list):
+        return jsonify({"error": "tracks must be a list"}), 400
+
+    songs = []
+    for track in tracks[:prefetch.PREFETCH_QUEUE_AHEAD]:
+        args = play_args(track) if isinstance(track, dict) else None
+        if args:
+            songs.append(dict(zip(("search_term", "artist", "track_id"), args)))
+
+    queued = prefetch.schedule(songs, f"queue:{get_remote_address()}")
+    return jsonify({"queued": queued})
+
 
 @app.route('/api/stream', methods=['GET'])
 @limiter.limit("30 per minute")
@@ -225,7 +710,12 @@ def api_stream():
         return jsonify({"error": "q is required and must be ≤ 200 characters"}), 400
 
     try:
-        stream_url = yt_engine.get_audio_link(search_term)
+        stream_url = None
+        video_id = request.args.get('v', '')
+        if YOUTUBE_ID_RE.match(video_id):
+            stream_url = yt_engine.get_stream_by_id(video_id)
+        if not stream_url:
+            stream_url = yt_engine.get_audio_link(search_term)
 
         if not stream_url:
             return jsonify({"error": "Could not resolve YouTube stream"}), 404
@@ -236,7 +726,7 @@ def api_stream():
         if range_header:
             headers['Range'] = range_header
 
-        yt_resp = req_lib.get(stream_url, headers=headers, stream=True, timeout=15)
+        yt_resp = upstream.get("youtube_cdn", stream_url, headers=headers, stream=True)
 
         response_headers = {
             'Content-Type': yt_resp.headers.get('Content-Type', 'audio/webm'),
@@ -247,29 +737,38 @@ def api_stream():
         if 'Content-Range' in yt_resp.headers:
             response_headers['Content-Range'] = yt_resp.headers['Content-Range']
 
-        # Manually inject CORS header for streaming Response (Flask-CORS
-        # doesn't auto-inject into manually constructed Response objects)
-        request_origin = request.headers.get("Origin", "")
-        if request_origin in _cors_origins:
-            response_headers["Access-Control-Allow-Origin"] = request_origin
+        response_headers.update(streaming_cors_headers())
 
         status_code = yt_resp.status_code  # 206 for partial, 200 for full
 
         def generate():
-            for chunk in yt_resp.iter_content(chunk_size=65536):
-                if chunk:
-                    yield chunk
+            metrics.gauge_add("volt_active_streams", 1)
+            try:
+                for chunk in yt_resp.iter_content(chunk_size=65536):
+                    if chunk:
+                        metrics.inc("volt_stream_bytes_total", len(chunk))
+                        yield chunk
+            except RequestException as e:
+                # A stall or reset after the headers: upstream.get has already
+                # returned, so the failure is recorded here
+                provider_health.get("youtube_cdn").record_failure(type(e).__name__)
+                logger.warning("STREAM: Upstream stalled mid-stream: %s", e)
+            finally:
+                metrics.gauge_add("volt_active_streams", -1)
 
         return Response(
             stream_with_context(generate()),
             status=status_code,
             headers=response_headers
         )
+    except ProviderUnavailable as e:
+        logger.warning("STREAM: %s", e)
+        return jsonify({"error": "YouTube is temporarily unavailable"}), 503, {"Retry-After": "30"}
     except RequestException as e:
-        print(f"API STREAM: Upstream connection error: {e}")
+        logger.warning("STREAM: Upstream connection error: %s", e)
         return jsonify({"error": "Stream proxy failed"}), 502
     except Exception as e:
-        print(f"API STREAM: Proxy error: {e}", flush=True)
+        logger.error("STREAM: Proxy error: %s", e)
         return jsonify({"error": "Internal Server Error"}), 500
 
 
@@ -0,0 +1,235 @@
+"""
+Multi-process contention and durability stress test for cache_manager.SmartCache.
+
+Runs --processes forked workers (like Gunicorn's) with --threads threads
+each, all doing mixed get/set on a small, skewed set of overlapping keys in
+one cache directory for --duration seconds. Every payload carries its key,
+writer, sequence number and a digest, so each read is checked:
+
+    corrupted     a read returned something that isn't an intact payload for that key
+    missing       a get missed although the key had been written before (TTL is long)
+    lost writes   after the run, a key's file holds an older write of a writer
+                  that later wrote that key again successfully
+    orphans       *.tmp files left in the cache directory
+
+and it reports ops/s plus latency percentiles per operation and tier
+(memory hit, disk hit, miss, set). The in-memory LRU of each worker
+answers most gets at the production size; --memory-entries 1 sends almost
+every get to disk, where the fcntl locks and os.replace are exercised.
+--kill N SIGKILLs N workers mid-run to check that a crash mid-write never
+leaves a corrupted entry.
+
+    python benchmarks/cache_stress.py                           # 4 x 4, 10 s
+    python benchmarks/cache_stress.py --processes 8 --keys 16 --write-ratio 0.5
+    python benchmarks/cache_stress.py --memory-entries 1 --payload-bytes 65536
+    python benchmarks/cache_stress.py --kill 2
+
+Runs in a temporary directory. Exits non-zero on any corrupted read,
+missing key or lost write; record the numbers before replacing the cache
+store and compare.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import signal
+import hashlib
+import argparse
+import tempfile
+import threading
+import multiprocessing
+from collections import defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from e2e_bench import percentile
+
+SEED = int(os.getenv("BENCH_SEED", "1"))
+TTL = 3600
+TIERS = ("memory", "disk", "miss", "set")
+
+
+def make_payload(key, writer, seq, size):
+    blob = (f"{writer}:{seq}:" * (size // 8 + 1))[:size]
+    body = {"key": key, "writer": writer, "seq": seq, "blob": blob}
+    body["digest"] = hashlib.sha1(json.dumps(body, sort_keys=True).encode()).hexdigest()
+    return body
+
+
+def intact(key, value):
+    if not isinstance(value, dict) or value.get("key") != key:
+        return False
+    body = {k: value.get(k) for k in ("key", "writer", "seq", "blob")}
+    return value.get("digest") == hashlib.sha1(json.dumps(body, sort_keys=True).encode()).hexdigest()
+
+
+def pick_key(rng, keys, skew):
+    """Skewed toward low key numbers: a few hot keys, a long tail."""
+    return f"stress:{int(keys * rng.random() ** skew)}"
+
+
+def worker(index, args, written, results):
+    import cache_manager
+
+    cache = cache_manager.SmartCache(ttl=TTL, name="stress")
+    cache._memory = cache_manager.LRUMemoryCache(max_size=args.memory_entries)
+    latencies = defaultdict(list)
+    totals = defaultdict(int)
+    last_seq = {}
+    lock = threading.Lock()
+    stop_at = time.monotonic() + args.duration
+
+    def run(thread):
+        writer = f"{index}.{thread}"
+        rng = random.Random(SEED * 7919 + index * 101 + thread)
+        local = defaultdict(list)
+        counts = defaultdict(int)
+        seqs = {}
+        seq = 0
+        while time.monotonic() < stop_at:
+            key = pick_key(rng, args.keys, args.skew)
+            key_index = int(key.split(":")[1])
+            if rng.random() < args.write_ratio:
+                seq += 1
+                payload = make_payload(key, writer, seq, args.payload_bytes)
+                started = time.perf_counter()
+                ok = cache.set(key, payload)
+                local["set"].append(time.perf_counter() - started)
+                if ok:
+                    seqs[key] = seq
+                    written[key_index] = 1
+                else:
+                    counts["set_failed"] += 1
+                continue
+            was_written = written[key_index]
+            started = time.perf_counter()
+            value, tier = cache.get_with_tier(key)
+            local[tier or "miss"].append(time.perf_counter() - started)
+            if tier is None:
+                counts["missing"] += was_written
+            elif not intact(key, value):
+                counts["corrupted"] += 1
+        with lock:
+            for tier, values in local.items():
+                latencies[tier].extend(values)
+            for name, n in counts.items():
+                totals[name] += n
+            last_seq[writer] = seqs
+
+    threads = [threading.Thread(target=run, args=(t,)) for t in range(args.threads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    results.put({"index": index, "latencies": dict(latencies), "totals": dict(totals), "last_seq": last_seq})
+
+
+def verify(args, last_seq):
+    """Reads every written key from disk; returns (checked, corrupted, lost)."""
+    import cache_manager
+
+    cache = cache_manager.SmartCache(ttl=TTL, name="verify")
+    checked = corrupted = lost = 0
+    for key_index in range(args.keys):
+        key = f"stress:{key_index}"
+        value, tier = cache.get_with_tier(key)
+        if tier is None:
+            continue
+        checked += 1
+        if not intact(key, value):
+            corrupted += 1
+            continue
+        # A writer that reported back: its last successful write of the key must have survived
+        expected = last_seq.get(value["writer"], {}).get(key)
+        if expected is not None and value["seq"] != expected:
+            lost += 1
+    return checked, corrupted, lost
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=4, help="threads per process")
+    parser.add_argument("--duration", type=float, default=10, help="seconds")
+    parser.add_argument("--keys", type=int, default=64)
+    parser.add_argument("--skew", type=float, default=2.0, help="key popularity skew (1 = uniform)")
+    parser.add_argument("--write-ratio", type=float, default=0.1)
+    parser.add_argument("--payload-bytes", type=int, default=4096)
+    parser.add_argument("--memory-entries", type=int, default=256,
+                        help="per-process LRU size (256 in production; 1 = almost every get hits disk)")
+    parser.add_argument("--kill", type=int, default=0, help="workers to SIGKILL mid-run")
+    args = parser.parse_args()
+    args.memory_entries = max(1, args.memory_entries)
+
+    workdir = tempfile.mkdtemp(prefix="volt-cache-stress-")
+    os.chdir(workdir)   # cache_manager.CACHE_DIR is relative
+    os.environ.setdefault("LOG_LEVEL", "ERROR")
+    try:
+        ctx = multiprocessing.get_context("fork")
+        written = ctx.Array("b", args.keys, lock=False)
+        results = ctx.Queue()
+        procs = [ctx.Process(target=worker, args=(i, args, written, results)) for i in range(args.processes)]
+        started = time.perf_counter()
+        for proc in procs:
+            proc.start()
+
+        killed = set()
+        if args.kill:
+            rng = random.Random(SEED)
+            for proc in rng.sample(procs, min(args.kill, len(procs))):
+                time.sleep(rng.uniform(0.2, 0.6) * args.duration / max(1, args.kill))
+                os.kill(proc.pid, signal.SIGKILL)
+                killed.add(proc.pid)
+
+        reports = []
+        for proc in procs:
+            if proc.pid not in killed:
+                reports.append(results.get())
+        for proc in procs:
+            proc.join()
+        wall = time.perf_counter() - started
+
+        latencies = defaultdict(list)
+        totals = defaultdict(int)
+        last_seq = {}
+        for report in reports:
+            for tier, values in report["latencies"].items():
+                latencies[tier].extend(values)
+            for name, n in report["totals"].items():
+                totals[name] += n
+            last_seq.update(report["last_seq"])
+        checked, corrupted_on_disk, lost = verify(args, last_seq)
+        orphans = sum(1 for name in os.listdir("cache") if name.endswith(".tmp"))
+
+        ops = sum(len(values) for values in latencies.values())
+        print(f"{args.processes} processes x {args.threads} threads, {args.duration:g}s, {args.keys} keys "
+              f"(skew {args.skew:g}), {args.write_ratio:.0%} writes, {args.payload_bytes} B payloads, "
+              f"memory LRU {args.memory_entries}" + (f", {len(killed)} killed" if killed else ""))
+        print(f"{ops} ops, {ops / wall:,.0f} ops/s (reports from {len(reports)} of {args.processes} processes)")
+        print(f"{'tier':<8} {'ops':>9} {'share':>6} {'p50 us':>9} {'p95 us':>9} {'p99 us':>9} {'max us':>9}")
+        for tier in TIERS:
+            values = sorted(latencies.get(tier, []))
+            if not values:
+                continue
+            print(f"{tier:<8} {len(values):>9} {len(values) / ops:>6.1%} "
+                  f"{percentile(values, 50) * 1e6:>9.0f} {percentile(values, 95) * 1e6:>9.0f} "
+                  f"{percentile(values, 99) * 1e6:>9.0f} {values[-1] * 1e6:>9.0f}")
+
+        corrupted = totals["corrupted"] + corrupted_on_disk
+        print(f"corrupted reads {totals['corrupted']}, corrupted on disk {corrupted_on_disk} of {checked}, "
+              f"missing {totals['missing']}, lost writes {lost}, failed sets {totals['set_failed']}, "
+              f"orphaned .tmp files {orphans}")
+        failed = corrupted or totals["missing"] or lost
+        print("FAIL" if failed else "OK")
+        return 1 if failed else 0
+    finally:
+        os.chdir(ROOT)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,633 @@
+"""
+End-to-end load benchmark against local stand-in upstreams.
+
+Starts one local HTTP server that stands in for every provider the backend
+talks to — iTunes search/lookup, JioSaavn api.php, Last.fm, Deezer, yt-dlp
+extraction and a googlevideo-like byte server — each with a latency/error
+profile. The engines are pointed at it through their base-URL env vars
+(ITUNES_BASE_URL, SAAVN_API_URL, LASTFM_BASE_URL, DEEZER_API_URL) and yt-dlp
+is replaced by a client that asks the stand-in, so health tracking,
+deadlines, the call budget and every cache layer run for real. The Flask
+app is served in-process by a threaded Werkzeug server (rate limits off)
+and driven over HTTP:
+
+    /api/search    GET  ?q=<title artist>
+    /api/play      POST {search_term, artist, track_id}
+    /api/category  GET  /api/category/<id>, cycling through every category
+    /api/stream    GET  ?q=&v=, whole body read
+
+Each endpoint runs at every concurrency level with concurrency *
+BENCH_REQUESTS_PER_WORKER requests, and the report shows throughput,
+latency percentiles and upstream calls per request. Queries come from a
+seeded synthetic catalog: each run gets songs no earlier run has seen, and
+BENCH_REPEAT of its requests repeat a song from the same run, so the cache
+hit rate is the same from run to run. Categories are few, so after their
+first build they are mostly cache hits, like production.
+
+    python benchmarks/e2e_bench.py                          # typical profile, 1/4/16
+    python benchmarks/e2e_bench.py --profile slow --levels 1,8,32
+    python benchmarks/e2e_bench.py --upstream saavn=down    # everything via YouTube
+    python benchmarks/e2e_bench.py --endpoints play,stream --json before.json
+
+Profiles: fast, typical, slow, flaky, down (see PROFILES). Caches, the
+resolution table and logs go to a temporary directory that is removed
+afterwards. Compare runs of the same command before and after a change;
+absolute numbers depend on the machine.
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import zlib
+import base64
+import random
+import shutil
+import socket
+import hashlib
+import logging
+import argparse
+import tempfile
+import threading
+from collections import namedtuple, Counter
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import requests
+from pyDes import des, ECB, PAD_PKCS5
+
+SEED = int(os.getenv("BENCH_SEED", "1"))
+REQUESTS_PER_WORKER = int(os.getenv("BENCH_REQUESTS_PER_WORKER", "20"))
+REPEAT = float(os.getenv("BENCH_REPEAT", "0.3"))
+STREAM_BYTES = int(os.getenv("BENCH_STREAM_BYTES", str(512 * 1024)))
+QUIET_TIMEOUT = 30      # seconds to wait for background work (prefetch) between runs
+
+# The app (and cassette.py) is imported after main() moves into its temporary
+# directory: keep a relative CASSETTE_DIR where the bench was started
+os.environ["CASSETTE_DIR"] = os.path.abspath(os.getenv("CASSETTE_DIR", "cassettes"))
+
+# latency/jitter/tail in seconds; error_rate answers 503, tail_rate adds tail_latency
+Profile = namedtuple("Profile", "latency jitter error_rate tail_rate tail_latency")
+PROFILES = {
+    "fast": Profile(0.02, 0.01, 0.0, 0.0, 0.0),
+    "typical": Profile(0.15, 0.05, 0.01, 0.02, 1.5),
+    "slow": Profile(0.6, 0.2, 0.0, 0.05, 4.0),
+    "flaky": Profile(0.15, 0.05, 0.15, 0.05, 3.0),
+    "down": Profile(0.0, 0.0, 1.0, 0.0, 0.0),
+}
+UPSTREAMS = ("itunes", "saavn", "lastfm", "deezer", "youtube", "cdn")
+ENDPOINTS = ("search", "play", "category", "stream")
+
+
+# ── Synthetic catalog ─────────────────────────────────────────
+# Artists are "<word> <noun>", songs "<word> <word>"; a query is
+# "<title> <artist>", so the stand-ins can tell which song was asked for.
+
+ARTIST_WORDS = ("Golden", "Paper", "Electric", "Silver", "Broken", "Neon", "Velvet", "Crystal",
+                "Wild", "Quiet", "Burning", "Hollow", "Lucky", "Faded", "Northern", "Little")
+ARTIST_NOUNS = ("Rivers", "Lights", "Skies", "Roads", "Engines", "Echoes", "Waves", "Mirrors",
+                "Letters", "Shadows", "Gardens", "Birds", "Islands", "Tides", "Voices", "Harbors")
+TITLE_WORDS = ("Midnight", "Summer", "Falling", "Distant", "Lonely", "Running", "Sweet", "Cold",
+               "Dancing", "Secret", "Blue", "Endless", "Open", "Last", "Slow", "Bright",
+               "Heavy", "Gentle", "Restless", "Sudden")
+TITLE_NOUNS = ("Rain", "Fire", "Heart", "Light", "Morning", "Road", "Dream", "Ocean", "Signal",
+               "Window", "Garden", "Machine", "Letter", "Season", "Promise", "River",
+               "Mountain", "Echo", "Satellite", "Highway")
+
+ARTISTS = [f"{w} {n}" for w in ARTIST_WORDS for n in ARTIST_NOUNS]
+TITLES = [f"{w} {n}" for w in TITLE_WORDS for n in TITLE_NOUNS]
+_artist_index = {name.lower(): i for i, name in enumerate(ARTISTS)}
+_title_index = {name.lower(): i for i, name in enumerate(TITLES)}
+CATALOG_SIZE = len(ARTISTS) * len(TITLES)
+NOISE_WORDS = {"audio", "official", "lyrics", "video"}
+
+
+def song(index):
+    """Song `index` of the catalog; an artist's songs are index = artist + title * len(ARTISTS)."""
+    artist, title = index % len(ARTISTS), index // len(ARTISTS)
+    return {
+        "index": index,
+        "title": TITLES[title],
+        "artist": ARTISTS[artist],
+        "track_id": 1_000_000 + index,
+        "artist_id": 5_000 + artist,
+        "album_id": 2_000_000 + artist * 100 + title // 4,
+        "album": f"{TITLES[title - title % 4]} Sessions",
+        "video_id": base64.urlsafe_b64encode(hashlib.sha1(str(index).encode()).digest()).decode()[:11],
+    }
+
+
+def match(query):
+    """(exact song index or None, artist index) for a query, the way the stand-ins read it."""
+    words = [w for w in query.replace("-", " ").split() if w.lower() not in NOISE_WORDS]
+    artist = _artist_index.get(" ".join(words[-2:]).lower())
+    if artist is None:
+        # Unknown artist (category seeds, merged queries): a stable pick
+        return None, zlib.crc32(query.lower().encode()) % len(ARTISTS)
+    title = _title_index.get(" ".join(words[:-2]).lower())
+    return (artist + title * len(ARTISTS) if title is not None else None), artist
+
+
+def related(query, limit, offset=0):
+    """Songs for a search: the exact match first, then the artist's other songs."""
+    exact, artist = match(query)
+    out = [exact] if exact is not None else []
+    out += [artist + t * len(ARTISTS) for t in range(len(TITLES)) if artist + t * len(ARTISTS) != exact]
+    return [song(i) for i in out[offset:offset + limit]]
+
+
+# ── Stand-in upstreams ────────────────────────────────────────
+
+class StandIn(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+    def __init__(self, profiles, seed, stream_bytes=STREAM_BYTES, cdn_rate=0):
+        super().__init__(("127.0.0.1", 0), StandInHandler)
+        self.profiles = profiles
+        self.base = f"http://127.0.0.1:{self.server_address[1]}"
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.calls = Counter()
+        self.inflight = 0
+        self.tokens = {}
+        self.cipher = des(os.getenv("SAAVN_DES_KEY", "38346591").encode("utf-8"), ECB,
+                          pad=None, padmode=PAD_PKCS5)
+        self.stream_bytes = stream_bytes
+        self.cdn_rate = cdn_rate      # bytes/s per download, 0 = as fast as possible
+        self.payload = bytes(range(256)) * (stream_bytes // 256 + 1)
+
+    def fault(self, upstream):
+        """Sleeps for the upstream's latency; True when this call should fail."""
+        profile = self.profiles[upstream]
+        with self.lock:
+            self.calls[upstream] += 1
+            failed = self.random.random() < profile.error_rate
+            delay = max(0.0, self.random.gauss(profile.latency, profile.jitter))
+            if self.random.random() < profile.tail_rate:
+                delay += profile.tail_latency
+        time.sleep(delay)
+        return failed
+
+    def saavn_token(self, s):
+        with self.lock:
+            token = self.tokens.get(s["index"])
+            if token is None:
+                url = f"{self.base}/cdn/saavn/{s['index']}_96.mp4"
+                token = self.tokens[s["index"]] = base64.b64encode(self.cipher.encrypt(url)).decode()
+        return token
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        upstream, _, rest = parts.path.lstrip("/").partition("/")
+        handler = getattr(self, f"_{upstream}", None)
+        if handler is None:
+            return self._send(404, {"error": "unknown upstream"})
+        params = {k: v[0] for k, v in parse_qs(parts.query).items()}
+        with self.server.lock:
+            self.server.inflight += 1
+        try:
+            if self.server.fault(upstream):
+                return self._send(503, {"error": "injected failure"})
+            handler(rest, params)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            with self.server.lock:
+                self.server.inflight -= 1
+
+    def _send(self, status, body, content_type="application/json"):
+        data = body if isinstance(body, bytes) else json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    # iTunes: /itunes/search?term=&entity=&limit=&offset=, /itunes/lookup?id=&entity=
+
+    def _itunes(self, rest, params):
+        limit, offset = int(params.get("limit", 50)), int(params.get("offset", 0))
+        entity = params.get("entity", "song")
+        if rest == "lookup":
+            return self._send(200, {"results": self._itunes_lookup(params.get("id", ""), entity, limit)})
+        if entity == "musicVideo":
+            return self._send(200, {"results": []})
+        songs = related(params.get("term", ""), limit * 4 if entity == "album" else limit, offset)
+        if entity == "musicArtist":
+            results = [self._itunes_artist(songs[0])] if songs else []
+        elif entity == "album":
+            results = list({s["album_id"]: self._itunes_album(s) for s in songs}.values())[:limit]
+        else:
+            results = [self._itunes_track(s) for s in songs]
+        self._send(200, {"resultCount": len(results), "results": results})
+
+    def _itunes_lookup(self, lookup_id, entity, limit):
+        if not lookup_id.isdigit():
+            return []
+        lookup_id = int(lookup_id)
+        if lookup_id >= 2_000_000:     # album: collection, then its tracks
+            artist, first = divmod(lookup_id - 2_000_000, 100)
+            tracks = [song(artist + t * len(ARTISTS)) for t in range(first * 4, first * 4 + 4)]
+            return [self._itunes_album(tracks[0])] + [self._itunes_track(s) for s in tracks]
+        artist = lookup_id - 5_000      # artist: the artist, then songs or albums
+        songs = [song(artist + t * len(ARTISTS)) for t in range(min(limit * 4, len(TITLES)))]
+        if entity == "album":
+            items = list({s["album_id"]: self._itunes_album(s) for s in songs}.values())[:limit]
+        else:
+            items = [self._itunes_track(s) for s in songs[:limit]]
+        return [self._itunes_artist(songs[0])] + items
+
+    def _art(self, kind, ident):
+        return f"{self.server.base}/img/{kind}/{ident}/100x100bb.jpg"
+
+    def _itunes_track(self, s):
+        return {
+            "wrapperType": "track", "kind": "song",
+            "trackId": s["track_id"], "trackName": s["title"],
+            "artistId": s["artist_id"], "artistName": s["artist"],
+            "collectionId": s["album_id"], "collectionName": s["album"], "collectionType": "Album",
+            "artworkUrl100": self._art("album", s["album_id"]),
+            "previewUrl": f"{self.server.base}/cdn/preview/{s['index']}.m4a",
+            "primaryGenreName": "Pop",
+        }
+
+    def _itunes_album(self, s):
+        return {
+            "wrapperType": "collection", "collectionType": "Album",
+            "collectionId": s["album_id"], "collectionName": s["album"],
+            "artistId": s["artist_id"], "artistName": s["artist"],
+            "artworkUrl100": self._art("album", s["album_id"]), "trackCount": 4,
+        }
+
+    def _itunes_artist(self, s):
+        return {"wrapperType": "artist", "artistType": "Artist", "artistId": s["artist_id"],
+                "artistName": s["artist"], "primaryGenreName": "Pop"}
+
+    # JioSaavn: /saavn/api.php?__call=search.getResults&q=
+
+    def _saavn(self, rest, params):
+        results = [{
+            "id": f"sv{s['index']}",
+            "type": "song",
+            "song": s["title"],
+            "subtitle": s["artist"],
+            "image": f"{self.server.base}/img/saavn/{s['index']}-150x150.jpg",
+            "more_info": {"primary_artists": s["artist"]},
+            "encrypted_media_url": self.server.saavn_token(s),
+        } for s in related(params.get("q", ""), int(params.get("n", 10)))]
+        self._send(200, {"total": len(results), "start": 1, "results": results})
+
+    # Last.fm: /lastfm/2.0/?method=chart.gettoptracks|...
+
+    def _lastfm(self, rest, params):
+        limit = int(params.get("limit", 50))
+        if params.get("method") == "chart.gettoptracks":
+            tracks = [{"name": s["title"], "artist": {"name": s["artist"]}, "playcount": str(10_000 - i),
+                       "image": [{"size": "extralarge", "#text": ""}]}
+                      for i, s in enumerate(song(i * 7919 % CATALOG_SIZE) for i in range(limit))]
+            return self._send(200, {"tracks": {"track": tracks}})
+        if params.get("method") == "chart.gettopartists":
+            artists = [{"name": ARTISTS[i], "playcount": str(10_000 - i), "image": []} for i in range(limit)]
+            return self._send(200, {"artists": {"artist": artists}})
+        self._send(200, {"error": 3, "message": "Invalid Method"})
+
+    # Deezer: /deezer/search/artist?q=
+
+    def _deezer(self, rest, params):
+        _, artist = match(params.get("q", ""))
+        self._send(200, {"data": [{"id": artist, "name": ARTISTS[artist],
+                                   "picture_xl": self._art("artist", artist)}]})
+
+    # yt-dlp: /youtube/search?q=&n=&flat=, /youtube/watch?url=
+
+    def _youtube(self, rest, params):
+        if rest == "watch":
+            video_id = params.get("url", "").rsplit("v=", 1)[-1]
+            return self._send(200, {"id": video_id, "url": f"{self.server.base}/cdn/videoplayback?id={video_id}"})
+        flat = params.get("flat") == "1"
+        entries = [{
+            "id": s["video_id"],
+            "title": f"{s['artist']} - {s['title']} (Official Audio)",
+            "uploader": s["artist"],
+            "url": (f"https://www.youtube.com/watch?v={s['video_id']}" if flat
+                    else f"{self.server.base}/cdn/videoplayback?id={s['video_id']}"),
+        } for s in related(params.get("q", ""), int(params.get("n", 1)))]
+        self._send(200, {"entries": entries})
+
+    # googlevideo-like bytes: /cdn/videoplayback?id=, Range supported
+
+    def _cdn(self, rest, params):
+        size = self.server.stream_bytes
+        start, end = 0, size - 1
+        status = 200
+        byte_range = self.headers.get("Range", "")
+        if byte_range.startswith("bytes="):
+            first, _, last = byte_range[6:].partition("-")
+            start = int(first or 0)
+            end = min(int(last), size - 1) if last else size - 1
+            status = 206
+        self.send_response(status)
+        self.send_header("Content-Type", "audio/webm")
+        self.send_header("Content-Length", str(end - start + 1))
+        if status == 206:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        self.end_headers()
+        view = memoryview(self.server.payload)
+        for offset in range(start, end + 1, 65536):
+            self.wfile.write(view[offset:min(offset + 65536, end + 1)])
+            if self.server.cdn_rate:
+                time.sleep(65536 / self.server.cdn_rate)
+
+
+class StandInYoutubeDL:
+    """yt_dlp.YoutubeDL replacement that asks the stand-in instead of YouTube."""
+
+    base = None
+
+    def __init__(self, opts=None):
+        self.opts = opts or {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def extract_info(self, target, download=False):
+        timeout = self.opts.get("socket_timeout", 10)
+        try:
+            if target.startswith("ytsearch"):
+                count, _, query = target[len("ytsearch"):].partition(":")
+                resp = requests.get(f"{self.base}/youtube/search", timeout=timeout, params={
+                    "q": query, "n": count or 1, "flat": int(bool(self.opts.get("extract_flat"))),
+                })
+            else:
+                resp = requests.get(f"{self.base}/youtube/watch", params={"url": target}, timeout=timeout)
+        except requests.RequestException:
+            return None     # ignoreerrors: yt-dlp reports failures as None
+        return resp.json() if resp.status_code == 200 else None
+
+
+# ── Load generation ───────────────────────────────────────────
+
+class Workload:
+    """Seeded request sequences; every run gets catalog songs no earlier run used."""
+
+    def __init__(self, seed, categories):
+        self.random = random.Random(seed)
+        self.order = self.random.sample(range(CATALOG_SIZE), CATALOG_SIZE)
+        self.cursor = 0
+        self.categories = sorted(categories)
+
+    def songs(self, count):
+        picked = []
+        for _ in range(count):
+            if picked and self.random.random() < REPEAT:
+                picked.append(self.random.choice(picked))
+            else:
+                picked.append(song(self.order[self.cursor % CATALOG_SIZE]))
+                self.cursor += 1
+        return picked
+
+    def requests(self, endpoint, count):
+        """[(method, path, kwargs)] for one run."""
+        if endpoint == "category":
+            return [("GET", f"/api/category/{self.categories[i % len(self.categories)]}", {})
+                    for i in range(count)]
+        out = []
+        for s in self.songs(count):
+            term = f"{s['title']} {s['artist']}"
+            if endpoint == "search":
+                out.append(("GET", "/api/search", {"params": {"q": term}}))
+            elif endpoint == "play":
+                out.append(("POST", "/api/play", {"json": {
+                    "search_term": term, "artist": s["artist"], "track_id": s["track_id"]}}))
+            else:
+                out.append(("GET", "/api/stream", {"params": {"q": term, "v": s["video_id"]}, "stream": True}))
+        return out
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, max(0, math.ceil(p / 100 * len(sorted_values)) - 1))]
+
+
+def run_level(base, jobs, concurrency):
+    """Sends `jobs` from `concurrency` threads; returns (wall seconds, [(seconds, status, bytes)])."""
+    local = threading.local()
+    results = []
+    lock = threading.Lock()
+    queue = iter(jobs)
+
+    def worker():
+        session = local.session = requests.Session()
+        while True:
+            with lock:
+                job = next(queue, None)
+            if job is None:
+                return
+            method, path, kwargs = job
+            started = time.perf_counter()
+            try:
+                resp = session.request(method, base + path, timeout=120, **kwargs)
+                size = sum(len(chunk) for chunk in resp.iter_content(65536))
+                outcome = (time.perf_counter() - started, resp.status_code, size)
+            except requests.RequestException as e:
+                outcome = (time.perf_counter() - started, type(e).__name__, 0)
+            with lock:
+                results.append(outcome)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(worker)
+    return time.perf_counter() - started, results
+
+
+def wait_quiet(stand_in):
+    """Lets background work (prefetch) from the last run drain before the next."""
+    deadline = time.monotonic() + QUIET_TIMEOUT
+    idle_since = None
+    while time.monotonic() < deadline:
+        if stand_in.inflight == 0:
+            idle_since = idle_since or time.monotonic()
+            if time.monotonic() - idle_since > 0.5:
+                return
+        else:
+            idle_since = None
+        time.sleep(0.1)
+
+
+def summarize(endpoint, concurrency, wall, results, calls):
+    latencies = sorted(seconds for seconds, _, _ in results)
+    statuses = Counter(str(status) for _, status, _ in results)
+    ok = sum(n for status, n in statuses.items() if status.isdigit() and int(status) < 400)
+    return {
+        "endpoint": endpoint,
+        "concurrency": concurrency,
+        "requests": len(results),
+        "ok": ok,
+        "errors": len(results) - ok,
+        "statuses": dict(statuses),
+        "rps": round(len(results) / wall, 2) if wall else 0.0,
+        "mb_per_s": round(sum(size for _, _, size in results) / wall / 1e6, 2) if wall else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "max_ms": round(latencies[-1] * 1000, 1) if latencies else 0.0,
+        "upstream_calls_per_request": {k: round(v / max(1, len(results)), 2) for k, v in sorted(calls.items())},
+    }
+
+
+ROW = "{endpoint:<9} {concurrency:>5} {requests:>6} {errors:>5} {rps:>8} {mb_per_s:>7} {p50_ms:>8} {p95_ms:>8} {p99_ms:>8} {max_ms:>8}  {calls}"
+
+
+def print_row(row):
+    calls = " ".join(f"{k}={v}" for k, v in row["upstream_calls_per_request"].items())
+    print(ROW.format(**row, calls=calls), flush=True)
+
+
+# ── Setup ─────────────────────────────────────────────────────
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--profile", default="typical", choices=sorted(PROFILES))
+    parser.add_argument("--upstream", action="append", default=[], metavar="NAME=PROFILE",
+                        help=f"per-upstream profile ({', '.join(UPSTREAMS)}), repeatable")
+    parser.add_argument("--levels", default="1,4,16", help="comma-separated concurrency levels")
+    parser.add_argument("--endpoints", default=",".join(ENDPOINTS))
+    parser.add_argument("--json", metavar="PATH", help="also write the results as JSON")
+    args = parser.parse_args()
+
+    profiles = {name: PROFILES[args.profile] for name in UPSTREAMS}
+    for override in args.upstream:
+        name, _, profile = override.partition("=")
+        if name not in UPSTREAMS or profile not in PROFILES:
+            parser.error(f"--upstream {override}: expected one of {UPSTREAMS} = one of {sorted(PROFILES)}")
+        profiles[name] = PROFILES[profile]
+    args.profiles = profiles
+    args.json = os.path.abspath(args.json) if args.json else None
+    args.levels = [int(level) for level in args.levels.split(",")]
+    args.endpoints = [e for e in args.endpoints.split(",") if e]
+    unknown = set(args.endpoints) - set(ENDPOINTS)
+    if unknown:
+        parser.error(f"unknown endpoints: {', '.join(sorted(unknown))}")
+    return args
+
+
+def start_app(stand_in, send_buffer=0, max_threads=0):
+    """
+    Points the engines at the stand-in, imports the app and serves it;
+    returns (base URL, api module). send_buffer caps SO_SNDBUF of the
+    app's connections (accepted sockets inherit it from the listener).
+    max_threads caps concurrent requests like Gunicorn's workers * threads:
+    further connections wait to be accepted.
+    """
+    os.environ.update({
+        "ITUNES_BASE_URL": f"{stand_in.base}/itunes",
+        "SAAVN_API_URL": f"{stand_in.base}/saavn/api.php",
+        "LASTFM_BASE_URL": f"{stand_in.base}/lastfm/2.0/",
+        "LASTFM_API_KEY": "bench",
+        "DEEZER_API_URL": f"{stand_in.base}/deezer",
+        "SNAPSHOTS_ONLY": "false",
+    })
+    os.environ.setdefault("LOG_LEVEL", "ERROR")
+
+    import yt_dlp
+    StandInYoutubeDL.base = stand_in.base
+    yt_dlp.YoutubeDL = StandInYoutubeDL
+
+    import api
+    from werkzeug.serving import make_server
+
+    api.limiter.enabled = False
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)   # no per-request access log
+    server = make_server("127.0.0.1", 0, api.app, threaded=True)
+    if send_buffer:
+        server.socket.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, send_buffer)
+    if max_threads:
+        cap_threads(server, max_threads)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}", api
+
+
+def cap_threads(server, max_threads):
+    """
+    Makes a threaded Werkzeug server start at most max_threads request
+    threads at once; they are named "... (app_request_thread)".
+    """
+    slots = threading.BoundedSemaphore(max_threads)
+    spawn, serve = server.process_request, server.process_request_thread
+
+    def process_request(request, client_address):
+        slots.acquire()     # blocks the accept loop, as a server out of threads would
+        try:
+            spawn(request, client_address)
+        except Exception:
+            slots.release()
+            raise
+
+    def app_request_thread(request, client_address):
+        try:
+            serve(request, client_address)
+        finally:
+            slots.release()
+
+    server.process_request = process_request
+    server.process_request_thread = app_request_thread
+
+
+def main():
+    args = parse_args()
+    workdir = tempfile.mkdtemp(prefix="volt-bench-")
+    os.chdir(workdir)   # cache/ (smart_cache, resolution table, metrics) lands here
+
+    stand_in = StandIn(args.profiles, SEED)
+    threading.Thread(target=stand_in.serve_forever, daemon=True).start()
+    try:
+        base, api = start_app(stand_in)
+        workload = Workload(SEED, api.metadata_engine.CATEGORY_QUERIES)
+        print(f"profile: {args.profile}  " + " ".join(
+            f"{name}={next(k for k, v in PROFILES.items() if v == p)}"
+            for name, p in args.profiles.items() if p != PROFILES[args.profile]))
+        print(ROW.format(endpoint="endpoint", concurrency="conc", requests="reqs", errors="err",
+                         rps="req/s", mb_per_s="MB/s", p50_ms="p50 ms", p95_ms="p95 ms",
+                         p99_ms="p99 ms", max_ms="max ms", calls="upstream calls/request"))
+
+        rows = []
+        for endpoint in args.endpoints:
+            for concurrency in args.levels:
+                jobs = workload.requests(endpoint, concurrency * REQUESTS_PER_WORKER)
+                wait_quiet(stand_in)
+                calls_before = stand_in.calls.copy()
+                wall, results = run_level(base, jobs, concurrency)
+                wait_quiet(stand_in)
+                rows.append(summarize(endpoint, concurrency, wall, results, stand_in.calls - calls_before))
+                print_row(rows[-1])
+
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump({"profile": args.profile,
+                           "upstreams": {k: v._asdict() for k, v in args.profiles.items()},
+                           "requests_per_worker": REQUESTS_PER_WORKER, "repeat": REPEAT,
+                           "seed": SEED, "results": rows}, f, indent=2)
+    finally:
+        stand_in.shutdown()
+        os.chdir(ROOT)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
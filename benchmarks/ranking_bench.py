@@ -0,0 +1,170 @@
+"""
+Offline ranking regression + speed benchmark.
+
+Replays recorded Saavn search responses (benchmarks/fixtures/saavn/) through
+the real search_saavn -> search_saavn_enhanced path and hub._find_best_match,
+checks the expected winner for every case in fixtures/ranking_cases.json,
+then reports scoring throughput per candidate.
+
+No network access is needed; run it after touching ranking.py or the
+Saavn parsing code:
+
+    python benchmarks/ranking_bench.py            # regression + timing
+    python benchmarks/ranking_bench.py --check    # regression only
+
+Exits non-zero if any case picks a different winner.
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import logging
+import contextlib
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES = os.path.join(ROOT, "benchmarks", "fixtures")
+sys.path.insert(0, ROOT)
+
+import hub
+import ranking
+import saavn_engine
+
+ROUNDS = int(os.getenv("BENCH_ROUNDS", "200"))
+
+
+class RecordedResponse:
+    status_code = 200
+
+    def __init__(self, body):
+        self.text = json.dumps(body)
+
+
+def load_response(name):
+    with open(os.path.join(FIXTURES, "saavn", f"{name}.json"), encoding="utf-8") as f:
+        return json.load(f)
+
+
+@contextlib.contextmanager
+def replay(name):
+    """Serves `name` for every Saavn request and bypasses smart_cache."""
+    body = load_response(name)
+    real_get, real_search = saavn_engine.upstream.get, saavn_engine.search_saavn
+    saavn_engine.upstream.get = lambda *args, **kwargs: RecordedResponse(body)
+    saavn_engine.search_saavn = real_search.__wrapped__
+    try:
+        yield
+    finally:
+        saavn_engine.upstream.get, saavn_engine.search_saavn = real_get, real_search
+
+
+def quiet(func, *args, **kwargs):
+    """Runs func with logging off, so checks and timings leave out log I/O."""
+    logging.disable(logging.CRITICAL)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            return func(*args, **kwargs)
+    finally:
+        logging.disable(logging.NOTSET)
+
+
+def describe(track):
+    return f"'{track['title']}' — {track['artist']}" if track else "nothing"
+
+
+def matches(track, expect):
+    if expect is None:
+        return track is None
+    return bool(track) and track["title"] == expect["title"] and track["artist"] == expect["artist"]
+
+
+def run_case(case):
+    """Returns (ok, winner) for one case."""
+    with replay(case["response"]):
+        if case["ranker"] == "saavn":
+            results = quiet(saavn_engine.search_saavn_enhanced, case["query"], case.get("artist_filter"))
+            winner = results[0] if results else None
+            if winner and saavn_engine.resolve_url(winner) is None:
+                return False, winner
+        else:
+            candidates = saavn_engine.resolve_urls(quiet(saavn_engine.search_saavn, case["query"]))
+            winner = quiet(hub._find_best_match, candidates, case["query"])
+    return matches(winner, case["expect"]), winner
+
+
+def check(cases):
+    failures = 0
+    for case in cases:
+        ok, winner = run_case(case)
+        label = f"[{case['ranker']}] {case['query']!r}" + (f" {case['artist_filter']}" if case.get("artist_filter") else "")
+        if ok:
+            print(f"  PASS  {label}")
+        else:
+            failures += 1
+            print(f"  FAIL  {label}")
+            print(f"        expected {describe(case['expect'])}")
+            print(f"        got      {describe(winner)}")
+    print(f"\n{len(cases) - failures}/{len(cases)} ranking cases passed")
+    return failures
+
+
+def clear_memos():
+    for func in (ranking.similarity, ranking.artist_words, ranking.saavn_query_features,
+                 ranking._saavn_track_features, ranking._clean_str, ranking._image_rank):
+        func.cache_clear()
+
+
+def bench(cases):
+    """Times the scoring kernels alone (no parsing, decryption or logging)."""
+    workloads = []
+    for case in cases:
+        with replay(case["response"]):
+            candidates = quiet(saavn_engine.search_saavn, case["query"])
+        workloads.append((case, candidates))
+    per_round = sum(len(candidates) for _, candidates in workloads)
+
+    def score_all():
+        for case, candidates in workloads:
+            if case["ranker"] == "saavn":
+                ranking.score_saavn(candidates, case["query"], case.get("artist_filter"))
+            else:
+                for c in candidates:
+                    ranking.fuzzy_match_ratio(case["query"], c["title"], c["artist"])
+
+    for label, reset in (("cold (memos cleared each round)", True), ("warm (memoized)", False)):
+        elapsed = 0.0
+        for _ in range(ROUNDS):
+            if reset:
+                clear_memos()
+            started = time.perf_counter()
+            score_all()
+            elapsed += time.perf_counter() - started
+        scored = per_round * ROUNDS
+        print(f"  {label:34s} {scored / elapsed:>12,.0f} candidates/s   {elapsed / scored * 1e6:7.2f} us/candidate")
+
+    started = time.perf_counter()
+    for _ in range(ROUNDS):
+        for case in cases:
+            if case["ranker"] == "saavn":
+                with replay(case["response"]):
+                    quiet(saavn_engine.search_saavn_enhanced, case["query"], case.get("artist_filter"))
+    elapsed = time.perf_counter() - started
+    queries = ROUNDS * sum(1 for c in cases if c["ranker"] == "saavn")
+    print(f"  {'search_saavn_enhanced end-to-end':34s} {queries / elapsed:>12,.0f} queries/s      {elapsed / queries * 1e3:7.3f} ms/query")
+
+
+def main(argv):
+    with open(os.path.join(FIXTURES, "ranking_cases.json"), encoding="utf-8") as f:
+        cases = json.load(f)
+
+    print("Ranking regression")
+    failures = check(cases)
+    if "--check" not in argv:
+        print(f"\nScoring throughput ({ROUNDS} rounds)")
+        bench(cases)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
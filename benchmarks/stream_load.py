@@ -0,0 +1,357 @@
+"""
+Listener load test for the /api/stream proxy.
+
+Simulates listeners the way a browser's <audio> element uses the proxy:
+each opens `Range: bytes=0-`, reads ahead of the playhead by BUFFER_AHEAD
+seconds of audio and then only as fast as it plays, and every seek closes
+the response and opens a new `Range: bytes=<offset>-`. Per track a
+listener draws how long it listens (SKIP_EARLY skip within 30 s,
+SKIP_LATER skip somewhere later, the rest play to the end) and seeks at
+SEEKS_PER_MINUTE, 70% forward. Playback runs --speed times faster than
+real time so a level finishes in seconds of wall time instead of minutes.
+
+By default the app runs in-process behind the stand-ins of e2e_bench.py
+(rate limits off), with as many request threads as Gunicorn would have on
+this machine (gunicorn_config workers * threads), so listeners beyond that
+wait for a thread as they would in production. The byte server serves
+TRACK_BYTES per track, at CDN_RATE bytes/s per download. Each level runs `listeners` concurrent
+listeners for --tracks tracks each and reports:
+
+    ttfb        time to the first 16 KB after opening a track / after a seek
+    MB/s        bytes relayed to all listeners
+    rebuffer    time the playhead waited for data, as a share of audio played
+    threads     request threads busy serving the app (peak / mean); with
+                Gunicorn's gthread workers each open stream holds one of
+                workers * threads
+    upstream    stand-in calls per listener session (yt-dlp, byte server)
+
+A level is "sustained" when nothing failed, rebuffering stays under 1% and
+the p95 time to first byte of opens and seeks stays under SUSTAINED_TTFB
+(listeners waiting for a free thread show up there).
+
+    python benchmarks/stream_load.py                        # 4/16/64 listeners
+    python benchmarks/stream_load.py --levels 32,64,128 --speed 20
+    python benchmarks/stream_load.py --profile slow --cdn-rate 200000
+    python benchmarks/stream_load.py --target http://localhost:5000   # running instance
+
+Both ends use SOCKET_BUFFER-sized socket buffers, as over a real network.
+A speed-up makes those buffers hold fewer seconds of audio, so thread
+occupancy reads low; --speed 1 is closest to production but runs as long
+as the listening itself. With --target only client-side numbers are
+reported (threads and upstream calls are not visible), and the route's
+per-IP rate limit applies. The client shares the process with the
+in-process server, so local numbers are a lower bound for the proxy itself.
+"""
+
+import os
+import sys
+import math
+import time
+import random
+import shutil
+import socket
+import argparse
+import tempfile
+import threading
+from collections import Counter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+
+from e2e_bench import (PROFILES, UPSTREAMS, CATALOG_SIZE, StandIn, song, percentile,
+                       start_app, wait_quiet)
+
+SEED = int(os.getenv("BENCH_SEED", "1"))
+BITRATE = int(os.getenv("BENCH_BITRATE", "160000"))            # bits/s of the audio
+TRACK_SECONDS = int(os.getenv("BENCH_TRACK_SECONDS", "210"))
+TRACK_BYTES = BITRATE // 8 * TRACK_SECONDS
+BUFFER_AHEAD = float(os.getenv("BENCH_BUFFER_AHEAD", "30"))    # seconds of audio read ahead
+SKIP_EARLY = float(os.getenv("BENCH_SKIP_EARLY", "0.25"))
+SKIP_LATER = float(os.getenv("BENCH_SKIP_LATER", "0.25"))
+SEEKS_PER_MINUTE = float(os.getenv("BENCH_SEEKS_PER_MINUTE", "0.5"))
+POOL = int(os.getenv("BENCH_TRACK_POOL", "200"))               # distinct tracks listeners pick from
+CHUNK = 16 * 1024
+SOCKET_BUFFER = int(os.getenv("BENCH_SOCKET_BUFFER", str(128 * 1024)))
+SUSTAINED_REBUFFER = 0.01
+SUSTAINED_TTFB = float(os.getenv("BENCH_SUSTAINED_TTFB", "2"))   # seconds, p95 of opens and seeks
+
+
+class Plan:
+    """What one listener does with one track: how long it listens and where it seeks."""
+
+    def __init__(self, rng):
+        roll = rng.random()
+        if roll < SKIP_EARLY:
+            self.listen = rng.uniform(5, 30)
+        elif roll < SKIP_EARLY + SKIP_LATER:
+            self.listen = rng.uniform(30, TRACK_SECONDS)
+        else:
+            self.listen = TRACK_SECONDS
+        seeks = self._poisson(rng, SEEKS_PER_MINUTE * self.listen / 60)
+        self.seeks = sorted(rng.uniform(0, self.listen) for _ in range(seeks))
+        self.rng = rng
+
+    @staticmethod
+    def _poisson(rng, mean):
+        limit, k, p = math.exp(-mean), 0, 1.0
+        while True:
+            p *= rng.random()
+            if p <= limit:
+                return k
+            k += 1
+
+    def target(self, position):
+        """Seek target (seconds) from `position`: forward 70% of the time."""
+        if self.rng.random() < 0.7:
+            return self.rng.uniform(position, TRACK_SECONDS - 5)
+        return self.rng.uniform(0, position)
+
+
+class Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.ttfb_open = []
+        self.ttfb_seek = []
+        self.bytes = 0
+        self.played = 0.0       # seconds of audio
+        self.stalled = 0.0      # seconds the playhead waited
+        self.requests = 0
+        self.errors = Counter()
+        self.sessions = 0
+
+    def add(self, **values):
+        with self.lock:
+            for name, value in values.items():
+                if isinstance(value, list):
+                    getattr(self, name).extend(value)
+                else:
+                    setattr(self, name, getattr(self, name) + value)
+
+
+class ListenerAdapter(HTTPAdapter):
+    """
+    Caps the listener's receive buffer (the app's send buffer is capped
+    too): over loopback the kernel would otherwise soak up a whole track,
+    release the server thread at once and hide how long a paced listener
+    really holds it.
+    """
+
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs["socket_options"] = HTTPConnection.default_socket_options + [
+            (socket.SOL_SOCKET, socket.SO_RCVBUF, SOCKET_BUFFER)]
+        super().init_poolmanager(*args, **kwargs)
+
+
+class Listener:
+    def __init__(self, base, stats, rng, speed):
+        self.base = base
+        self.stats = stats
+        self.rng = rng
+        self.speed = speed
+        self.rate = BITRATE / 8 * speed          # bytes/s the playhead consumes
+        self.session = requests.Session()
+        self.session.mount("http://", ListenerAdapter())
+
+    def run(self, tracks, stop):
+        for _ in range(tracks):
+            if stop.is_set():
+                break
+            s = song(self.rng.randrange(POOL) * 7919 % CATALOG_SIZE)
+            self.play(s, Plan(self.rng))
+        self.stats.add(sessions=1)
+
+    def play(self, s, plan):
+        """Plays one track to plan.listen, seeking as planned; stops early on errors."""
+        params = {"q": f"{s['title']} {s['artist']}", "v": s["video_id"]}
+        position = 0.0      # seconds into the track
+        for seek_at in plan.seeks + [plan.listen]:
+            # Listen from `position` up to `seek_at`, then seek (or stop)
+            if seek_at <= position:
+                continue
+            if not self.listen(params, position, seek_at, seeked=position > 0):
+                return
+            if seek_at >= plan.listen:
+                return
+            position = plan.target(seek_at)
+
+    def listen(self, params, start, until, seeked):
+        offset = int(start * BITRATE / 8)
+        started = time.perf_counter()
+        try:
+            resp = self.session.get(f"{self.base}/api/stream", params=params, stream=True, timeout=60,
+                                    headers={"Range": f"bytes={offset}-"})
+        except requests.RequestException as e:
+            self.stats.add(requests=1, errors=Counter({type(e).__name__: 1}))
+            return False
+        self.stats.add(requests=1)
+        if resp.status_code not in (200, 206):
+            resp.close()
+            self.stats.add(errors=Counter({str(resp.status_code): 1}))
+            return False
+
+        want = int((until - start) * BITRATE / 8)
+        received, stalled = 0, 0.0
+        first = play_start = None
+        try:
+            for chunk in resp.iter_content(CHUNK):
+                now = time.perf_counter()
+                if first is None:
+                    first = play_start = now
+                else:
+                    # Playhead position in bytes; if it caught up with the data, playback stalled
+                    playhead = (now - play_start) * self.rate
+                    if playhead > received:
+                        stalled += (playhead - received) / self.rate
+                        play_start = now - received / self.rate
+                received += len(chunk)
+                if received >= want:
+                    break
+                # Read ahead at most BUFFER_AHEAD seconds, then keep pace with playback
+                ahead = received - (time.perf_counter() - play_start) * self.rate
+                if ahead > BUFFER_AHEAD * BITRATE / 8:
+                    time.sleep((ahead - BUFFER_AHEAD * BITRATE / 8) / self.rate)
+        except requests.RequestException as e:
+            self.stats.add(errors=Counter({type(e).__name__: 1}))
+            return False
+        finally:
+            resp.close()
+        if first is None:
+            self.stats.add(errors=Counter({"empty body": 1}))
+            return False
+        # Let the rest of the listened span play out from the buffer
+        remaining = (play_start + want / self.rate) - time.perf_counter()
+        if remaining > 0:
+            time.sleep(remaining)
+        ttfb = [first - started]
+        self.stats.add(bytes=received, played=want / (BITRATE / 8), stalled=stalled,
+                       **{"ttfb_seek" if seeked else "ttfb_open": ttfb})
+        return True
+
+
+def busy_threads():
+    """App request threads alive right now (one per open request; see e2e_bench.cap_threads)."""
+    return sum(1 for t in threading.enumerate() if "app_request_thread" in t.name)
+
+
+def run_level(base, listeners, tracks, speed, stand_in):
+    stats = Stats()
+    stop = threading.Event()
+    samples = []
+    calls_before = stand_in.calls.copy() if stand_in else Counter()
+
+    def sample():
+        while not stop.wait(0.25):
+            samples.append(busy_threads())
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    started = time.perf_counter()
+    threads = []
+    for i in range(listeners):
+        listener = Listener(base, stats, random.Random(SEED * 1_000_003 + listeners * 1009 + i), speed)
+        thread = threading.Thread(target=listener.run, args=(tracks, stop), daemon=True)
+        thread.start()
+        threads.append(thread)
+        time.sleep(min(0.05, 2.0 / listeners))   # ramp up over ~2 s
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+    stop.set()
+    sampler.join()
+    if stand_in:
+        wait_quiet(stand_in)
+
+    calls = (stand_in.calls - calls_before) if stand_in else Counter()
+    open_ttfb, seek_ttfb = sorted(stats.ttfb_open), sorted(stats.ttfb_seek)
+    rebuffer = stats.stalled / stats.played if stats.played else 0.0
+    failed = sum(stats.errors.values())
+    return {
+        "listeners": listeners,
+        "sessions": stats.sessions,
+        "stream_requests": stats.requests,
+        "errors": dict(stats.errors),
+        "ttfb_open_p50_ms": round(percentile(open_ttfb, 50) * 1000, 1),
+        "ttfb_open_p95_ms": round(percentile(open_ttfb, 95) * 1000, 1),
+        "ttfb_seek_p50_ms": round(percentile(seek_ttfb, 50) * 1000, 1),
+        "ttfb_seek_p95_ms": round(percentile(seek_ttfb, 95) * 1000, 1),
+        "mb_per_s": round(stats.bytes / wall / 1e6, 2),
+        "rebuffer_pct": round(rebuffer * 100, 2),
+        "threads_peak": max(samples, default=0) if stand_in else None,
+        "threads_mean": round(sum(samples) / len(samples), 1) if stand_in and samples else None,
+        "upstream_per_session": {k: round(v / max(1, stats.sessions), 2)
+                                 for k, v in sorted(calls.items())},
+        "sustained": (failed == 0 and rebuffer < SUSTAINED_REBUFFER
+                      and max(percentile(open_ttfb, 95), percentile(seek_ttfb, 95)) < SUSTAINED_TTFB),
+    }
+
+
+ROW = ("{listeners:>9} {stream_requests:>6} {failed:>5} {ttfb_open:>15} {ttfb_seek:>15} "
+       "{mb_per_s:>7} {rebuffer_pct:>9} {threads:>9}  {calls}  {verdict}")
+
+
+def print_row(row):
+    print(ROW.format(
+        listeners=row["listeners"], stream_requests=row["stream_requests"],
+        failed=sum(row["errors"].values()),
+        ttfb_open=f"{row['ttfb_open_p50_ms']}/{row['ttfb_open_p95_ms']}",
+        ttfb_seek=f"{row['ttfb_seek_p50_ms']}/{row['ttfb_seek_p95_ms']}",
+        mb_per_s=row["mb_per_s"], rebuffer_pct=row["rebuffer_pct"],
+        threads="-" if row["threads_peak"] is None else f"{row['threads_peak']}/{row['threads_mean']}",
+        calls=" ".join(f"{k}={v}" for k, v in row["upstream_per_session"].items()) or "-",
+        verdict="sustained" if row["sustained"] else "DEGRADED",
+    ), flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--levels", default="4,16,64", help="comma-separated listener counts")
+    parser.add_argument("--tracks", type=int, default=3, help="tracks per listener session")
+    parser.add_argument("--speed", type=float, default=10, help="playback speed-up")
+    parser.add_argument("--profile", default="typical", choices=sorted(PROFILES),
+                        help="stand-in latency/error profile")
+    parser.add_argument("--cdn-rate", type=int, default=0, help="byte server bytes/s per download")
+    parser.add_argument("--target", help="base URL of a running instance instead of the local app")
+    args = parser.parse_args()
+    levels = [int(level) for level in args.levels.split(",")]
+
+    stand_in = workdir = None
+    if args.target:
+        base = args.target.rstrip("/")
+    else:
+        workdir = tempfile.mkdtemp(prefix="volt-stream-load-")
+        os.chdir(workdir)
+        stand_in = StandIn({name: PROFILES[args.profile] for name in UPSTREAMS}, SEED,
+                           stream_bytes=TRACK_BYTES, cdn_rate=args.cdn_rate)
+        threading.Thread(target=stand_in.serve_forever, daemon=True).start()
+        import gunicorn_config
+        capacity = gunicorn_config.workers * gunicorn_config.threads
+        base, _ = start_app(stand_in, send_buffer=SOCKET_BUFFER, max_threads=capacity)
+        print(f"Gunicorn on this machine: {gunicorn_config.workers} workers x "
+              f"{gunicorn_config.threads} threads = {capacity} concurrent streams; the app gets as many threads")
+
+    print(f"track {TRACK_SECONDS}s at {BITRATE // 1000} kbps ({TRACK_BYTES / 1e6:.1f} MB), speed x{args.speed:g}, "
+          f"{args.tracks} tracks/listener, profile {args.profile if stand_in else 'remote'}")
+    print(ROW.format(listeners="listeners", stream_requests="reqs", failed="err",
+                     ttfb_open="ttfb p50/p95", ttfb_seek="seek p50/p95", mb_per_s="MB/s",
+                     rebuffer_pct="rebuf %", threads="threads", calls="upstream/session", verdict=""))
+    try:
+        sustained = 0
+        for listeners in levels:
+            row = run_level(base, listeners, args.tracks, args.speed, stand_in)
+            print_row(row)
+            if row["sustained"]:
+                sustained = max(sustained, listeners)
+        print(f"Highest sustained level: {sustained or 'none'} listeners")
+    finally:
+        if stand_in:
+            stand_in.shutdown()
+            os.chdir(ROOT)
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
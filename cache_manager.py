@@ -2,14 +2,24 @@ import os
 import json
 import time
 import hashlib
+import re
 import tempfile
 import fcntl
 import threading
 from collections import OrderedDict
 from functools import wraps
+import tracing
+import log
+import ledger
+import deadline
+import metrics
 
 CACHE_DIR = "cache"
 os.makedirs(CACHE_DIR, exist_ok=True)
+logger = log.get("cache")
+
+# Every in-memory cache of this process, for the admin memory report
+_registry = []
 
 class LRUMemoryCache:
     """Thread-safe in-memory LRU cache. Bounded to max_size entries."""
@@ -49,6 +59,11 @@ class LRUMemoryCache:
         with self._lock:
             self._cache.clear()
 
+    def payloads(self):
+        """Copy of the cached payloads (for size reporting)."""
+        with self._lock:
+            return [entry['payload'] for entry in self._cache.values()]
+
 
 class SmartCache:
     """
@@ -58,25 +73,35 @@ class SmartCache:
     3. Atomic writes (tempfile -> os.replace)
     """
     
-    def __init__(self, ttl=86400, validator=None):
+    def __init__(self, ttl=86400, validator=None, name=None):
         self.ttl = ttl
         self.validator = validator
+        self.name = name
         self._memory = LRUMemoryCache(max_size=256)
+        _registry.append(self)
+
+    def memory_stats(self):
+        payloads = self._memory.payloads()
+        return {"name": self.name, "entries": len(payloads), "max_entries": self._memory._max_size}, payloads
 
     def _get_cache_path(self, key):
         hash_key = hashlib.sha256(key.encode('utf-8')).hexdigest()[:32]
         return os.path.join(CACHE_DIR, f"{hash_key}.json")
 
     def get(self, key):
+        return self.get_with_tier(key)[0]
+
+    def get_with_tier(self, key):
+        """(value, tier): tier is "memory", "disk" or None on a miss."""
         # Layer 1: In-memory LRU (instant, no disk I/O)
         value, found = self._memory.get(key, self.ttl)
         if found:
-            return value
+            return value, "memory"
         
         # Layer 2: Disk cache (with shared file lock for safe reads)
         path = self._get_cache_path(key)
         if not os.path.exists(path):
-            return None
+            return None, None
             
         try:
             with open(path, 'r', encoding='utf-8') as f:
@@ -92,23 +117,23 @@ class SmartCache:
                     os.remove(path)
                 except OSError:
                     pass
-                return None
+                return None, None
             
             # Promote to memory cache
             self._memory.set(key, data['payload'])
-            return data['payload']
+            return data['payload'], "disk"
             
         except (json.JSONDecodeError, KeyError) as e:
             # Corrupted cache file — remove it
-            print(f"   [Cache] Corrupted file removed: {e}")
+            logger.warning("Corrupted file removed: %s", e)
             try:
                 os.remove(path)
             except OSError:
                 pass
-            return None
+            return None, None
         except Exception as e:
-            print(f"   [Cache] Read Error: {e}")
-            return None
+            logger.warning("Read Error: %s", e)
+            return None, None
 
     def set(self, key, payload):
         # Validation
@@ -146,7 +171,7 @@ class SmartCache:
             return True
             
         except Exception as e:
-            print(f"   [Cache] Write Error: {e}")
+            logger.warning("Write Error: %s", e)
             if tmp_path and os.path.exists(tmp_path):
                 try:
                     os.remove(tmp_path)
@@ -161,6 +186,13 @@ class SmartCache:
 _herd_locks = {}
 _herd_meta_lock = threading.Lock()
 
+def herd_lock_count():
+    return len(_herd_locks)
+
+def memory_caches():
+    """[(stats dict, payloads)] for every in-memory cache of this process."""
+    return [cache.memory_stats() for cache in list(_registry)]
+
 def _get_herd_lock(key):
     """Get or create a lock for a specific cache key."""
     with _herd_meta_lock:
@@ -169,6 +201,143 @@ def _get_herd_lock(key):
         return _herd_locks[key]
 
 
+class WindowCache:
+    """
+    Cache for paged list results (e.g. iTunes search with a `limit`).
+
+    Each key stores the LARGEST window fetched so far. Any request for a
+    smaller (or equal) limit is served as a slice of that window, so
+    limit=5, 10 and 25 for the same query cost one upstream call.
+    A window shorter than its requested limit means the upstream ran out
+    of results, so it answers any limit.
+
+    Backed by SmartCache (memory + disk), so windows are shared across
+    Gunicorn workers, with per-key single-flight for concurrent misses.
+    """
+
+    def __init__(self, ttl=3600, name=None):
+        self._store = SmartCache(ttl, name=name)
+
+    @staticmethod
+    def _covers(window, limit):
+        return window['limit'] >= limit or len(window['results']) < window['limit']
+
+    def get_or_fetch(self, key, limit, fetch):
+        """
+        Return up to `limit` results for `key`, calling `fetch(limit)` only
+        when no cached window covers the request. `fetch` must return a list
+        or raise; exceptions are propagated and nothing is cached. An empty
+        list is returned but not stored, since it is as likely an upstream
+        error body as a query with no results.
+        """
+        window = self._store.get(key)
+        if window and self._covers(window, limit):
+            return window['results'][:limit]
+
+        # Single-flight: one fetch per key, later callers re-check the window
+        with _get_herd_lock(key):
+            window = self._store.get(key)
+            if window and self._covers(window, limit):
+                return window['results'][:limit]
+
+            results = fetch(limit)
+            if results:
+                self._store.set(key, {"limit": limit, "results": results})
+            return results
+
+
+class SnapshotStore:
+    """
+    Ready-to-serve payloads written by the background refresher (refresher.py)
+    and read by the API. Unlike SmartCache there is no TTL: a snapshot stays
+    servable until the refresher replaces it, and readers get its age instead.
+
+    - Writes are atomic (tempfile -> os.replace), same as SmartCache
+    - Reads take a shared fcntl lock and are memoized per file mtime, so the
+      hot path is one os.stat() per request
+    """
+
+    def __init__(self, directory=os.path.join(CACHE_DIR, "snapshots")):
+        self.directory = directory
+        self._memo = {}  # name -> (mtime_ns, entry)
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+        _registry.append(self)
+
+    def memory_stats(self):
+        with self._lock:
+            payloads = [entry for _, entry in self._memo.values()]
+        return {"name": f"snapshots:{self.directory}", "entries": len(payloads), "max_entries": None}, payloads
+
+    def _path(self, name):
+        safe_name = re.sub(r'[^A-Za-z0-9_.-]', '_', name)
+        return os.path.join(self.directory, f"{safe_name}.json")
+
+    def write(self, name, payload):
+        path = self._path(name)
+        tmp_path = None
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({
+                    "generated_at": time.time(),
+                    "payload": payload
+                }, f)
+                f.flush()
+                try:
+                    os.fsync(f.fileno())
+                except OSError:
+                    pass
+            os.replace(tmp_path, path)
+            return True
+        except Exception as e:
+            logger.warning("Write Error for '%s': %s", name, e)
+            if tmp_path and os.path.exists(tmp_path):
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+            return False
+
+    def read(self, name):
+        """Returns {"generated_at": float, "payload": ...} or None if no snapshot exists yet."""
+        path = self._path(name)
+        try:
+            mtime_ns = os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+
+        with self._lock:
+            memo = self._memo.get(name)
+            if memo and memo[0] == mtime_ns:
+                return memo[1]
+
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                fcntl.flock(f, fcntl.LOCK_SH)
+                try:
+                    entry = json.load(f)
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning("Read Error for '%s': %s", name, e)
+            return None
+
+        with self._lock:
+            self._memo[name] = (mtime_ns, entry)
+        return entry
+
+
+def cut_short():
+    """
+    Work the current request has had cut short so far (stages its deadline
+    skipped, calls its budget refused). A result computed while this grows
+    may be partial.
+    """
+    return deadline.missed() + ledger.refused()
+
+
 def smart_cache(ttl=86400, validator=None):
     """
     Production-ready decorator for file-based caching.
@@ -186,33 +355,54 @@ def smart_cache(ttl=86400, validator=None):
     cache_instance = SmartCache(ttl, validator)
     
     def decorator(func):
+        cache_instance.name = f"{func.__module__}.{func.__name__}"
+
+        def cache_key(*args, **kwargs):
+            # Build a stable cache key
+            return f"{func.__module__}.{func.__name__}:{args}:{kwargs}"
+
         @wraps(func)
         def wrapper(*args, **kwargs):
-            # Build a stable cache key
-            key_str = f"{func.__module__}.{func.__name__}:{args}:{kwargs}"
-            
-            # Fast path: Check cache (memory + disk)
-            cached = cache_instance.get(key_str)
-            if cached is not None:
-                return cached
-            
-            # Thundering herd: Only one thread calls the API per key
-            herd_lock = _get_herd_lock(key_str)
-            with herd_lock:
-                # Double-check after acquiring lock (another thread may have populated it)
-                cached = cache_instance.get(key_str)
+            key_str = cache_key(*args, **kwargs)
+
+            with tracing.span(f"cache {func.__name__}") as span:
+                # Fast path: Check cache (memory + disk)
+                cached, tier = cache_instance.get_with_tier(key_str)
                 if cached is not None:
+                    span.set(tier=tier)
+                    metrics.inc("volt_cache_lookups_total", cache=func.__name__, result=tier)
+                    ledger.note_cache(func.__name__, tier)
                     return cached
-                
-                # Call the actual function
-                result = func(*args, **kwargs)
-                
-                # Save to cache (validator check is inside .set)
-                cache_instance.set(key_str, result)
-                
-                return result
+
+                # Thundering herd: Only one thread calls the API per key
+                herd_lock = _get_herd_lock(key_str)
+                with herd_lock:
+                    # Double-check after acquiring lock (another thread may have populated it)
+                    cached, tier = cache_instance.get_with_tier(key_str)
+                    if cached is not None:
+                        span.set(tier=f"{tier} (after herd wait)")
+                        metrics.inc("volt_cache_lookups_total", cache=func.__name__, result=tier)
+                        ledger.note_cache(func.__name__, tier)
+                        return cached
+
+                    span.set(tier="miss")
+                    metrics.inc("volt_cache_lookups_total", cache=func.__name__, result="miss")
+                    ledger.note_cache(func.__name__, "miss")
+                    # Call the actual function
+                    shortfalls = cut_short()
+                    result = func(*args, **kwargs)
+
+                    # Save to cache (validator check is inside .set), unless the
+                    # request cut some of the work short meanwhile: then the
+                    # result may be partial and is only returned
+                    if cut_short() == shortfalls:
+                        cache_instance.set(key_str, result)
+
+                    return result
         
-        # Expose cache instance for manual operations (e.g., clearing)
+        # Expose cache instance and key builder for manual operations
+        # (e.g., clearing, or filling the entry from a streaming variant)
         wrapper.cache = cache_instance
+        wrapper.cache_key = cache_key
         return wrapper
     return decorator
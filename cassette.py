@@ -0,0 +1,288 @@
+"""
+Record/replay of upstream traffic ("cassettes") for deterministic offline runs.
+
+    CASSETTE_MODE=record  python api.py      # real calls, every one recorded
+    CASSETTE_MODE=replay  python api.py      # the same calls answered from disk
+
+A recording replays under the same setup it was made with: a production
+recording with the real base URLs, a benchmarks/e2e_bench.py recording
+with the same bench command (its stand-ins move to a new port each run,
+which matching ignores).
+
+upstream.get() sends its HTTP through get() below, so every provider call
+made by metadata_engine, saavn_engine, lastfm_engine, itunes.py and the
+/api/stream proxy is covered; yt_engine records its yt-dlp extractions with
+call(). Provider health, deadlines, the call budget and metrics still run
+around the call in both modes, so a replay exercises the same code.
+
+- record: the call goes out as usual and its outcome (status, headers, body
+  or exception, and how long it took) is appended to CASSETTE_DIR/<provider>.jsonl.
+  Workers share the files (appends under flock). Streamed bodies are kept up
+  to CASSETTE_MAX_BODY bytes, recorded as they are relayed.
+- replay: answers from the recordings, matched on provider, method, URL
+  path, query parameters and Range header. The host is left out, so a new
+  port or base URL host still matches. Repeated calls cycle through the
+  recordings of that call in order. CASSETTE_TIMING=original sleeps for
+  the recorded duration (a recording slower than the caller's timeout
+  raises Timeout after it, as the real call did); zero answers at once. A
+  call with no recording raises CassetteMiss, a ConnectionError, so it
+  degrades like an unreachable provider.
+
+Credentials in query parameters (SECRET_PARAMS, e.g. Last.fm's api_key)
+are never written: they are left out of keys and URLs and masked in
+recorded error messages. CASSETTE_DIR is made absolute at import.
+"""
+
+import os
+import re
+import json
+import time
+import base64
+import fcntl
+import threading
+from urllib.parse import urlencode, urlsplit, urlunsplit, parse_qsl
+import requests
+from requests.structures import CaseInsensitiveDict
+import log
+
+MODE = os.getenv("CASSETTE_MODE", "off").lower()          # off | record | replay
+CASSETTE_DIR = os.path.abspath(os.getenv("CASSETTE_DIR", "cassettes"))
+TIMING = os.getenv("CASSETTE_TIMING", "original").lower()  # original | zero
+MAX_BODY = int(os.getenv("CASSETTE_MAX_BODY", str(2 * 1024 * 1024)))
+
+_KEPT_HEADERS = ("Content-Type", "Content-Length", "Content-Range")
+SECRET_PARAMS = ("api_key", "apikey", "access_token", "token", "secret", "client_secret", "password")
+_SECRET_VALUES = re.compile(r"\b(%s)=[^&\s'\"]+" % "|".join(SECRET_PARAMS), re.IGNORECASE)
+_TEXT_TYPES = ("json", "text", "javascript", "xml")
+
+_lock = threading.Lock()
+_tapes = None       # replay: key -> [entries]
+_cursor = {}        # replay: key -> next entry index
+logger = log.get("cassette")
+
+
+class CassetteMiss(requests.exceptions.ConnectionError):
+    """Replay mode and no recording matches the call."""
+
+
+class RecordedError(Exception):
+    """A recorded exception whose type can't be raised again by name."""
+
+
+def _public(query):
+    return [(k, v) for k, v in query if k.lower() not in SECRET_PARAMS]
+
+
+def redact(url):
+    """`url` without secret query parameters."""
+    parts = urlsplit(url)
+    if not parts.query:
+        return url
+    return urlunsplit(parts._replace(query=urlencode(_public(parse_qsl(parts.query, keep_blank_values=True)))))
+
+
+def key(provider, method, url, params=None, headers=None):
+    """Identity of a call: provider, method, URL path with sorted params (no secrets), Range."""
+    parts = urlsplit(url)
+    query = parse_qsl(parts.query, keep_blank_values=True) + [(k, str(v)) for k, v in (params or {}).items()]
+    target = parts.path + (f"?{urlencode(sorted(_public(query)))}" if query else "")
+    byte_range = (headers or {}).get("Range", "")
+    return f"{provider} {method} {target}" + (f" [{byte_range}]" if byte_range else "")
+
+
+# ── Recording ─────────────────────────────────────────────────
+
+def _append(provider, entry):
+    line = json.dumps(entry, ensure_ascii=False, default=str) + "\n"
+    try:
+        os.makedirs(CASSETTE_DIR, exist_ok=True)
+        with open(os.path.join(CASSETTE_DIR, f"{provider}.jsonl"), "a", encoding="utf-8") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.write(line)
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+    except OSError as e:
+        logger.warning("Write failed: %s", e)
+
+
+def _body_fields(body, content_type):
+    if any(t in (content_type or "") for t in _TEXT_TYPES):
+        try:
+            return {"body": body.decode("utf-8")}
+        except UnicodeDecodeError:
+            pass
+    return {"body_b64": base64.b64encode(body).decode("ascii")}
+
+
+def _record_response(provider, call_key, url, resp, elapsed, stream):
+    entry = {
+        "key": call_key,
+        "url": url,
+        "status": resp.status_code,
+        "reason": resp.reason,
+        "headers": {h: resp.headers[h] for h in _KEPT_HEADERS if h in resp.headers},
+        "elapsed": round(elapsed, 4),
+        "recorded_at": round(time.time(), 3),
+    }
+    if not stream:
+        _append(provider, {**entry, **_body_fields(resp.content, resp.headers.get("Content-Type"))})
+        return
+
+    # Streamed: record while the caller relays it, once the body is done
+    relay = resp.iter_content
+
+    def iter_content(chunk_size=1, decode_unicode=False):
+        captured = bytearray()
+        try:
+            for chunk in relay(chunk_size, decode_unicode):
+                if len(captured) < MAX_BODY:
+                    captured += chunk[:MAX_BODY - len(captured)]
+                yield chunk
+        finally:
+            _append(provider, {**entry, **_body_fields(bytes(captured), resp.headers.get("Content-Type"))})
+
+    resp.iter_content = iter_content
+
+
+def _record_error(provider, call_key, url, error, elapsed):
+    _append(provider, {
+        "key": call_key,
+        "url": url,
+        "error": type(error).__name__,
+        "message": _SECRET_VALUES.sub(r"\1=REDACTED", str(error))[:500],
+        "elapsed": round(elapsed, 4),
+        "recorded_at": round(time.time(), 3),
+    })
+
+
+# ── Replay ────────────────────────────────────────────────────
+
+def _load():
+    global _tapes
+    with _lock:
+        if _tapes is not None:
+            return _tapes
+        tapes = {}
+        try:
+            names = sorted(n for n in os.listdir(CASSETTE_DIR) if n.endswith(".jsonl"))
+        except OSError:
+            names = []
+        for name in names:
+            with open(os.path.join(CASSETTE_DIR, name), encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    tapes.setdefault(entry["key"], []).append(entry)
+        logger.info("Replaying %d distinct calls from %s", len(tapes), CASSETTE_DIR)
+        _tapes = tapes
+        return tapes
+
+
+def _next(call_key):
+    entries = _load().get(call_key)
+    if not entries:
+        logger.warning("No recording for %s", call_key)
+        raise CassetteMiss(f"cassette has no recording for {call_key}")
+    with _lock:
+        index = _cursor.get(call_key, 0)
+        _cursor[call_key] = index + 1
+    return entries[index % len(entries)]
+
+
+def _wait(entry, timeout):
+    """Sleeps like the recorded call; Timeout when it outlasted `timeout`."""
+    if TIMING == "zero":
+        return
+    if timeout is not None and entry["elapsed"] > timeout:
+        time.sleep(timeout)
+        raise requests.exceptions.ReadTimeout(f"recorded call took {entry['elapsed']}s (timeout {timeout}s)")
+    time.sleep(entry["elapsed"])
+
+
+def _raise(entry):
+    error = getattr(requests.exceptions, entry["error"], None)
+    if isinstance(error, type) and issubclass(error, Exception):
+        raise error(entry["message"])
+    raise RecordedError(f"{entry['error']}: {entry['message']}")
+
+
+def _response(entry):
+    resp = requests.Response()
+    resp.status_code = entry["status"]
+    resp.reason = entry.get("reason")
+    resp.url = entry["url"]
+    body = (entry["body"].encode("utf-8") if "body" in entry
+            else base64.b64decode(entry.get("body_b64", "")))
+    headers = CaseInsensitiveDict(entry["headers"])
+    if "Content-Length" in headers and int(headers["Content-Length"]) != len(body):
+        # Streamed body recorded only up to CASSETTE_MAX_BODY
+        headers["Content-Length"] = str(len(body))
+        if "Content-Range" in headers:
+            unit_range, _, total = headers["Content-Range"].partition("/")
+            start = int(unit_range.split()[-1].split("-")[0])
+            headers["Content-Range"] = f"bytes {start}-{start + len(body) - 1}/{total}"
+    resp.headers = headers
+    resp.encoding = requests.utils.get_encoding_from_headers(headers)
+    resp._content = body
+    resp._content_consumed = True   # iter_content() serves _content
+    return resp
+
+
+# ── Entry points ──────────────────────────────────────────────
+
+def get(provider, url, **kwargs):
+    """requests.get(url, **kwargs), recorded or replayed according to CASSETTE_MODE."""
+    if MODE not in ("record", "replay"):
+        return requests.get(url, **kwargs)
+    call_key = key(provider, "GET", url, kwargs.get("params"), kwargs.get("headers"))
+
+    if MODE == "replay":
+        entry = _next(call_key)
+        timeout = kwargs.get("timeout")
+        _wait(entry, timeout[-1] if isinstance(timeout, tuple) else timeout)
+        if "error" in entry:
+            _raise(entry)
+        return _response(entry)
+
+    started = time.monotonic()
+    try:
+        resp = requests.get(url, **kwargs)
+    except requests.exceptions.RequestException as e:
+        _record_error(provider, call_key, redact(url), e, time.monotonic() - started)
+        raise
+    _record_response(provider, call_key, redact(url), resp, time.monotonic() - started, kwargs.get("stream", False))
+    return resp
+
+
+def call(provider, call_args, fn):
+    """
+    fn() for a non-HTTP upstream call (e.g. a yt-dlp extraction), its result
+    recorded/replayed as JSON under (provider, call_args).
+    """
+    if MODE not in ("record", "replay"):
+        return fn()
+    call_key = f"{provider} CALL {json.dumps(call_args, sort_keys=True, default=str)}"
+
+    if MODE == "replay":
+        entry = _next(call_key)
+        _wait(entry, None)
+        if "error" in entry:
+            _raise(entry)
+        return entry["value"]
+
+    started = time.monotonic()
+    try:
+        value = fn()
+    except Exception as e:
+        _record_error(provider, call_key, None, e, time.monotonic() - started)
+        raise
+    _append(provider, {
+        "key": call_key,
+        "value": value,
+        "elapsed": round(time.monotonic() - started, 4),
+        "recorded_at": round(time.time(), 3),
+    })
+    return value
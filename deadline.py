@@ -0,0 +1,103 @@
+"""
+Per-request time budgets.
+
+api.py opens a deadline for each play/search request:
+
+    with deadline.scope(PLAY_DEADLINE):
+        hub.resolve_track(...)
+
+The active Deadline lives in a contextvar, so hub and the engines don't
+need an extra argument (and smart_cache keys stay unchanged). Stages read
+it through the helpers below:
+
+- upstream.get() and the yt-dlp calls cap their timeout to the remaining
+  budget and skip the call outright when less than the provider's typical
+  latency is left
+- hub bounds its hedged race by the remaining budget
+
+When the budget is gone DeadlineExceeded is raised. It subclasses
+requests' Timeout, so existing `except RequestException` fallbacks still
+apply, and api.py maps it to 504 — a predictable failure well inside
+Gunicorn's 120s worker timeout. Every raise is counted on the request's
+Deadline (missed()), so smart_cache can tell that a result was built
+while some stage was cut short, even if a fallback swallowed the error.
+
+Code running in worker threads must be submitted with
+contextvars.copy_context() to see the request's deadline.
+"""
+
+import time
+import contextvars
+from contextlib import contextmanager
+from requests.exceptions import Timeout
+
+
+class DeadlineExceeded(Timeout):
+    """The request's time budget ran out before a stage could finish."""
+
+
+class Deadline:
+    def __init__(self, seconds):
+        self.budget = seconds
+        self.expires_at = time.monotonic() + seconds
+        self.missed = 0     # stages cut short so far
+
+    def remaining(self):
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self):
+        return self.remaining() <= 0
+
+
+_current = contextvars.ContextVar("request_deadline", default=None)
+
+
+@contextmanager
+def scope(seconds):
+    """Runs the block under a fresh deadline of `seconds`."""
+    token = _current.set(Deadline(seconds))
+    try:
+        yield _current.get()
+    finally:
+        _current.reset(token)
+
+
+def current():
+    """The active Deadline, or None outside a request scope (refresher, scripts)."""
+    return _current.get()
+
+
+def remaining(default=None):
+    d = _current.get()
+    return d.remaining() if d else default
+
+
+def missed():
+    """How many stages the current request's deadline has cut short (0 outside a scope)."""
+    d = _current.get()
+    return d.missed if d else 0
+
+
+def exceeded(message):
+    """A DeadlineExceeded to raise, counted on the current deadline."""
+    d = _current.get()
+    if d is not None:
+        d.missed += 1
+    return DeadlineExceeded(message)
+
+
+def check(stage, needed=0.0):
+    """Raises DeadlineExceeded unless more than `needed` seconds are left for `stage`."""
+    d = _current.get()
+    if d is None:
+        return
+    left = d.remaining()
+    if left <= 0 or left < needed:
+        need = f", needs ~{needed:.1f}s" if needed else ""
+        raise exceeded(f"{stage}: {left:.1f}s left of {d.budget:g}s budget{need}")
+
+
+def cap(timeout):
+    """`timeout` limited to the remaining budget (unchanged outside a request scope)."""
+    d = _current.get()
+    return timeout if d is None else min(timeout, d.remaining())
@@ -233,7 +233,8 @@ export function SongListRow({ song, delay = 0, active, paused, onSelect, index }
 
     const handleArtistClick = (artistName, e) => {
         e.stopPropagation();
-        navigate(`/artist/${encodeURIComponent(artistName)}`);
+        const idParam = song.artist_id && artistName === song.artist ? `?id=${song.artist_id}` : '';
+        navigate(`/artist/${encodeURIComponent(artistName)}${idParam}`);
     };
 
     const handleAlbumClick = (e) => {
@@ -1,6 +1,6 @@
 import { useState, useEffect } from 'react';
 import { useNavigate } from 'react-router-dom';
-import { searchMusic } from '@/lib/api';
+import { searchMusic, getHomeSection } from '@/lib/api';
 import { AnimatedSectionHeader, AnimatedAlbumCard } from '@/components/AnimatedCards';
 import { Button } from '@/components/ui/button';
 import { ChevronRight } from 'lucide-react';
@@ -43,6 +43,12 @@ export function ChartsSection({ onSongPlay, onViewAll }) {
             ];
 
             try {
+                const section = await getHomeSection('hindi_charts');
+                if (section && section.songs && section.songs.length > 0) {
+                    if (isMounted) setSongs(section.songs);
+                    return;
+                }
+
                 const songData = await Promise.all(
                     searches.map(async (search) => {
                         try {
@@ -1,5 +1,5 @@
 import { useState, useEffect } from 'react';
-import { searchMusic } from '@/lib/api';
+import { searchMusic, getHomeSection } from '@/lib/api';
 import { AnimatedSectionHeader, AnimatedCategoryCard } from '@/components/AnimatedCards';
 
 const creators = [
@@ -65,7 +65,9 @@ export function NoCopyrightSection({ onCategoryClick }) {
         let cancelled = false;
 
         const loadImages = async () => {
-            const promises = creators.map(c => fetchSongArt(c.itunesQuery, c.fallbackColor, c.name));
+            const section = await getHomeSection('no_copyright');
+            const homeImages = (section && section.images) || {};
+            const promises = creators.map(c => homeImages[c.itunesQuery] || fetchSongArt(c.itunesQuery, c.fallbackColor, c.name));
             const results = await Promise.all(promises);
             if (!cancelled) {
                 setImages(results);
@@ -56,6 +56,7 @@ export function RecentHindiReleases({ onViewAll }) {
                 album: song.album || null,
                 album_id: song.album_id || null,
                 search_term: song.search_term,
+                track_id: song.track_id || null,
                 queue: songs,
                 currentIndex: idx,
             }
@@ -71,7 +71,7 @@ export function RecentSearches({ onSearchClick }) {
         } else if (item.type === 'album') {
             navigate(`/album/${item.id}`);
         } else if (item.type === 'artist') {
-            navigate(`/artist/${encodeURIComponent(item.name)}`);
+            navigate(`/artist/${encodeURIComponent(item.name)}${item.artist_id ? `?id=${item.artist_id}` : ''}`);
         }
     };
 
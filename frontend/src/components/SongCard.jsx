@@ -66,7 +66,9 @@ export function SongCard({ song, onPlay, isPlaying = false }) {
 
     const handleArtistClick = (artistName, e) => {
         e.stopPropagation(); // Prevent song play when clicking artist
-        navigate(`/artist/${encodeURIComponent(artistName)}`);
+        // The iTunes artist_id only identifies the song's primary credit
+        const idParam = song.artist_id && artistName === song.artist ? `?id=${song.artist_id}` : '';
+        navigate(`/artist/${encodeURIComponent(artistName)}${idParam}`);
     };
 
     const handleAlbumClick = (e) => {
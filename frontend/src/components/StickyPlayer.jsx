@@ -7,12 +7,16 @@ import {
     RotateCcw, Shuffle, Zap, Play, Pause, ListMusic, Maximize2, MoreHorizontal,
     ListPlus, CheckCircle2, Disc
 } from 'lucide-react';
-import { getAudioStream, getVideoPreview } from '@/lib/api';
+import { getAudioStream, getVideoPreview, declareQueue, resolveBatch } from '@/lib/api';
 import { MusicBars } from './MusicBars';
 import { usePlaylist } from '@/context/PlaylistContext';
 import { AnimatedLogo } from '@/components/AnimatedLogo';
 import { PlayerError, PlayerLoadingState } from './PlayerError';
 
+// Upcoming tracks resolved in one /api/play/batch request (see below)
+const BATCH_AHEAD = 10;
+const BATCH_MIN = 5;
+
 export function StickyPlayer() {
     const [player, setPlayer] = useState(null);
     const [isPlaying, setIsPlaying] = useState(false);
@@ -31,6 +35,8 @@ export function StickyPlayer() {
     const audioRef = useRef(null);
     const audioCtxRef = useRef(null);
     const sourceRef = useRef(null);
+    const resolvedRef = useRef(new Map()); // search_term -> { stream_url, source } from the batch resolve
+    const resolvingRef = useRef(new Set()); // search_terms in a batch request still streaming
     const navigate = useNavigate();
     const location = useLocation();
     const { openAddToPlaylist, isSongInAnyPlaylist } = usePlaylist();
@@ -162,7 +168,7 @@ export function StickyPlayer() {
             }
 
             try {
-                const { stream_url, source } = await getAudioStream(trackData.search_term, trackData.artist);
+                const { stream_url, source } = await getAudioStream(trackData.search_term, trackData.artist, trackData.track_id);
                 const fullTrack = { ...trackData, stream_url, source };
                 setPlayer(fullTrack);
                 localStorage.setItem('currentTrack', JSON.stringify(fullTrack));
@@ -185,6 +191,31 @@ export function StickyPlayer() {
         };
     }, []);
 
+    // Resolve upcoming tracks ahead of time so skipping through a queue
+    // doesn't need a /api/play call per track. Once BATCH_MIN of the next
+    // BATCH_AHEAD tracks are unresolved they go out in one batch request;
+    // until then the backend resolves the next few (declareQueue). Tracks
+    // resolved or in flight are never asked for again.
+    useEffect(() => {
+        const resolved = resolvedRef.current;
+        const resolving = resolvingRef.current;
+        const unresolved = (s) => s.search_term && !s.stream_url
+            && !resolved.has(s.search_term) && !resolving.has(s.search_term);
+
+        const batch = queue.slice(currentIndex + 1, currentIndex + 1 + BATCH_AHEAD).filter(unresolved);
+        if (batch.length >= BATCH_MIN) {
+            batch.forEach(s => resolving.add(s.search_term));
+            resolveBatch(batch, (index, result) => {
+                if (result.stream_url) resolved.set(batch[index].search_term, result);
+            })
+                .catch((error) => console.error('Batch resolve failed', error))
+                .finally(() => batch.forEach(s => resolving.delete(s.search_term)));
+            return;
+        }
+        const upcoming = queue.slice(currentIndex + 1, currentIndex + 4).filter(unresolved);
+        if (upcoming.length) declareQueue(upcoming);
+    }, [queue, currentIndex]);
+
     // Restore playback position
     useEffect(() => {
         const audio = audioRef.current;
@@ -334,7 +365,8 @@ export function StickyPlayer() {
         setStreamError(null);
         setStreamLoading(true);
         try {
-            const { stream_url, source } = await getAudioStream(song.search_term, song.artist);
+            const { stream_url, source } = resolvedRef.current.get(song.search_term)
+                || await getAudioStream(song.search_term, song.artist, song.track_id);
             const trackData = {
                 title: song.title,
                 artist: song.artist,
@@ -342,6 +374,7 @@ export function StickyPlayer() {
                 album: song.album || null,
                 album_id: song.album_id || null,
                 search_term: song.search_term,
+                track_id: song.track_id || null,
                 stream_url,
                 source,
                 queue: queue,
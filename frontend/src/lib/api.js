@@ -1,5 +1,26 @@
 const API_BASE = import.meta.env.VITE_API_URL || '/api';
 
+// One /api/home request feeds every home-page section. Components ask for
+// their section and fall back to the individual endpoint if it isn't ready.
+const HOME_TTL_MS = 5 * 60 * 1000;
+let homeRequest = null;
+let homeFetchedAt = 0;
+
+export const getHomeSection = async (name) => {
+    if (!homeRequest || Date.now() - homeFetchedAt > HOME_TTL_MS) {
+        homeFetchedAt = Date.now();
+        homeRequest = fetch(`${API_BASE}/home`)
+            .then((response) => (response.ok ? response.json() : null))
+            .catch(() => null);
+    }
+    const home = await homeRequest;
+    const section = home?.sections?.[name];
+    return section && section.status === 'ready' ? section.data : null;
+};
+
+// Categories that are also home-page sections
+const HOME_CATEGORY_SECTIONS = ['popular_albums', 'recent_hindi_releases'];
+
 export const searchMusic = async (query, offset = 0) => {
     const response = await fetch(`${API_BASE}/search`, {
         method: 'POST',
@@ -16,6 +37,45 @@ export const searchMusic = async (query, offset = 0) => {
     return response.json();
 };
 
+// Streams search results category by category (songs first). onCategory is
+// called with (category, items) as each arrives; resolves with the merged result.
+export const searchMusicStream = async (query, onCategory, offset = 0) => {
+    const response = await fetch(`${API_BASE}/search`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ query, offset, stream: true }),
+    });
+    if (response.status === 429) {
+        throw new Error('rate_limit_exceeded');
+    }
+    if (!response.ok || !response.body) {
+        const err = await response.json().catch(() => ({}));
+        throw new Error(err.error || 'Search failed');
+    }
+
+    const results = { songs: [], albums: [], artists: [], playlists: [] };
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    for (;;) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const lines = buffer.split('\n');
+        buffer = lines.pop();
+        for (const line of lines) {
+            if (!line.trim()) continue;
+            const event = JSON.parse(line);
+            if (event.error) throw new Error(event.error);
+            if (event.category) {
+                results[event.category] = event.items;
+                onCategory(event.category, event.items);
+            }
+        }
+    }
+    return results;
+};
+
 export const getAlbumTracks = async (albumId) => {
     const response = await fetch(`${API_BASE}/album/${albumId}`);
     if (response.status === 429) {
@@ -25,8 +85,10 @@ export const getAlbumTracks = async (albumId) => {
     return response.json();
 };
 
-export const getArtistSongs = async (artistName) => {
-    const response = await fetch(`${API_BASE}/artist/${encodeURIComponent(artistName)}`);
+export const getArtistSongs = async (artistName, artistId = null) => {
+    // artistId (iTunes) lets the backend use a precise lookup instead of a name search
+    const idParam = artistId ? `?id=${encodeURIComponent(artistId)}` : '';
+    const response = await fetch(`${API_BASE}/artist/${encodeURIComponent(artistName)}${idParam}`);
     if (response.status === 429) {
         throw new Error('rate_limit_exceeded');
     }
@@ -35,6 +97,10 @@ export const getArtistSongs = async (artistName) => {
 };
 
 export const getCategorySongs = async (categoryId) => {
+    if (HOME_CATEGORY_SECTIONS.includes(categoryId)) {
+        const section = await getHomeSection(categoryId);
+        if (section) return section;
+    }
     const response = await fetch(`${API_BASE}/category/${categoryId}`);
     if (response.status === 429) {
         throw new Error('rate_limit_exceeded');
@@ -43,11 +109,11 @@ export const getCategorySongs = async (categoryId) => {
     return response.json();
 };
 
-export const getAudioStream = async (searchTerm, artistName = null) => {
+export const getAudioStream = async (searchTerm, artistName = null, trackId = null) => {
     const response = await fetch(`${API_BASE}/play`, {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ search_term: searchTerm, artist: artistName }),
+        body: JSON.stringify({ search_term: searchTerm, artist: artistName, track_id: trackId }),
     });
     if (response.status === 429) {
         throw new Error('rate_limit_exceeded');
@@ -59,6 +125,53 @@ export const getAudioStream = async (searchTerm, artistName = null) => {
     return response.json();
 };
 
+// Resolves a whole queue/playlist in one request. onResult(index, result) is
+// called as each track resolves; result is { stream_url, source } or { error }.
+export const resolveBatch = async (tracks, onResult) => {
+    const response = await fetch(`${API_BASE}/play/batch`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({
+            tracks: tracks.map((t) => ({ search_term: t.search_term, artist: t.artist, track_id: t.track_id || null })),
+        }),
+    });
+    if (response.status === 429) {
+        throw new Error('rate_limit_exceeded');
+    }
+    if (!response.ok || !response.body) {
+        const err = await response.json().catch(() => ({}));
+        throw new Error(err.error || 'Batch resolve failed');
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    for (;;) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const lines = buffer.split('\n');
+        buffer = lines.pop();
+        for (const line of lines) {
+            if (!line.trim()) continue;
+            const { index, ...result } = JSON.parse(line);
+            if (index !== undefined) onResult(index, result);
+        }
+    }
+};
+
+// Tells the backend which tracks play next so it can resolve them ahead of
+// time. Fire-and-forget: a failure only means the next track resolves on click.
+export const declareQueue = (tracks) => {
+    fetch(`${API_BASE}/queue`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({
+            tracks: tracks.map((t) => ({ search_term: t.search_term, artist: t.artist, track_id: t.track_id || null })),
+        }),
+    }).catch(() => { });
+};
+
 export const getVideoPreview = async (query) => {
     try {
         const response = await fetch(`${API_BASE}/video-preview?q=${encodeURIComponent(query)}`);
@@ -74,6 +187,8 @@ export const getVideoPreview = async (query) => {
 };
 
 export const getTopArtists = async () => {
+    const section = await getHomeSection('top_artists');
+    if (section) return section;
     const response = await fetch(`${API_BASE}/top-artists`);
     if (response.status === 429) {
         throw new Error('rate_limit_exceeded');
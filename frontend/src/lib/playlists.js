@@ -86,6 +86,7 @@ export function addSongToPlaylist(playlistId, song) {
             album: song.album || null,
             album_id: song.album_id || null,
             search_term: song.search_term || `${song.title} ${song.artist}`,
+            track_id: song.track_id || null,
         });
     }
     savePlaylists(playlists);
@@ -57,6 +57,7 @@ export function AlbumDetail() {
             album: song.album || album?.album_name || null,
             album_id: song.album_id || albumId || null,
             search_term: song.search_term,
+            track_id: song.track_id || null,
         });
         window.dispatchEvent(new CustomEvent('playTrack', {
             detail: {
@@ -66,6 +67,7 @@ export function AlbumDetail() {
                 album: song.album || album.album_name || null,
                 album_id: song.album_id || albumId || null,
                 search_term: song.search_term,
+                track_id: song.track_id || null,
                 queue: album.songs,
                 currentIndex: songIndex,
             }
@@ -86,6 +88,7 @@ export function AlbumDetail() {
                 artist: shuffled[0].artist,
                 img: shuffled[0].image,
                 search_term: shuffled[0].search_term,
+                track_id: shuffled[0].track_id || null,
                 queue: shuffled,
                 currentIndex: 0,
             }
@@ -1,5 +1,5 @@
 import { useState, useEffect } from 'react';
-import { useParams, useNavigate } from 'react-router-dom';
+import { useParams, useNavigate, useSearchParams } from 'react-router-dom';
 import { getArtistSongs } from '@/lib/api';
 import { Button } from '@/components/ui/button';
 import { ArrowLeft, User, AlertCircle, X, Play, Shuffle } from 'lucide-react';
@@ -12,6 +12,7 @@ import {
 
 export function ArtistDetail() {
     const { artistName } = useParams();
+    const [searchParams] = useSearchParams();
     const navigate = useNavigate();
     const [artist, setArtist] = useState(null);
     const [loading, setLoading] = useState(true);
@@ -38,7 +39,7 @@ export function ArtistDetail() {
     useEffect(() => {
         const fetchArtist = async () => {
             try {
-                const data = await getArtistSongs(decodeURIComponent(artistName));
+                const data = await getArtistSongs(decodeURIComponent(artistName), searchParams.get('id'));
                 setArtist(data);
             } catch (error) {
                 console.error('Failed to fetch artist:', error);
@@ -47,7 +48,7 @@ export function ArtistDetail() {
             }
         };
         fetchArtist();
-    }, [artistName]);
+    }, [artistName, searchParams]);
 
     const handlePlaySong = (song, songIndex) => {
         addRecentItem({
@@ -59,6 +60,7 @@ export function ArtistDetail() {
             album: song.album || null,
             album_id: song.album_id || null,
             search_term: song.search_term,
+            track_id: song.track_id || null,
         });
         window.dispatchEvent(new CustomEvent('playTrack', {
             detail: {
@@ -68,6 +70,7 @@ export function ArtistDetail() {
                 album: song.album || null,
                 album_id: song.album_id || null,
                 search_term: song.search_term,
+                track_id: song.track_id || null,
                 queue: artist.songs,
                 currentIndex: songIndex,
             }
@@ -85,6 +88,7 @@ export function ArtistDetail() {
                 album: shuffled[0].album || null,
                 album_id: shuffled[0].album_id || null,
                 search_term: shuffled[0].search_term,
+                track_id: shuffled[0].track_id || null,
                 queue: shuffled,
                 currentIndex: 0,
             }
@@ -3,7 +3,7 @@ import { useSearchParams, useNavigate } from 'react-router-dom';
 import { SearchBar } from '@/components/SearchBar';
 import { RecentSearches, addRecentItem } from '@/components/RecentSearches';
 import { Button } from '@/components/ui/button';
-import { searchMusic, getCategorySongs } from '@/lib/api';
+import { searchMusic, searchMusicStream, getCategorySongs, getHomeSection } from '@/lib/api';
 import { Music, Disc, User, ListMusic, Plus, AlertCircle, X, Zap, Play, Shuffle, Search } from 'lucide-react';
 import { SkeletonCard } from '@/components/SkeletonCard';
 import { usePlaylist } from '@/context/PlaylistContext';
@@ -43,6 +43,7 @@ export function Home() {
     const [searchError, setSearchError] = useState(null);
     const [playError, setPlayError] = useState(null);
     const playErrorTimer = useRef(null);
+    const searchSeq = useRef(0);
 
     // Per-section View All state (search results only)
     const [showAllSongs, setShowAllSongs] = useState(false);
@@ -62,7 +63,10 @@ export function Home() {
         let isMounted = true;
         const fetchTrending = async () => {
             try {
-                const data = await searchMusic('trending global hits');
+                const section = await getHomeSection('trending');
+                const data = section && section.songs && section.songs.length > 0
+                    ? section
+                    : await searchMusic('trending global hits');
                 if (isMounted && data && data.songs) {
                     setTrendingSongs(data.songs.slice(0, 5));
                 }
@@ -134,10 +138,17 @@ export function Home() {
         setShowAllAlbums(false);
         setShowAllArtists(false);
 
+        // Render each category as it streams in (songs arrive first);
+        // results from a superseded search are ignored
+        const seq = ++searchSeq.current;
         try {
-            const data = await searchMusic(searchQuery, 0);
-            setResults(data);
+            await searchMusicStream(searchQuery, (category, items) => {
+                if (seq !== searchSeq.current) return;
+                setResults(prev => ({ songs: [], albums: [], artists: [], playlists: [], ...prev, [category]: items }));
+                setLoading(false);
+            });
         } catch (error) {
+            if (seq !== searchSeq.current) return;
             console.error('Search failed:', error);
             if (error?.message === 'rate_limit_exceeded') {
                 setSearchError("Too many requests. Please wait a moment and try again.");
@@ -212,6 +223,7 @@ export function Home() {
             album: song.album || null,
             album_id: song.album_id || null,
             search_term: song.search_term,
+            track_id: song.track_id || null,
         });
         const trackData = {
             title: song.title,
@@ -220,6 +232,7 @@ export function Home() {
             album: song.album || null,
             album_id: song.album_id || null,
             search_term: song.search_term,
+            track_id: song.track_id || null,
         };
         // If viewing a category, add queue support
         if (currentCategory && results && results.songs) {
@@ -243,6 +256,7 @@ export function Home() {
                 album: firstSong.album || null,
                 album_id: firstSong.album_id || null,
                 search_term: firstSong.search_term,
+                track_id: firstSong.track_id || null,
                 queue: results.songs,
                 currentIndex: 0,
             }
@@ -261,6 +275,7 @@ export function Home() {
                 album: firstSong.album || null,
                 album_id: firstSong.album_id || null,
                 search_term: firstSong.search_term,
+                track_id: firstSong.track_id || null,
                 queue: shuffled,
                 currentIndex: 0,
             }
@@ -697,10 +712,11 @@ export function Home() {
                                                 addRecentItem({
                                                     type: 'artist',
                                                     name: artist.name,
+                                                    artist_id: artist.artist_id || null,
                                                     image: artist.image,
                                                     subtitle: artist.genre || 'Artist',
                                                 });
-                                                navigate(`/artist/${encodeURIComponent(artist.name)}`);
+                                                navigate(`/artist/${encodeURIComponent(artist.name)}${artist.artist_id ? `?id=${artist.artist_id}` : ''}`);
                                             }}
                                         >
                                             <div className="flex flex-col items-center w-full max-w-[150px]">
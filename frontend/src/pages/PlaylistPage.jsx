@@ -36,6 +36,7 @@ export function PlaylistPage() {
                 album: song.album || null,
                 album_id: song.album_id || null,
                 search_term: song.search_term,
+                track_id: song.track_id || null,
                 queue,
                 currentIndex: index,
             }
@@ -1,4 +1,7 @@
 import multiprocessing
+import os
+import subprocess
+import sys
 
 # Binding
 bind = "0.0.0.0:5000"
@@ -14,3 +17,24 @@ keepalive = 5
 accesslog = "-"
 errorlog = "-"
 loglevel = "info"
+
+# Background refresher (see refresher.py)
+# Spawned once by the master, outside the web workers, so category/top-artist
+# rebuilds never run inside request threads. It runs under its own small
+# supervisor process (--supervise), which restarts it after a crash; the
+# master keeps no thread for it. Set RUN_REFRESHER=false when the refresher
+# runs as its own service instead.
+_run_refresher = os.getenv("RUN_REFRESHER", "true").lower() == "true"
+_refresher_proc = None
+
+def when_ready(server):
+    global _refresher_proc
+    if not _run_refresher:
+        return
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "refresher.py")
+    _refresher_proc = subprocess.Popen([sys.executable, script, "--supervise"])
+    server.log.info(f"Started snapshot refresher supervisor (pid {_refresher_proc.pid})")
+
+def on_exit(server):
+    if _refresher_proc and _refresher_proc.poll() is None:
+        _refresher_proc.terminate()
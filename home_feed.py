@@ -0,0 +1,86 @@
+"""
+Home-page sections served together by /api/home.
+
+Each section maps to a snapshot in the SnapshotStore. Category and
+top-artist sections reuse the snapshots refresher.py already writes; the
+search-derived sections (Hindi charts, trending, no-copyright artwork) have
+their builders here and are materialized by the refresher the same way.
+"""
+
+import time
+import metadata_engine
+
+# Searches behind the frontend's ChartsSection (top song of each)
+HINDI_CHART_SEARCHES = [
+    'Tum Hi Ho Arijit Singh',
+    'Kesariya Arijit Singh',
+    'Apna Bana Le Arijit Singh',
+    'Chaleya Arijit Singh',
+    'Satranga Arijit Singh',
+    'O Maahi Arijit Singh',
+]
+
+TRENDING_QUERY = 'trending global hits'
+
+# NoCopyrightSection artwork: iTunes query -> cover image
+NO_COPYRIGHT_QUERIES = [
+    'Cartoon On On feat Daniel Levi',
+    'Alan Walker Faded',
+    'Elektronomia Sky High',
+    'TheFatRat Unity',
+    'Tobu Hope',
+    'Disfigure Blank',
+]
+
+
+def _top_song(query):
+    results = metadata_engine.search_metadata_categorized(query)
+    songs = results.get('songs') if results else None
+    return songs[0] if songs else None
+
+
+def build_hindi_charts():
+    songs = [song for song in (_top_song(q) for q in HINDI_CHART_SEARCHES) if song]
+    return {"songs": songs}
+
+
+def build_trending():
+    results = metadata_engine.search_metadata_categorized(TRENDING_QUERY)
+    return {"songs": (results or {}).get('songs', [])[:5]}
+
+
+def build_no_copyright():
+    images = {}
+    for query in NO_COPYRIGHT_QUERIES:
+        song = _top_song(query)
+        if song and song.get('image'):
+            images[query] = song['image']
+    return {"images": images}
+
+
+# Section name -> snapshot name, freshness budget (seconds) and, for the
+# search-derived sections, the builder the refresher runs.
+SECTIONS = {
+    "top_artists":           {"snapshot": "top_artists",                    "max_age": 21600},
+    "popular_albums":        {"snapshot": "category:popular_albums",        "max_age": 1800},
+    "recent_hindi_releases": {"snapshot": "category:recent_hindi_releases", "max_age": 1800},
+    "hindi_charts":          {"snapshot": "home:hindi_charts",              "max_age": 3600, "build": build_hindi_charts},
+    "trending":              {"snapshot": "home:trending",                  "max_age": 3600, "build": build_trending},
+    "no_copyright":          {"snapshot": "home:no_copyright",              "max_age": 86400, "build": build_no_copyright},
+}
+
+
+def section_entry(name, snapshot_entry, now=None):
+    """Wraps a section payload with its freshness metadata."""
+    if not snapshot_entry:
+        return {"section": name, "status": "pending", "data": None}
+    now = now or time.time()
+    age = int(now - snapshot_entry["generated_at"])
+    return {
+        "section": name,
+        "status": "ready",
+        "generated_at": int(snapshot_entry["generated_at"]),
+        "age_seconds": age,
+        "stale": age > SECTIONS[name]["max_age"],
+        "data": snapshot_entry["payload"],
+    }
@@ -2,15 +2,28 @@ import os
 import metadata_engine
 import saavn_engine
 import yt_engine
-import difflib
-import re
+import resolution_store
+import ranking
+import provider_health
+import source_router
+import deadline
+import tracing
+import ledger
+import profiling
+import log
+import threading
+import time
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, wait, as_completed, FIRST_COMPLETED, TimeoutError as FutureTimeout
 from requests.exceptions import RequestException
 
 DOWNLOAD_DIR = os.path.join(os.getcwd(), 'downloads')
+logger = log.get("hub")
 
 def _find_best_match(results, search_term):
     """
-    Finds the result that best matches the search term using fuzzy string matching.
+    Finds the result that best matches the search term using fuzzy string
+    matching (ranking.fuzzy_match_ratio).
     Returns the best matching result object or None if no good match found.
     """
     if not results:
@@ -20,162 +33,340 @@ def _find_best_match(results, search_term):
     best_result = None
     best_ratio = 0.0
     
-    print(f"   [Hub] Finding best match for: '{search_term}'")
+    verbose = log.verbose(logger)
+    if verbose:
+        logger.debug("Finding best match for: '%s'", search_term)
     
     for res in results:
         # SKIP empty artists (likely bad metadata/user uploads)
         if not res.get('artist') or not res['artist'].strip():
-             print(f"      - [Hub] Skipping result with empty artist: '{res.get('title')}'")
+             if verbose:
+                 logger.debug("   - Skipping result with empty artist: '%s'", res.get('title'))
              continue
 
-        # Clean strings for better matching
-        def clean_str(s):
-            s = s.lower()
-            # Remove common junk
-            for x in ['feat.', 'feat', 'featuring', '&', ',', 'dashed']:
-                s = s.replace(x, '')
-            return ' '.join(s.split())
+        ratio = ranking.fuzzy_match_ratio(search_term, res['title'], res['artist'])
+        if verbose:
+            logger.debug("   - Comparing vs '%s %s' -> Score: %.2f", res['title'], res['artist'], ratio)
 
-        # Construct comparison string from result
-        res_string = f"{res['title']} {res['artist']}".lower()
-
-        clean_search = clean_str(search_term)
-        clean_res = clean_str(res_string)
-        
-        # 2. Token Sort Ratio (Handles word reordering)
-        # "Selena Gomez Marshmello" vs "Marshmello Selena Gomez"
-        sorted_search = ' '.join(sorted(clean_search.split()))
-        sorted_res = ' '.join(sorted(clean_res.split()))
-        
-        # Check strict inclusion on SORTED strings
-        if sorted_search in sorted_res or sorted_res in sorted_search:
-             ratio = 0.9
-             ratio = max(ratio, difflib.SequenceMatcher(None, sorted_search, sorted_res).ratio())
-        else:
-             # Fallback to standard fuzzy
-             ratio = difflib.SequenceMatcher(None, clean_search, clean_res).ratio()
-             
-             # 3. Truncated Artist Check (for long artist lists)
-             # Result might be "Wolves - Marshmello, Selena Gomez, Andrew Wotman..."
-             # We try matching against "Wolves - Marshmello, Selena Gomez"
-             try:
-                 # Split artist by common separators
-                 artists = re.split(r',|&|feat\.|feat', res['artist'])
-                 if len(artists) > 1:
-                     # Smart selection: find artists that match query terms
-                     query_words = set(search_term.lower().split())
-                     matching_artists = []
-                     for artist in artists:
-                         artist_words = set(artist.lower().split())
-                         # If any artist word appears in query, it's a match
-                         if artist_words &query_words:
-                             matching_artists.append(artist)
-                     
-                     # Use matching artists if found, otherwise fall back to first 2
-                     if matching_artists:
-                         short_artist = ' '.join(matching_artists)
-                     else:
-                         short_artist = ' '.join(artists[:2])
-                     
-                     short_res_string = f"{res['title']} {short_artist}".lower()
-                     clean_short = clean_str(short_res_string)
-                     ratio_short = difflib.SequenceMatcher(None, clean_search, clean_short).ratio()
-                     ratio = max(ratio, ratio_short)
-                     print(f"      - Shortened comparison vs '{clean_short}' -> Score: {ratio_short:.2f}")
-             except Exception as e:
-                 print(f"DEBUG: Error splitting artists: {e}")
-        
-        print(f"      - Comparing vs '{clean_res}' -> Score: {ratio:.2f}")
-        
-        # 4. Version Preference: Penalize remixes/acoustic/covers when not requested
-        version_keywords = ['remix', 'mix', 'acoustic', 'cover', 'tribute', 'version', 'edit', 'instrumental']
-        query_has_version = any(keyword in search_term.lower() for keyword in version_keywords)
-        result_has_version = any(keyword in res['title'].lower() for keyword in version_keywords)
-        
-        if result_has_version and not query_has_version:
-            # Apply penalty to non-original versions when user didn't request them
-            penalty = 0.15
-            ratio = max(0, ratio - penalty)
-            print(f"      - Version penalty applied (remix/acoustic/cover not requested) -> Adjusted: {ratio:.2f}")
-        
         if ratio > best_ratio:
             best_ratio = ratio
             best_result = res
             
     # Threshold: Lowered to 0.35 to catch valid matches with extra artist info
     if best_ratio < 0.35:
-        print(f"   [Hub] Best match score ({best_ratio:.2f}) is too low. Skipping Saavn.")
+        logger.info("Best match score (%.2f) is too low. Skipping Saavn.", best_ratio)
         return None
         
-    print(f"   [Hub] Selected Best Match: '{best_result['title']}' ({best_ratio:.2f})")
+    logger.info("Selected Best Match: '%s' (%.2f)", best_result['title'], best_ratio)
     return best_result
 
-def get_audio_link(search_term, artist_name=None):
+# A first YouTube search hit is unranked, so it gets a flat confidence
+# that just clears resolution_store.MIN_CONFIDENCE by default; such rows
+# expire after RESOLUTION_YOUTUBE_TTL rather than the weekly RESOLUTION_TTL.
+YOUTUBE_MATCH_CONFIDENCE = 0.5
+
+def _saavn_confidence(track):
+    """Maps search_saavn_enhanced's score to [0, 1]: exact title + primary artist (200) is 1.0."""
+    return max(0.0, min(1.0, track.get('match_score', 0) / 200))
+
+def _resolve_saavn(search_term, artist_name=None):
     """
-    Takes the clean string from Apple (e.g. 'Starboy The Weeknd')
-    and matches it to a real audio file.
+    Saavn leg of the play pipeline (steps 2-4).
+    Returns a resolution dict (source, url, saavn_id, confidence) or None
+    when Saavn has no playable match.
     """
-    SEP = "─" * 55
-    print(f"\n{SEP}")
-    print(f"🎵 [PIPELINE] STEP 1 — Query received")
-    print(f"   Search Term : {search_term!r}")
-    print(f"   Artist Hint : {artist_name!r}")
-    print(SEP)
-
     # ── STEP 2: JioSaavn Enhanced Search ─────────────────────
     artist_filter = [artist_name] if artist_name else None
     saavn_results = []
     try:
-        print(f"\n🔍 [PIPELINE] STEP 2 — Searching JioSaavn …")
-        saavn_results = saavn_engine.search_saavn_enhanced(search_term, artist_filter=artist_filter)
-        print(f"   Saavn returned {len(saavn_results)} usable result(s) after filtering/ranking")
+        logger.debug("🔍 [PIPELINE] STEP 2 — Searching JioSaavn …")
+        with tracing.span("saavn.search") as span:
+            saavn_results = saavn_engine.search_saavn_enhanced(search_term, artist_filter=artist_filter)
+            span.set(results=len(saavn_results))
+        logger.debug("   Saavn returned %d usable result(s) after filtering/ranking", len(saavn_results))
     except Exception as e:
-        print(f"   ⚠️  Saavn search failed: {e}")
+        logger.warning("⚠️  Saavn search failed: %s", e)
 
     # ── STEP 3: Select best ranked result ────────────────────
-    best_match = None
-    if saavn_results:
-        print(f"\n🏆 [PIPELINE] STEP 3 — Top Saavn candidates (ranked best → worst):")
+    if not saavn_results:
+        logger.info("⚠️  [PIPELINE] STEP 3 — No Saavn results. Jumping to YouTube fallback.")
+        return None
+
+    if log.verbose(logger):
+        logger.debug("🏆 [PIPELINE] STEP 3 — Top Saavn candidates (ranked best → worst):")
         for i, r in enumerate(saavn_results[:5]):
             marker = "✅ SELECTED" if i == 0 else f"   #{i+1}"
-            has_url = "✓ has stream URL" if r.get('url') else "✗ no stream URL"
-            print(f"   {marker}  '{r['title']}' — {r['artist']}  ({has_url})")
-        best_match = saavn_results[0]
-        print(f"\n   Winner: '{best_match['title']}' by '{best_match['artist']}'")
-    else:
-        print(f"\n   ⚠️  [PIPELINE] STEP 3 — No Saavn results. Jumping to YouTube fallback.")
+            logger.debug("   %s  '%s' — %s", marker, r['title'], r['artist'])
+        logger.debug("   Winner: '%s' by '%s'", saavn_results[0]['title'], saavn_results[0]['artist'])
 
     # ── STEP 4: Resolve stream URL ────────────────────────────
-    if best_match:
-        if best_match.get('url'):
-            print(f"\n🔗 [PIPELINE] STEP 4 — Stream URL resolved via Saavn")
-            print(f"   Source  : JioSaavn")
-            print(f"   URL     : {best_match['url'][:80]}…")
-            print(f"\n✅ [PIPELINE] DONE — Sending Saavn stream to player")
-            print(SEP + "\n")
-            return best_match['url'], 'saavn'
-        else:
-            print(f"\n   ⚠️  [PIPELINE] STEP 4 — Best Saavn match has no stream URL. Falling back to YouTube.")
+    # Only the winner's token is decrypted; if it is broken the next-ranked
+    # candidate takes its place (search_saavn used to drop those up front)
+    for rank, best_match in enumerate(saavn_results):
+        with tracing.span("saavn.decrypt", rank=rank):
+            url = saavn_engine.resolve_url(best_match)
+        if not url:
+            continue
+        logger.debug("🔗 [PIPELINE] STEP 4 — Stream URL resolved via Saavn: '%s' — %s  URL: %.80s…",
+                     best_match['title'], best_match['artist'], url)
+        return {
+            "source": "saavn",
+            "url": url,
+            "saavn_id": best_match.get('id'),
+            "confidence": _saavn_confidence(best_match),
+        }
 
-    # ── STEP 5: YouTube fallback ──────────────────────────────
-    print(f"\n🎬 [PIPELINE] STEP 5 — Trying YouTube fallback …")
+    logger.warning("⚠️  [PIPELINE] STEP 4 — No Saavn candidate has a usable stream URL. Falling back to YouTube.")
+    return None
+
+def _resolve_youtube(search_term, cancelled=None):
+    """
+    YouTube leg of the play pipeline (step 5).
+    Returns a resolution dict (source, url, video_id, confidence) or None.
+    `cancelled` (threading.Event) lets a hedged race stop this leg before
+    the expensive stream extraction.
+    """
     yt_query = f"{search_term} Audio"
-    print(f"   YouTube Query: {yt_query!r}")
-    yt_results = yt_engine.search_youtube(yt_query)
+    logger.debug("🎬 [PIPELINE] STEP 5 — Trying YouTube fallback … query %r", yt_query)
+    with tracing.span("youtube.search") as span:
+        yt_results = yt_engine.search_youtube(yt_query)
+        span.set(results=len(yt_results))
+
+    if cancelled and cancelled.is_set():
+        logger.debug("   YouTube leg cancelled (Saavn won the race)")
+        return None
 
     if yt_results:
         first = yt_results[0]
-        print(f"   YouTube top result: '{first['title']}'")
-        stream_url = yt_engine.resolve_yt_stream(first['url'])
+        logger.debug("   YouTube top result: '%s'", first['title'])
+        with tracing.span("youtube.extract", video_id=first.get('id')):
+            stream_url = yt_engine.resolve_yt_stream(first['url'])
         if stream_url:
-            print(f"   Stream URL: {stream_url[:80]}…")
-            print(f"\n✅ [PIPELINE] DONE — Sending YouTube stream to player")
-            print(SEP + "\n")
-            return stream_url, 'youtube'
+            logger.debug("   Stream URL: %.80s…", stream_url)
+            video_id = first.get('id')
+            if video_id:
+                # The /api/stream proxy resolves by video id next; hand it this URL
+                yt_engine.get_stream_by_id.cache.set(yt_engine.get_stream_by_id.cache_key(video_id), stream_url)
+            return {
+                "source": "youtube",
+                "url": stream_url,
+                "video_id": video_id,
+                "confidence": YOUTUBE_MATCH_CONFIDENCE,
+            }
+    return None
+
+# Per-source concurrency caps for bulk resolution (batch endpoint, prefetch)
+# so a 50-track playlist can't flood Saavn or spawn dozens of yt-dlp runs.
+# Single plays are not capped. Set by resolve_track(leg_limits=...); hedged
+# bulk legs also run on their own pool (see _submit).
+BULK_LEG_LIMITS = {
+    "saavn": threading.BoundedSemaphore(int(os.getenv("BULK_SAAVN_CONCURRENCY", "4"))),
+    "youtube": threading.BoundedSemaphore(int(os.getenv("BULK_YOUTUBE_CONCURRENCY", "2"))),
+}
+_leg_limits = contextvars.ContextVar("leg_limits", default=None)
 
-    print(f"\n❌ [PIPELINE] FAILED — No stream found from either source")
-    print(SEP + "\n")
-    return None, None
+def _run_leg(source, search_term, artist_name=None, cancelled=None):
+    """Runs one resolution leg and reports its outcome to source_router."""
+    limits = _leg_limits.get()
+    slot = limits.get(source) if limits else None
+    if slot and not slot.acquire(timeout=deadline.remaining()):
+        raise deadline.DeadlineExceeded(f"no free {source} slot before the deadline")
+
+    started = time.monotonic()
+    try:
+        with tracing.span(f"leg {source}") as span, ledger.stage(f"leg {source}"):
+            if source == 'saavn':
+                result = _resolve_saavn(search_term, artist_name)
+            else:
+                result = _resolve_youtube(search_term, cancelled)
+            span.set(found=bool(result), cancelled=bool(cancelled and cancelled.is_set()))
+    finally:
+        if slot:
+            slot.release()
+    # A leg we stopped (lost the race, out of budget) says nothing about the source
+    interrupted = (cancelled and cancelled.is_set()) or deadline.remaining(default=1) <= 0
+    if result or not interrupted:
+        source_router.record(search_term, artist_name, source, result, time.monotonic() - started)
+    return result
+
+# ── Hedged resolution ─────────────────────────────────────────
+# If the first leg (normally Saavn, see source_router) hasn't produced a
+# match within PLAY_HEDGE_DELAY seconds, the other leg starts in parallel
+# and the first acceptable result wins (Saavn preferred when both are
+# ready). Set PLAY_HEDGE_DELAY=off to run the legs strictly one after the
+# other. Both the hedge delay and the race itself are bounded by the
+# request's deadline (see deadline.py).
+_hedge_setting = os.getenv("PLAY_HEDGE_DELAY", "3").strip().lower()
+PLAY_HEDGE_DELAY = None if _hedge_setting in ("", "off", "false", "none") else float(_hedge_setting)
+_hedge_pool = ThreadPoolExecutor(
+    max_workers=int(os.getenv("PLAY_HEDGE_WORKERS", "8")),
+    thread_name_prefix="hub-hedge"
+)
+# Bulk legs wait for BULK_LEG_LIMITS slots; on their own pool that wait
+# never holds a thread a foreground /api/play needs for its hedge
+_bulk_leg_pool = ThreadPoolExecutor(
+    max_workers=int(os.getenv("BULK_LEG_WORKERS", "6")),
+    thread_name_prefix="hub-bulk-leg"
+)
+
+def _submit(fn, *args):
+    """
+    Runs fn on the hedge pool (the bulk leg pool under leg limits) with the
+    caller's context (request deadline, trace, profile).
+    """
+    pool = _bulk_leg_pool if _leg_limits.get() else _hedge_pool
+    return pool.submit(contextvars.copy_context().run, profiling.run, fn, *args)
+
+def _future_result(future):
+    try:
+        return future.result()
+    except Exception as e:
+        logger.warning("⚠️  [PIPELINE] Resolution leg failed: %s", e)
+        return None
+
+def _race(order, search_term, artist_name, delay):
+    first, second = order
+    cancelled = threading.Event()
+    first_future = _submit(_run_leg, first, search_term, artist_name, cancelled)
+    try:
+        result = first_future.result(timeout=deadline.cap(delay))
+        # First leg answered in time: same flow as the sequential pipeline
+        return result or _run_leg(second, search_term, artist_name)
+    except FutureTimeout:
+        logger.info("⏱️  [PIPELINE] %s still running after %.1fs — hedging with %s", first, delay, second)
+    except Exception as e:
+        logger.warning("⚠️  %s leg failed: %s", first, e)
+        return _run_leg(second, search_term, artist_name)
+
+    second_future = _submit(_run_leg, second, search_term, artist_name, cancelled)
+    source_of = {first_future: first, second_future: second}
+    pending = {first_future, second_future}
+    while pending:
+        done, pending = wait(pending, timeout=deadline.remaining(), return_when=FIRST_COMPLETED)
+        if not done:
+            # Out of budget: leave both legs behind (their own upstream
+            # calls are capped by the same deadline, so they end soon)
+            logger.warning("⏱️  [PIPELINE] Deadline reached with both legs still running")
+            cancelled.set()
+            break
+        # Source preference: if both legs finished together, Saavn wins
+        for future in sorted(done, key=lambda f: source_of[f] != 'saavn'):
+            result = _future_result(future)
+            if result:
+                # Cancel the loser: a queued leg never starts, a running
+                # YouTube leg stops before stream extraction
+                cancelled.set()
+                for other in pending:
+                    other.cancel()
+                return result
+    return None
+
+def resolve_track(search_term, artist_name=None, track_id=None, leg_limits=None):
+    """
+    Takes the clean string from Apple (e.g. 'Starboy The Weeknd')
+    and matches it to a real audio file.
+
+    Returns a resolution dict ({"source", "url", "saavn_id"/"video_id",
+    "confidence"}) or None. Tracks resolved before are answered from the
+    resolution table without any upstream call; for those YouTube entries
+    "url" is the watch page, since stream URLs expire. `leg_limits`
+    ({source: semaphore}, e.g. BULK_LEG_LIMITS) caps concurrent legs.
+    """
+    logger.info("🎵 [PIPELINE] STEP 1 — Query received: %r (artist %r, track id %r)",
+                search_term, artist_name, track_id)
+
+    with tracing.span("resolution_table") as span, ledger.stage("resolution_table"):
+        stored = resolution_store.lookup(search_term, artist_name, track_id)
+        span.set(hit=bool(stored))
+    if stored:
+        if stored['source'] == 'youtube':
+            stored['url'] = f"https://www.youtube.com/watch?v={stored['video_id']}"
+        age_hours = (time.time() - stored['verified_at']) / 3600
+        logger.info("⚡ [PIPELINE] Resolution table hit — %s (confidence %.2f, verified %.1fh ago)",
+                    stored['source'], stored['confidence'], age_hours)
+        return stored
+
+    order, routed_by = source_router.order(search_term, artist_name)
+    if order != source_router.DEFAULT_ORDER:
+        logger.info("🧭 [PIPELINE] Routing %s first (learned for class %r)", order[0], routed_by)
+
+    limits_token = _leg_limits.set(leg_limits)
+    try:
+        if not provider_health.available("saavn"):
+            logger.info("⚡ [PIPELINE] Saavn circuit is open — going straight to YouTube")
+            result = _run_leg('youtube', search_term, artist_name)
+        elif PLAY_HEDGE_DELAY is None:
+            result = _run_leg(order[0], search_term, artist_name) or _run_leg(order[1], search_term, artist_name)
+        else:
+            result = _race(order, search_term, artist_name, PLAY_HEDGE_DELAY)
+    finally:
+        _leg_limits.reset(limits_token)
+
+    if result:
+        source_label = "Saavn" if result['source'] == 'saavn' else "YouTube"
+        logger.info("✅ [PIPELINE] DONE — Sending %s stream to player", source_label)
+        # YouTube rows are only useful with a video id (stream URLs expire)
+        if result['source'] == 'saavn' or result.get('video_id'):
+            resolution_store.record(
+                search_term, artist_name, track_id, result['source'],
+                url=result['url'] if result['source'] == 'saavn' else None,
+                saavn_id=result.get('saavn_id'),
+                video_id=result.get('video_id'),
+                confidence=result['confidence'],
+            )
+        return result
+
+    logger.warning("❌ [PIPELINE] FAILED — No stream found from either source for %r", search_term)
+    # Tell "nothing matched" apart from "ran out of time" (api.py answers 504)
+    deadline.check("play resolution")
+    return None
+
+def get_audio_link(search_term, artist_name=None, track_id=None):
+    """Returns (url, source) for a track, or (None, None). See resolve_track."""
+    result = resolve_track(search_term, artist_name, track_id)
+    if not result:
+        return None, None
+    return result['url'], result['source']
+
+_batch_pool = ThreadPoolExecutor(
+    max_workers=int(os.getenv("PLAY_BATCH_WORKERS", "6")),
+    thread_name_prefix="hub-batch"
+)
+
+def resolve_batch(tracks):
+    """
+    Resolves many (search_term, artist_name, track_id) tuples concurrently,
+    legs capped by BULK_LEG_LIMITS. Repeats of a track are resolved once.
+
+    Yields (indexes, resolution, error) as each distinct track finishes:
+    `indexes` are its positions in `tracks`, `resolution` is resolve_track's
+    dict or None, `error` the exception it raised. Tracks still running at
+    the request's deadline are yielded with a DeadlineExceeded.
+    """
+    groups = {}
+    for index, track in enumerate(tracks):
+        key = resolution_store.identities(*track)[0]
+        groups.setdefault(key, (track, []))[1].append(index)
+
+    futures = {
+        _batch_pool.submit(contextvars.copy_context().run, profiling.run, resolve_track, *track,
+                           leg_limits=BULK_LEG_LIMITS): indexes
+        for track, indexes in groups.values()
+    }
+    finished = set()
+    try:
+        for future in as_completed(futures, timeout=deadline.remaining()):
+            finished.add(future)
+            error = future.exception()
+            yield futures[future], None if error else future.result(), error
+    except FutureTimeout:
+        for future, indexes in futures.items():
+            if future not in finished:
+                yield indexes, None, deadline.DeadlineExceeded("play batch deadline reached")
+    finally:
+        # Client went away or deadline hit: don't start what's still queued
+        for future in futures:
+            future.cancel()
 
 
 def search_hybrid(user_query, categorized=True, offset=0):
@@ -191,28 +382,29 @@ def search_hybrid(user_query, categorized=True, offset=0):
         If categorized=True: {"songs": [], "albums": [], "artists": [], "playlists": []}
         If categorized=False: Flat list of results (legacy)
     """
-    print(f"--- HUB: Processing '{user_query}' (offset: {offset}) ---")
+    logger.info("Processing '%s' (offset: %s)", user_query, offset)
     
     if categorized:
         # NEW: Return categorized results from iTunes
         try:
-            results = metadata_engine.search_metadata_categorized(user_query, offset=offset)
+            with tracing.span("metadata.search"):
+                results = metadata_engine.search_metadata_categorized(user_query, offset=offset)
             
             if results['songs'] or results['albums'] or results['artists']:
-                print(f"--- HUB: Found categorized results ---")
-                print(f"   Songs: {len(results['songs'])}, Albums: {len(results['albums'])}, Artists: {len(results['artists'])}")
+                logger.info("Found categorized results — Songs: %d, Albums: %d, Artists: %d",
+                            len(results['songs']), len(results['albums']), len(results['artists']))
                 return results
         except RequestException as e:
-            print(f"--- HUB: Metadata search failed (connection error): {e}")
-            print("--- HUB: Falling back to raw search engine. ---")
+            logger.warning("Metadata search failed (connection error): %s. Falling back to raw search engine.", e)
         except Exception as e:
-            print(f"--- HUB: Metadata search failed (unexpected): {e}")
-            print("--- HUB: Falling back to raw search engine. ---")
+            logger.error("Metadata search failed (unexpected): %s. Falling back to raw search engine.", e)
         
         # Fallback: Use raw search if iTunes finds nothing OR fails
-        print("--- HUB: Metadata unavailable. Using raw search fallback. ---")
-        clean_query = yt_engine.smart_autocorrect(user_query)
-        fallback_songs = saavn_engine.search_saavn(clean_query)
+        deadline.check("raw search fallback")
+        logger.info("Metadata unavailable. Using raw search fallback.")
+        with ledger.stage("raw search"):
+            clean_query = yt_engine.smart_autocorrect(user_query)
+            fallback_songs = saavn_engine.search_saavn(clean_query)
         return {
             "songs": fallback_songs,
             "albums": [],
@@ -225,19 +417,59 @@ def search_hybrid(user_query, categorized=True, offset=0):
             results = metadata_engine.search_metadata(user_query)
             
             if results:
-                print(f"--- HUB: Found {len(results)} results on Apple Music ---")
+                logger.info("Found %d results on Apple Music", len(results))
                 return results
         except Exception as e:
-             print(f"--- HUB: Metadata search failed: {e}")
+             logger.warning("Metadata search failed: %s", e)
         
         # STRATEGY 2: Fallback (if iTunes finds nothing)
-        print("--- HUB: Metadata unavailable. Using raw search. ---")
+        logger.info("Metadata unavailable. Using raw search.")
         clean_query = yt_engine.smart_autocorrect(user_query)
-        return saavn_engine.search_saavn(clean_query)
+        # Legacy results are directly playable/downloadable, so every URL is needed
+        return saavn_engine.resolve_urls(saavn_engine.search_saavn(clean_query))
+
+def search_hybrid_stream(user_query, offset=0):
+    """
+    Streaming variant of search_hybrid(categorized=True).
+
+    Yields (category, items) as each category completes — songs first (as
+    soon as iTunes returns them), then albums, artists and playlists. Merged
+    together the events give the same dict search_hybrid returns. If iTunes
+    fails or finds nothing, a final "songs" event carries the raw-search
+    fallback and replaces any earlier (empty) songs event.
+    """
+    logger.info("Streaming '%s' (offset: %s)", user_query, offset)
+
+    emitted = {}
+    try:
+        for category, items in metadata_engine.stream_metadata_categorized(user_query, offset=offset):
+            emitted[category] = items
+            yield category, items
+    except RequestException as e:
+        logger.warning("Metadata search failed (connection error): %s", e)
+    except Exception as e:
+        logger.error("Metadata search failed (unexpected): %s", e)
+
+    # Categories that never arrived (iTunes failed mid-way) are sent empty
+    for category in ("songs", "albums", "artists", "playlists"):
+        if category not in emitted:
+            emitted[category] = []
+            yield category, []
+
+    if emitted["songs"] or emitted["albums"] or emitted["artists"]:
+        return
+
+    # Fallback: Use raw search if iTunes finds nothing OR fails
+    deadline.check("raw search fallback")
+    logger.info("Metadata unavailable. Using raw search fallback.")
+    with ledger.stage("raw search"):
+        clean_query = yt_engine.smart_autocorrect(user_query)
+        fallback_songs = saavn_engine.search_saavn(clean_query)
+    yield "songs", fallback_songs
 
 def download_song(url, source):
     os.makedirs(DOWNLOAD_DIR, exist_ok=True)
-    print(f"--- HUB: Downloading from {source} ---")
+    logger.info("Downloading from %s", source)
     if source == 'saavn':
         return saavn_engine.download_saavn_file(url, DOWNLOAD_DIR)
     elif source == 'yt':
@@ -248,7 +480,7 @@ def get_video_preview(search_term, artist=None):
     """
     Finds a video preview (YT stream) for a song.
     """
-    print(f"   [Hub] Finding Video Preview for: {search_term}")
+    logger.info("Finding Video Preview for: %s", search_term)
     
     # Construct a video-specific query
     query = f"{search_term} Official Video"
@@ -258,7 +490,7 @@ def get_video_preview(search_term, artist=None):
     video_url = yt_engine.get_video_url(query)
     
     if video_url:
-        print("   [Hub] Found Video URL!")
+        logger.info("Found Video URL!")
         return video_url
         
     return None
\ No newline at end of file
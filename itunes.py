@@ -3,9 +3,12 @@ iTunes India - Latest Releases sorted by Popularity
 Uses Apple's iTunes RSS Feed API (free, no API key required)
 """
 
-import urllib.request
+import os
 import json
 from datetime import datetime
+import upstream
+
+ITUNES_BASE_URL = os.getenv("ITUNES_BASE_URL", "https://itunes.apple.com").rstrip("/")
 
 
 def parse_link(raw_link):
@@ -47,18 +50,20 @@ def fetch_itunes_india_latest_releases(
         feed_type  : 'newreleases', 'recentreleases', 'topsongs', 'topalbums'
     """
     # iTunes RSS Feed Generator - correct URL format
-    url = f"https://itunes.apple.com/in/rss/{feed_type}/limit={limit}/{media_type}/json"
+    url = f"{ITUNES_BASE_URL}/in/rss/{feed_type}/limit={limit}/{media_type}/json"
 
     print(f"\n🎵 Fetching iTunes India Latest Releases...")
     print(f"   URL: {url}\n")
 
     try:
-        req = urllib.request.Request(
-            url,
-            headers={"User-Agent": "Mozilla/5.0 (iTunes-RSS-Fetcher/1.0)"}
+        # Through upstream.get so the feed is covered by health tracking and cassettes
+        response = upstream.get(
+            "itunes", url,
+            headers={"User-Agent": "Mozilla/5.0 (iTunes-RSS-Fetcher/1.0)"},
+            timeout=15
         )
-        with urllib.request.urlopen(req, timeout=15) as response:
-            data = json.loads(response.read().decode("utf-8"))
+        response.raise_for_status()
+        data = response.json()
     except Exception as e:
         print(f"❌ Error fetching data: {e}")
         return []
@@ -1,10 +1,12 @@
 import os
-import requests
+import upstream
 from cache_manager import smart_cache
 import re
+import log
 
 LASTFM_API_KEY = os.getenv('LASTFM_API_KEY', '')
-LASTFM_BASE_URL = "http://ws.audioscrobbler.com/2.0/"
+LASTFM_BASE_URL = os.getenv("LASTFM_BASE_URL", "http://ws.audioscrobbler.com/2.0/")
+logger = log.get("lastfm")
 
 def fix_artwork_url(url):
     if not url: return ''
@@ -25,7 +27,7 @@ def get_global_top_tracks(limit=50):
     Get global top tracks from Last.fm charts.
     """
     if not LASTFM_API_KEY:
-        print("   [LastFM] No API key configured")
+        logger.warning("No API key configured")
         return []
     
     try:
@@ -35,7 +37,7 @@ def get_global_top_tracks(limit=50):
             'format': 'json',
             'limit': limit
         }
-        resp = requests.get(LASTFM_BASE_URL, params=params, timeout=10)
+        resp = upstream.get("lastfm", LASTFM_BASE_URL, params=params)
         data = resp.json()
         
         tracks = data.get('tracks', {}).get('track', [])
@@ -62,7 +64,7 @@ def get_global_top_tracks(limit=50):
         return results
         
     except Exception as e:
-        print(f"   [LastFM] Error fetching global top tracks: {e}")
+        logger.warning("Error fetching global top tracks: %s", e)
         return []
 
 @smart_cache(ttl=1800, validator=lambda x: x and len(x) > 0)
@@ -71,7 +73,7 @@ def get_country_top_tracks(country='india', limit=50):
     Get top tracks for a specific country from Last.fm.
     """
     if not LASTFM_API_KEY:
-        print("   [LastFM] No API key configured")
+        logger.warning("No API key configured")
         return []
     
     try:
@@ -82,7 +84,7 @@ def get_country_top_tracks(country='india', limit=50):
             'country': country,
             'limit': limit
         }
-        resp = requests.get(LASTFM_BASE_URL, params=params, timeout=10)
+        resp = upstream.get("lastfm", LASTFM_BASE_URL, params=params)
         data = resp.json()
         
         tracks = data.get('tracks', {}).get('track', [])
@@ -109,7 +111,7 @@ def get_country_top_tracks(country='india', limit=50):
         return results
         
     except Exception as e:
-        print(f"   [LastFM] Error fetching country top tracks: {e}")
+        logger.warning("Error fetching country top tracks: %s", e)
         return []
 
 @smart_cache(ttl=3600, validator=lambda x: x and len(x) > 0)
@@ -118,7 +120,7 @@ def get_top_artists(limit=20):
     Get global top artists from Last.fm.
     """
     if not LASTFM_API_KEY:
-        print("   [LastFM] No API key configured")
+        logger.warning("No API key configured")
         return []
     
     try:
@@ -128,7 +130,7 @@ def get_top_artists(limit=20):
             'format': 'json',
             'limit': limit
         }
-        resp = requests.get(LASTFM_BASE_URL, params=params, timeout=10)
+        resp = upstream.get("lastfm", LASTFM_BASE_URL, params=params)
         data = resp.json()
         
         artists = data.get('artists', {}).get('artist', [])
@@ -151,10 +153,10 @@ def get_top_artists(limit=20):
         return results
         
     except Exception as e:
-        print(f"   [LastFM] Error fetching top artists: {e}")
+        logger.warning("Error fetching top artists: %s", e)
         return []
 
-DEEZER_API = "https://api.deezer.com"
+DEEZER_API = os.getenv("DEEZER_API_URL", "https://api.deezer.com").rstrip("/")
 
 @smart_cache(ttl=604800, validator=lambda x: bool(x))
 def get_artist_image(artist_name):
@@ -165,10 +167,10 @@ def get_artist_image(artist_name):
     if not artist_name:
         return ''
     try:
-        resp = requests.get(
+        resp = upstream.get(
+            "deezer",
             f"{DEEZER_API}/search/artist",
             params={'q': artist_name, 'limit': 1},
-            timeout=6
         )
         data = resp.json()
         results = data.get('data', [])
@@ -182,5 +184,5 @@ def get_artist_image(artist_name):
                 return url
         return ''
     except Exception as e:
-        print(f"   [Deezer] Error fetching artist image for '{artist_name}': {e}")
+        logger.warning("Error fetching artist image for '%s': %s", artist_name, e)
         return ''
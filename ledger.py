@@ -0,0 +1,225 @@
+"""
+Per-request upstream call ledger, outbound call budget and slow-request log.
+
+api.py opens a ledger for every API request (begin) and closes it on
+teardown (finish). While it is open:
+
+- every outbound provider call (upstream.get, yt-dlp) is charged against
+  the request's budget first: past OUTBOUND_CALL_BUDGET calls, charge()
+  raises CallBudgetExceeded instead of letting the call out. It is a
+  RequestException, so the engines' existing fallbacks degrade the same
+  way they do for an unreachable provider, and the provider's circuit is
+  not blamed. smart_cache doesn't cache a result computed while calls
+  were refused (see cache_manager.cut_short), since it may be partial
+- metrics.upstream_call notes each call (provider, URL template, duration,
+  outcome) and smart_cache notes each lookup (function, memory/disk/miss),
+  both tagged with the pipeline stage they ran in
+- stage("...") blocks in hub/metadata_engine add up where the time went
+
+On finish, a request slower than SLOW_REQUEST_MS (or one that hit its
+budget) is appended to SLOW_LOG as one JSON line, shared by all Gunicorn
+workers, and served by /api/slow. Outside a request (refresher, prefetch)
+there is no ledger and nothing is charged.
+"""
+
+import os
+import re
+import json
+import time
+import fcntl
+import threading
+import contextvars
+from contextlib import contextmanager
+from requests.exceptions import RequestException
+import log
+
+SLOW_LOG = os.path.join("cache", "slow_requests.jsonl")   # under cache_manager.CACHE_DIR
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "3000"))
+SLOW_LOG_MAX_BYTES = int(os.getenv("SLOW_LOG_MAX_BYTES", str(5 * 1024 * 1024)))
+CALL_BUDGET = int(os.getenv("OUTBOUND_CALL_BUDGET", "20"))
+MAX_ENTRIES = 200       # calls / cache lookups kept per request
+
+_ledger = contextvars.ContextVar("request_ledger", default=None)
+_stage = contextvars.ContextVar("ledger_stage", default="request")
+logger = log.get("ledger")
+
+_ID_SEGMENT = re.compile(r"/\d+(?=/|$)")
+
+
+class CallBudgetExceeded(RequestException):
+    """The request already made its allowed number of outbound calls."""
+
+
+class Ledger:
+    def __init__(self, route, query, budget):
+        self.route = route
+        self.query = query
+        self.budget = budget
+        self.started_at = time.time()
+        self.t0 = time.perf_counter()
+        self.charged = 0
+        self.refused = 0
+        self.calls = []
+        self.cache = []
+        self.stages = {}
+        self.lock = threading.Lock()
+
+
+def begin(route, query=None, budget=CALL_BUDGET):
+    """Opens the ledger for the current request; budget=None means unlimited."""
+    ledger = Ledger(route, query, budget)
+    _ledger.set(ledger)
+    return ledger
+
+
+def current():
+    return _ledger.get()
+
+
+def set_budget(budget):
+    """Changes the current request's budget (e.g. scaled to a batch's size)."""
+    ledger = _ledger.get()
+    if ledger:
+        ledger.budget = budget
+
+
+def charge(provider):
+    """Counts one outbound call; raises CallBudgetExceeded once the budget is spent."""
+    ledger = _ledger.get()
+    if ledger is None:
+        return
+    with ledger.lock:
+        if ledger.budget is not None and ledger.charged >= ledger.budget:
+            ledger.refused += 1
+            raise CallBudgetExceeded(f"{provider}: outbound call budget of {ledger.budget} spent")
+        ledger.charged += 1
+
+
+def affordable(calls):
+    """
+    True when the current request may still make `calls` outbound calls.
+    Checked before work that is useless half done; a False counts the calls
+    as refused, as charge() would have. Charges nothing.
+    """
+    ledger = _ledger.get()
+    if ledger is None:
+        return True
+    with ledger.lock:
+        if ledger.budget is None or ledger.charged + calls <= ledger.budget:
+            return True
+        ledger.refused += calls
+        return False
+
+
+def refused():
+    """Calls refused so far in the current request (0 outside one)."""
+    ledger = _ledger.get()
+    return ledger.refused if ledger else 0
+
+
+def url_template(endpoint):
+    """host/path with numeric path segments replaced, e.g. api.deezer.com/artist/{id}."""
+    return _ID_SEGMENT.sub("/{id}", endpoint)
+
+
+def note_call(provider, endpoint, seconds, outcome):
+    ledger = _ledger.get()
+    if ledger is None or len(ledger.calls) >= MAX_ENTRIES:
+        return
+    ledger.calls.append({
+        "provider": provider,
+        "endpoint": url_template(endpoint) if endpoint else None,
+        "ms": round(seconds * 1000, 1),
+        "outcome": outcome or "ok",
+        "stage": _stage.get(),
+    })
+
+
+def note_cache(func_name, tier):
+    ledger = _ledger.get()
+    if ledger is None or len(ledger.cache) >= MAX_ENTRIES:
+        return
+    ledger.cache.append({"cache": func_name, "result": tier, "stage": _stage.get()})
+
+
+@contextmanager
+def stage(name):
+    """Attributes the block's time, calls and cache lookups to `name`."""
+    ledger = _ledger.get()
+    if ledger is None:
+        yield
+        return
+    token = _stage.set(name)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        _stage.reset(token)
+        with ledger.lock:
+            ledger.stages[name] = ledger.stages.get(name, 0.0) + elapsed
+
+
+def finish(status=None, trace_id=None):
+    """Closes the current ledger; slow or over-budget requests are written to SLOW_LOG."""
+    ledger = _ledger.get()
+    if ledger is None:
+        return None
+    _ledger.set(None)
+    duration_ms = (time.perf_counter() - ledger.t0) * 1000
+    if duration_ms < SLOW_REQUEST_MS and not ledger.refused:
+        return ledger
+
+    entry = {
+        "ts": round(ledger.started_at, 3),
+        "route": ledger.route,
+        "query": ledger.query,
+        "status": status,
+        "duration_ms": round(duration_ms, 1),
+        "slowest_stage": max(ledger.stages, key=ledger.stages.get) if ledger.stages else None,
+        "stages_ms": {name: round(s * 1000, 1) for name, s in
+                      sorted(ledger.stages.items(), key=lambda kv: kv[1], reverse=True)},
+        "outbound_calls": ledger.charged,
+        "budget": ledger.budget,
+        "refused_calls": ledger.refused,
+        "calls": ledger.calls,
+        "cache": ledger.cache,
+        "trace_id": trace_id,
+    }
+    logger.warning("Slow request %s %r: %.0f ms, %d outbound calls (%d refused), slowest stage %s",
+                   ledger.route, ledger.query, duration_ms, ledger.charged, ledger.refused,
+                   entry["slowest_stage"])
+    _append(entry)
+    return ledger
+
+
+def _append(entry):
+    line = json.dumps(entry, ensure_ascii=False, default=str) + "\n"
+    try:
+        os.makedirs(os.path.dirname(SLOW_LOG), exist_ok=True)
+        with open(SLOW_LOG, "a", encoding="utf-8") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                if f.tell() > SLOW_LOG_MAX_BYTES:
+                    os.replace(SLOW_LOG, SLOW_LOG + ".1")
+                f.write(line)
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+    except OSError as e:
+        logger.warning("Slow log write failed: %s", e)
+
+
+def recent(limit=50):
+    """Newest slow-request entries, newest first."""
+    try:
+        with open(SLOW_LOG, encoding="utf-8") as f:
+            lines = f.readlines()[-limit:]
+    except OSError:
+        return []
+    entries = []
+    for line in reversed(lines):
+        try:
+            entries.append(json.loads(line))
+        except json.JSONDecodeError:
+            continue
+    return entries
@@ -0,0 +1,141 @@
+"""
+Structured, non-blocking logging for the request path.
+
+    import log
+    logger = log.get("hub")                       # -> "volt.hub"
+    logger.info("Resolved '%s' via %s", term, source)
+    if log.verbose(logger):                       # per-candidate detail
+        for r in results:
+            logger.debug("  candidate '%s' score=%s", r['title'], r['score'])
+
+- Request threads only put records on a bounded queue (QueueHandler); one
+  listener thread formats and writes them. Records are formatted there too,
+  so pass values as %-args rather than pre-formatting f-strings. When the
+  queue is full (stdout stalled) records are dropped, never waited on.
+- LOG_LEVEL sets the default level, LOG_LEVELS per module
+  ("hub=DEBUG,saavn=WARNING").
+- Debug detail is sampled per request: api.py calls sample_request() and
+  only LOG_DEBUG_SAMPLE of requests (plus every traced one) emit DEBUG
+  records; outside a sampled context (no sample_request() call) DEBUG is
+  dropped. verbose() lets hot loops skip building them at all.
+- LOG_FORMAT=json writes one JSON object per line; records made during a
+  traced request carry its trace_id either way.
+"""
+
+import os
+import sys
+import json
+import queue
+import atexit
+import random
+import logging
+import contextvars
+from logging.handlers import QueueHandler, QueueListener
+import tracing
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()
+DEBUG_SAMPLE = float(os.getenv("LOG_DEBUG_SAMPLE", "0.1"))
+QUEUE_SIZE = 10000
+
+ROOT = "volt"
+_sampled = contextvars.ContextVar("log_debug_sampled", default=False)
+
+
+def sample_request(force=False):
+    """Decides whether this request's DEBUG records are kept (call once per request)."""
+    _sampled.set(force or random.random() < DEBUG_SAMPLE)
+
+
+def verbose(logger):
+    """True if DEBUG records from `logger` would be written for the current request."""
+    return logger.isEnabledFor(logging.DEBUG) and _sampled.get()
+
+
+def get(name):
+    return logging.getLogger(f"{ROOT}.{name}")
+
+
+def dropped():
+    """Records dropped so far by this process because the queue was full."""
+    return _DroppingQueueHandler.dropped
+
+
+class _RequestFilter(logging.Filter):
+    """Runs on the calling thread: applies debug sampling and tags the trace id."""
+
+    def filter(self, record):
+        if record.levelno <= logging.DEBUG and not _sampled.get():
+            return False
+        trace = tracing.current()
+        record.trace_id = trace.id if trace else None
+        return True
+
+
+class _DroppingQueueHandler(QueueHandler):
+    dropped = 0
+
+    def prepare(self, record):
+        # Leave msg % args to the listener thread; only render the traceback here
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            _DroppingQueueHandler.dropped += 1
+
+
+class _TextFormatter(logging.Formatter):
+    def format(self, record):
+        line = super().format(record)
+        return f"{line} trace={record.trace_id}" if getattr(record, "trace_id", None) else line
+
+
+class _JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            "thread": record.threadName,
+        }
+        if getattr(record, "trace_id", None):
+            entry["trace_id"] = record.trace_id
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def _configure():
+    root = logging.getLogger(ROOT)
+    if root.handlers:
+        return
+    root.setLevel(LOG_LEVEL)
+    root.propagate = False
+    for item in LOG_LEVELS.split(","):
+        if "=" in item:
+            name, level = item.split("=", 1)
+            get(name.strip()).setLevel(level.strip().upper())
+
+    stream = logging.StreamHandler(sys.stdout)
+    if LOG_FORMAT == "json":
+        stream.setFormatter(_JsonFormatter())
+    else:
+        stream.setFormatter(_TextFormatter("%(asctime)s %(levelname)-7s [%(name)s] %(message)s"))
+
+    handler = _DroppingQueueHandler(queue.Queue(QUEUE_SIZE))
+    handler.addFilter(_RequestFilter())
+    root.addHandler(handler)
+
+    listener = QueueListener(handler.queue, stream)
+    listener.start()
+    atexit.register(listener.stop)
+
+
+_configure()
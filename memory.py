@@ -0,0 +1,208 @@
+"""
+Memory report for the admin endpoints (/api/admin/memory).
+
+- RSS of every process of this Gunicorn instance (the master's children:
+  web workers and the refresher supervisor, plus their children such as
+  the refresher itself), read from /proc on Linux; elsewhere only
+  the answering worker's peak RSS is known
+- entry counts and approximate deep sizes of this worker's in-memory
+  caches (cache_manager registry) and functools.lru_cache tables
+- tracemalloc: start/stop on demand, or for every worker from boot with
+  TRACEMALLOC_FRAMES > 0; diff() compares the current allocations with the
+  baseline taken at start (or at the last rebase)
+
+Cache and tracemalloc numbers are per process; every response says which
+worker (pid) answered. Sizes are estimates: shared objects are counted
+once per cache, and interned strings/small ints are counted as well.
+"""
+
+import os
+import sys
+import gc
+import resource
+import threading
+import tracemalloc
+import cache_manager
+import ranking
+import saavn_engine
+
+TRACEMALLOC_FRAMES = int(os.getenv("TRACEMALLOC_FRAMES", "0"))
+SIZE_LIMIT = 200_000        # objects visited per cache (bounds the report's cost)
+
+_lock = threading.Lock()
+_baseline = None
+
+
+# ── RSS ───────────────────────────────────────────────────────
+
+def _status_rss_kb(pid):
+    try:
+        with open(f"/proc/{pid}/status", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return None
+
+
+def _cmdline(pid):
+    try:
+        with open(f"/proc/{pid}/cmdline", "rb") as f:
+            return f.read().replace(b"\0", b" ").decode(errors="replace").strip()[:120]
+    except OSError:
+        return ""
+
+
+def _siblings():
+    """
+    Pids whose parent is our parent (Gunicorn's master), including ours,
+    and their children (the refresher runs under its supervisor).
+    """
+    parent = os.getppid()
+    parents = {}
+    try:
+        entries = os.listdir("/proc")
+    except OSError:
+        return [os.getpid()]
+    for entry in entries:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", encoding="utf-8") as f:
+                # "pid (comm) state ppid ..."; comm may contain spaces
+                parents[int(entry)] = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, ValueError, IndexError):
+            continue
+    siblings = {pid for pid, ppid in parents.items() if ppid == parent}
+    children = {pid for pid, ppid in parents.items() if ppid in siblings}
+    return sorted(siblings | children) or [os.getpid()]
+
+
+def processes():
+    """[{pid, rss_mb, cmd, self}] for this worker and its siblings."""
+    if not os.path.exists("/proc/self/status"):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        peak_mb = peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+        return [{"pid": os.getpid(), "peak_rss_mb": round(peak_mb, 1), "self": True}]
+    out = []
+    for pid in _siblings():
+        rss = _status_rss_kb(pid)
+        if rss is None:
+            continue
+        out.append({"pid": pid, "rss_mb": round(rss / 1024, 1), "cmd": _cmdline(pid), "self": pid == os.getpid()})
+    return out
+
+
+# ── Cache sizes ───────────────────────────────────────────────
+
+def deep_size(obj, limit=SIZE_LIMIT):
+    """
+    Approximate bytes reachable from obj (containers walked, each object
+    counted once). A lower bound when more than `limit` objects are reachable.
+    """
+    seen = set()
+    stack = [obj]
+    total = 0
+    while stack and len(seen) < limit:
+        o = stack.pop()
+        if id(o) in seen:
+            continue
+        seen.add(id(o))
+        total += sys.getsizeof(o)
+        if isinstance(o, dict):
+            stack.extend(o.keys())
+            stack.extend(o.values())
+        elif isinstance(o, (list, tuple, set, frozenset)):
+            stack.extend(o)
+    return total
+
+
+def caches(sizes=True):
+    out = []
+    for stats, payloads in cache_manager.memory_caches():
+        if sizes:
+            stats["approx_kb"] = round(deep_size(payloads) / 1024, 1)
+        out.append(stats)
+    out.sort(key=lambda c: c.get("approx_kb", c["entries"]), reverse=True)
+    return out
+
+
+def _lru_tables():
+    """functools.lru_cache tables of the scoring/decrypt helpers."""
+    out = []
+    for module in (ranking, saavn_engine):
+        for name, fn in vars(module).items():
+            if callable(fn) and hasattr(fn, "cache_info") and getattr(fn, "__module__", None) == module.__name__:
+                info = fn.cache_info()
+                out.append({"name": f"{module.__name__}.{name}", "entries": info.currsize,
+                            "max_entries": info.maxsize, "hits": info.hits, "misses": info.misses})
+    return out
+
+
+def report(sizes=True):
+    traced = tracemalloc.get_traced_memory() if tracemalloc.is_tracing() else None
+    return {
+        "pid": os.getpid(),
+        "processes": processes(),
+        "caches": caches(sizes),
+        "lru_caches": _lru_tables(),
+        "herd_locks": cache_manager.herd_lock_count(),
+        "gc_objects": len(gc.get_objects()),
+        "tracemalloc": {
+            "tracing": traced is not None,
+            "traced_mb": round(traced[0] / (1024 * 1024), 2) if traced else None,
+            "peak_mb": round(traced[1] / (1024 * 1024), 2) if traced else None,
+        },
+    }
+
+
+# ── tracemalloc ───────────────────────────────────────────────
+
+def _snapshot():
+    return tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    ))
+
+
+def start(frames=None):
+    """Starts tracemalloc (if needed) and takes the baseline snapshot."""
+    global _baseline
+    with _lock:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames or TRACEMALLOC_FRAMES or 10)
+        _baseline = _snapshot()
+
+
+def stop():
+    global _baseline
+    with _lock:
+        _baseline = None
+        tracemalloc.stop()
+
+
+def diff(limit=25, group_by="lineno", rebase=False):
+    """
+    Top allocation changes since the baseline, or None when this worker is
+    not tracing. rebase=True makes the current snapshot the new baseline.
+    """
+    global _baseline
+    with _lock:
+        if not tracemalloc.is_tracing() or _baseline is None:
+            return None
+        snapshot = _snapshot()
+        stats = snapshot.compare_to(_baseline, group_by)[:limit]
+        if rebase:
+            _baseline = snapshot
+    return [{
+        "where": str(stat.traceback[0]) if stat.traceback else "?",
+        "size_kb": round(stat.size / 1024, 1),
+        "size_diff_kb": round(stat.size_diff / 1024, 1),
+        "count": stat.count,
+        "count_diff": stat.count_diff,
+    } for stat in stats]
+
+
+if TRACEMALLOC_FRAMES > 0:
+    start(TRACEMALLOC_FRAMES)
@@ -1,15 +1,24 @@
-import requests
-from requests.exceptions import RequestException
+from requests.exceptions import RequestException, HTTPError
 import datetime
 import os
 from dotenv import load_dotenv
 load_dotenv()
 
-from cache_manager import smart_cache
+from cache_manager import smart_cache, cut_short, WindowCache
+import upstream
+import deadline
+import tracing
+import ledger
+import log
 import random
 import re
 import lastfm_engine
 
+logger = log.get("meta")
+
+# Overridable so benchmarks/e2e_bench.py can point the engine at a stand-in
+ITUNES_BASE_URL = os.getenv("ITUNES_BASE_URL", "https://itunes.apple.com").rstrip("/")
+
 def fix_artwork_url(url):
     if not url: return ''
     # Replace 100x100bb with 600x600bb safely
@@ -28,7 +37,7 @@ def search_metadata(query):
     # print(f"   [Meta] Searching iTunes for: '{query}'")
     try:
         # iTunes Public API
-        url = "https://itunes.apple.com/search"
+        url = f"{ITUNES_BASE_URL}/search"
         params = {
             "term": query,
             "media": "music",
@@ -36,7 +45,7 @@ def search_metadata(query):
             "limit": 10
         }
         
-        resp = requests.get(url, params=params, timeout=5)
+        resp = upstream.get("itunes", url, params=params)
         data = resp.json()
         
         if not data.get('results'):
@@ -70,51 +79,50 @@ def search_metadata(query):
         return clean_results
 
     except RequestException as e:
-        print(f"   [Meta] Connection Error: {e}")
+        logger.warning("Connection Error: %s", e)
         raise e  # Propagate connection errors (timeouts, DNS, etc)
     except Exception as e:
-        print(f"   [Meta] Error: {e}")
+        logger.error("Error: %s", e)
         return []
 
+# Largest fetched window per (term, entity, country, offset); smaller limits
+# are served as slices, so search, artist and category paths share calls.
+_itunes_windows = WindowCache(ttl=3600, name="metadata_engine.itunes_windows")
+
 def _search_itunes_by_entity(query, entity, limit=10, offset=0, country="US"):
     """Helper function to search iTunes by specific entity type"""
-    try:
-        url = "https://itunes.apple.com/search"
+    def fetch(window_limit):
+        url = f"{ITUNES_BASE_URL}/search"
         params = {
             "term": query,
             "media": "music",
             "entity": entity,
-            "limit": limit,
+            "limit": window_limit,
             "offset": offset,
             "country": country
         }
-        
-        resp = requests.get(url, params=params, timeout=5)
+
+        resp = upstream.get("itunes", url, params=params)
+        resp.raise_for_status()  # 403/429 come with a JSON error body, not results
         data = resp.json()
-        
+
         return data.get('results', [])
+
+    try:
+        key = f"itunes_search:{query}:{entity}:{country}:{offset}"
+        return _itunes_windows.get_or_fetch(key, limit, fetch)
+    except HTTPError as e:
+        logger.warning("iTunes API returned status %s searching %s", e.response.status_code, entity)
+        return []
     except RequestException as e:
-        print(f"   [Meta] Connection Error searching {entity}: {e}")
+        logger.warning("Connection Error searching %s: %s", entity, e)
         raise e
     except Exception as e:
-        print(f"   [Meta] Error searching {entity}: {e}")
+        logger.error("Error searching %s: %s", entity, e)
         return []
 
-@smart_cache(ttl=86400, validator=lambda x: x and (x.get('songs') or x.get('albums') or x.get('artists')))
-def search_metadata_categorized(query, offset=0):
-    """
-    Searches iTunes for Songs, Albums, and Artists in separate categories.
-    Returns a dict with categorized results.
-    
-    Args:
-        query: Search term
-        offset: Number of results to skip for pagination
-    """
-    print(f"   [Meta] Searching iTunes (categorized) for: '{query}' (offset: {offset})", flush=True)
-    
-    # Fetch all categories
-    # Reverting to sequential due to Gunicorn worker issues
-    
+def _search_songs_categorized(query, offset):
+    """Songs category: original + merged query results, interleaved and filtered."""
     # 1. Fetch Songs (Interleaved Original + Merged)
     from itertools import zip_longest
     
@@ -125,7 +133,7 @@ def search_metadata_categorized(query, offset=0):
     # Secondary Search (Merged) - Only if spaces exist
     if " " in query:
         merged_query = query.replace(" ", "")
-        print(f"   [Meta] Also searching merged query: '{merged_query}'", flush=True)
+        logger.debug("Also searching merged query: '%s'", merged_query)
         songs_q2 = _search_itunes_by_entity(merged_query, "song", limit=50, offset=offset)
     
     # Interleave results [A1, B1, A2, B2...]
@@ -134,15 +142,7 @@ def search_metadata_categorized(query, offset=0):
         if r1: songs_raw.append(r1)
         if r2: songs_raw.append(r2)
         
-    print(f"   [Meta] Found {len(songs_raw)} raw songs (combined)", flush=True)
-        
-    albums_raw = _search_itunes_by_entity(query, "album", limit=20, offset=offset)
-    print(f"   [Meta] Found {len(albums_raw)} raw albums", flush=True)
-
-    artists_raw = _search_itunes_by_entity(query, "musicArtist", limit=10, offset=offset)
-    print(f"   [Meta] Found {len(artists_raw)} raw artists", flush=True)
-    
-    print(f"   [Meta] Found {len(artists_raw)} raw artists", flush=True)
+    logger.debug("Found %s raw songs (combined)", len(songs_raw))
 
     # Process Songs
     songs = []
@@ -203,11 +203,18 @@ def search_metadata_categorized(query, offset=0):
             "search_term": search_term,
             "source": "apple_meta",
             "album_id": track.get('collectionId', ''),
+            "artist_id": track.get('artistId'),  # Lets the artist page use an ID lookup
+            "track_id": track.get('trackId'),  # Key into the play resolution table
             "preview_url": track.get('previewUrl') # Added preview_url for audio previews
         })
 
-    # Process Albums...
-    
+    return songs
+
+def _search_albums_categorized(query, offset):
+    """Albums category."""
+    albums_raw = _search_itunes_by_entity(query, "album", limit=20, offset=offset)
+    logger.debug("Found %s raw albums", len(albums_raw))
+
     # Process Albums
     albums = []
     seen_albums = set()
@@ -228,7 +235,16 @@ def search_metadata_categorized(query, offset=0):
             "source": "apple_meta",
             "type": "album"
         })
-    
+
+    return albums
+
+ARTIST_IMAGE_CALLS = 2  # worst case per artist: Deezer photo, then an iTunes album cover
+
+def _search_artists_categorized(query, offset):
+    """Artists category (slowest: each artist needs an image lookup)."""
+    artists_raw = _search_itunes_by_entity(query, "musicArtist", limit=10, offset=offset)
+    logger.debug("Found %s raw artists", len(artists_raw))
+
     # Process Artists
     artists = []
     seen_artists = set()
@@ -237,6 +253,19 @@ def search_metadata_categorized(query, offset=0):
         if artist_name in seen_artists or not artist_name:
             continue
         seen_artists.add(artist_name)
+
+        # Image lookups are the slow part; don't start one without the time
+        # or the calls (Deezer, maybe an iTunes album) left for it. Keep the
+        # artists so far instead of failing the whole search (the result is
+        # then partial and not cached, see cache_manager.cut_short)
+        try:
+            deadline.check("artist images")
+        except deadline.DeadlineExceeded as e:
+            logger.info("Stopping after %d artists: %s", len(artists), e)
+            break
+        if not ledger.affordable(ARTIST_IMAGE_CALLS):
+            logger.info("Stopping after %d artists: outbound call budget spent", len(artists))
+            break
         
         # Get artist image — try Last.fm first (real photos), then iTunes album art fallback
         artist_image = lastfm_engine.get_artist_image(artist_name)
@@ -261,13 +290,58 @@ def search_metadata_categorized(query, offset=0):
             "source": "apple_meta",
             "type": "artist"
         })
+
+    return artists
+
+def iter_metadata_categorized(query, offset=0):
+    """
+    Yields (category, items) as each category completes: songs first, then
+    albums, then artists, then playlists.
+    """
+    logger.info("Searching iTunes (categorized) for: '%s' (offset: %s)", query, offset)
+
+    # Fetch all categories
+    # Reverting to sequential due to Gunicorn worker issues
+    for category, search in (("songs", _search_songs_categorized),
+                             ("albums", _search_albums_categorized),
+                             ("artists", _search_artists_categorized)):
+        with tracing.span(f"metadata.{category}") as span, ledger.stage(f"metadata.{category}"):
+            items = search(query, offset)
+            span.set(results=len(items))
+        yield category, items
+    yield "playlists", []  # iTunes API doesn't provide playlists
+
+@smart_cache(ttl=86400, validator=lambda x: x and (x.get('songs') or x.get('albums') or x.get('artists')))
+def search_metadata_categorized(query, offset=0):
+    """
+    Searches iTunes for Songs, Albums, and Artists in separate categories.
+    Returns a dict with categorized results.
     
-    return {
-        "songs": songs,
-        "albums": albums,
-        "artists": artists,
-        "playlists": []  # iTunes API doesn't provide playlists
-    }
+    Args:
+        query: Search term
+        offset: Number of results to skip for pagination
+    """
+    return dict(iter_metadata_categorized(query, offset))
+
+def stream_metadata_categorized(query, offset=0):
+    """
+    Streaming counterpart of search_metadata_categorized. Serves the cached
+    result when present; otherwise yields categories as they complete and
+    fills the same cache entry once all of them are done.
+    """
+    key = search_metadata_categorized.cache_key(query, offset=offset)
+    cached = search_metadata_categorized.cache.get(key)
+    if cached is not None:
+        yield from cached.items()
+        return
+
+    results = {}
+    shortfalls = cut_short()
+    for category, items in iter_metadata_categorized(query, offset):
+        results[category] = items
+        yield category, items
+    if cut_short() == shortfalls:
+        search_metadata_categorized.cache.set(key, results)
 
 @smart_cache(ttl=86400, validator=lambda x: x and x.get('songs'))
 def get_album_tracks(album_id):
@@ -276,13 +350,13 @@ def get_album_tracks(album_id):
     Returns list of songs with metadata.
     """
     try:
-        url = "https://itunes.apple.com/lookup"
+        url = f"{ITUNES_BASE_URL}/lookup"
         params = {
             "id": album_id,
             "entity": "song"
         }
         
-        resp = requests.get(url, params=params, timeout=5)
+        resp = upstream.get("itunes", url, params=params)
         data = resp.json()
         
         results = data.get('results', [])
@@ -305,6 +379,7 @@ def get_album_tracks(album_id):
                     "album": track.get('collectionName', ''),
                     "image": hq_image,
                     "search_term": search_term,
+                    "track_id": track.get('trackId'),
                     "track_number": track.get('trackNumber', 0),
                     "duration_ms": track.get('trackTimeMillis', 0),
                     "source": "apple_meta",
@@ -324,104 +399,164 @@ def get_album_tracks(album_id):
             "songs": songs
         }
     except Exception as e:
-        print(f"   [Meta] Error fetching album tracks: {e}")
+        logger.error("Error fetching album tracks: %s", e)
+        return None
+
+def _lookup_itunes(lookup_id, entity, limit=50, country="US"):
+    """Helper function for the iTunes lookup API (precise, ID-based)"""
+    try:
+        url = f"{ITUNES_BASE_URL}/lookup"
+        params = {
+            "id": lookup_id,
+            "entity": entity,
+            "limit": limit,
+            "country": country
+        }
+
+        resp = upstream.get("itunes", url, params=params)
+        data = resp.json()
+
+        return data.get('results', [])
+    except RequestException as e:
+        logger.warning("Connection Error looking up %s for %s: %s", entity, lookup_id, e)
+        raise e
+    except Exception as e:
+        logger.error("Error looking up %s for %s: %s", entity, lookup_id, e)
+        return []
+
+def _build_artist_page(artist_name, songs_raw, albums_raw):
+    """Formats raw iTunes tracks/collections (already filtered to one artist) into the artist page payload."""
+    songs = []
+    seen_songs = set()
+    for track in songs_raw:
+        unique_key = f"{track.get('trackName', '')}-{track.get('artistName', '')}"
+        if unique_key in seen_songs or not track.get('trackName'):
+            continue
+        seen_songs.add(unique_key)
+
+        hq_image = fix_artwork_url(track.get('artworkUrl100', ''))
+        search_term = f"{track['trackName']} {track['artistName']}"
+
+        songs.append({
+            "title": track['trackName'],
+            "artist": track.get('artistName', 'Unknown Artist'),
+            "album": track.get('collectionName', ''),
+            "image": hq_image,
+            "search_term": search_term,
+            "track_id": track.get('trackId'),
+            "source": "apple_meta",
+            "type": "song",
+            "preview_url": track.get('previewUrl')
+        })
+
+    # Process Albums
+    albums = []
+    seen_albums = set()
+
+    # Pre-process to deduplicate
+    valid_albums = []
+    for album in albums_raw:
+        unique_key = f"{album.get('collectionName', '')}"
+        if unique_key in seen_albums or not album.get('collectionName'):
+            continue
+        seen_albums.add(unique_key)
+        valid_albums.append(album)
+
+    # Sort by Release Date (Newest First)
+    valid_albums.sort(key=lambda x: x.get('releaseDate', ''), reverse=True)
+
+    for album in valid_albums:
+        hq_image = fix_artwork_url(album.get('artworkUrl100', ''))
+
+        albums.append({
+            "title": album['collectionName'],
+            "artist": album.get('artistName', 'Unknown Artist'),
+            "album": album['collectionName'],
+            "image": hq_image,
+            "album_id": album.get('collectionId'),
+            "track_count": album.get('trackCount', 0),
+            "release_date": album.get('releaseDate', '').split('T')[0], # YYYY-MM-DD
+            "source": "apple_meta",
+            "type": "album"
+        })
+
+    # Get artist image — try Deezer first, then iTunes fallback
+    artist_image = lastfm_engine.get_artist_image(artist_name)
+
+    if not artist_image:
+        if valid_albums and valid_albums[0].get('artworkUrl100'):
+            artist_image = valid_albums[0].get('artworkUrl100', '').replace('100x100bb', '600x600bb')
+        elif songs and songs[0].get('image'):
+             artist_image = songs[0].get('image')
+
+    return {
+        "artist_name": artist_name,
+        "artist_image": artist_image,
+        "genre": valid_albums[0].get('primaryGenreName', '') if valid_albums else '',
+        "songs": songs,
+        "albums": albums  # Return ALL sorted albums
+    }
+
+def _get_artist_page_by_id(artist_id):
+    """
+    Artist page via iTunes lookup on artistId: two precise requests that only
+    return this artist's own songs and albums (no name matching, no waste).
+    """
+    songs_lookup = _lookup_itunes(artist_id, "song", limit=20)
+    if not songs_lookup:
         return None
 
+    # First result is the artist wrapper; the rest are the artist's tracks
+    artist_info = songs_lookup[0]
+    artist_name = artist_info.get('artistName', '')
+    songs_raw = [t for t in songs_lookup if t.get('wrapperType') == 'track' and t.get('kind') == 'song']
+
+    albums_lookup = _lookup_itunes(artist_id, "album", limit=200)
+    albums_raw = [a for a in albums_lookup if a.get('wrapperType') == 'collection']
+
+    if not artist_name or not (songs_raw or albums_raw):
+        return None
+
+    return _build_artist_page(artist_name, songs_raw, albums_raw)
+
 @smart_cache(ttl=86400, validator=lambda x: x and (x.get('songs') or x.get('albums')))
-def get_artist_songs(artist_name):
+def get_artist_songs(artist_name, artist_id=None):
     """
     Fetch top songs and ALL albums from a specific artist.
     Returns list of popular songs and sorted albums.
+
+    When the iTunes artist_id is known (search results carry it) the page is
+    built from lookups on that ID; the fuzzy name search below is only used
+    as a fallback.
     """
     try:
+        if artist_id:
+            try:
+                page = _get_artist_page_by_id(artist_id)
+                if page:
+                    return page
+                logger.warning("Artist lookup for id %s returned nothing, falling back to name search", artist_id)
+            except RequestException as e:
+                logger.warning("Artist lookup for id %s failed (%s), falling back to name search", artist_id, e)
+
         # Search for artist's top songs
         songs_raw = _search_itunes_by_entity(artist_name, "song", limit=20)
-        
+
         # Get artist albums (increased limit and sorting)
         albums_raw = _search_itunes_by_entity(artist_name, "album", limit=60)
-        
-        songs = []
-        seen_songs = set()
-        for track in songs_raw:
-            # Only include songs by this exact artist
-            if track.get('artistName', '').lower() != artist_name.lower():
-                continue
-                
-            unique_key = f"{track.get('trackName', '')}-{track.get('artistName', '')}"
-            if unique_key in seen_songs or not track.get('trackName'):
-                continue
-            seen_songs.add(unique_key)
-            
-            hq_image = fix_artwork_url(track.get('artworkUrl100', ''))
-            search_term = f"{track['trackName']} {track['artistName']}"
-            
-            songs.append({
-                "title": track['trackName'],
-                "artist": track.get('artistName', 'Unknown Artist'),
-                "album": track.get('collectionName', ''),
-                "image": hq_image,
-                "search_term": search_term,
-                "source": "apple_meta",
-                "type": "song",
-                "preview_url": track.get('previewUrl')
-            })
-        
-        # Process Albums
-        albums = []
-        seen_albums = set()
-        
-        # Pre-process to filter and deduplicate
-        valid_albums = []
-        for album in albums_raw:
-            # Strict artist match to avoid "Various Artists" compilations
-            if album.get('artistName', '').lower() != artist_name.lower():
-                continue
-                
-            unique_key = f"{album.get('collectionName', '')}"
-            if unique_key in seen_albums or not album.get('collectionName'):
-                continue
-            seen_albums.add(unique_key)
-            valid_albums.append(album)
-            
-        # Sort by Release Date (Newest First)
-        valid_albums.sort(key=lambda x: x.get('releaseDate', ''), reverse=True)
-            
-        for album in valid_albums:
-            hq_image = fix_artwork_url(album.get('artworkUrl100', ''))
-            
-            albums.append({
-                "title": album['collectionName'],
-                "artist": album.get('artistName', 'Unknown Artist'),
-                "album": album['collectionName'],
-                "image": hq_image,
-                "album_id": album.get('collectionId'),
-                "track_count": album.get('trackCount', 0),
-                "release_date": album.get('releaseDate', '').split('T')[0], # YYYY-MM-DD
-                "source": "apple_meta",
-                "type": "album"
-            })
-        
-        # Get artist image — try Deezer first, then iTunes fallback
-        artist_image = lastfm_engine.get_artist_image(artist_name)
-        
-        if not artist_image:
-            if valid_albums and valid_albums[0].get('artworkUrl100'):
-                artist_image = valid_albums[0].get('artworkUrl100', '').replace('100x100bb', '600x600bb')
-            elif songs and songs[0].get('image'):
-                 artist_image = songs[0].get('image')
-        
-        return {
-            "artist_name": artist_name,
-            "artist_image": artist_image,
-            "genre": valid_albums[0].get('primaryGenreName', '') if valid_albums else '',
-            "songs": songs,
-            "albums": albums  # Return ALL sorted albums
-        }
+
+        # Only include songs by this exact artist
+        songs_raw = [t for t in songs_raw if t.get('artistName', '').lower() == artist_name.lower()]
+
+        # Strict artist match to avoid "Various Artists" compilations
+        albums_raw = [a for a in albums_raw if a.get('artistName', '').lower() == artist_name.lower()]
+
+        return _build_artist_page(artist_name, songs_raw, albums_raw)
     except Exception as e:
-        print(f"   [Meta] Error fetching artist songs: {e}")
+        logger.error("Error fetching artist songs: %s", e)
         return None
 
-import difflib
+import ranking
 
 @smart_cache(ttl=7200, validator=lambda x: x is not None)
 def get_video_preview(query):
@@ -430,21 +565,21 @@ def get_video_preview(query):
     Uses fuzzy matching to ensure the video actually matches the song/artist.
     """
     try:
-        url = "https://itunes.apple.com/search"
+        url = f"{ITUNES_BASE_URL}/search"
         params = {
             "term": query,
             "media": "musicVideo",
             "entity": "musicVideo",
             "limit": 5  # increased limit to find better matches
         }
-        resp = requests.get(url, params=params, timeout=5)
+        resp = upstream.get("itunes", url, params=params)
         if resp.status_code != 200:
-            print(f"   [Meta] iTunes API returned status {resp.status_code}")
+            logger.warning("iTunes API returned status %s", resp.status_code)
             return None
         try:
             data = resp.json()
         except Exception as e:
-            print(f"   [Meta] Failed to parse iTunes response: {e}")
+            logger.warning("Failed to parse iTunes response: %s", e)
             return None
         
         if not data.get('results'):
@@ -456,38 +591,7 @@ def get_video_preview(query):
         best_video = None
         
         for vid in data['results']:
-            # Construct a comparison string from the video result
-            vid_title = vid.get('trackName', '')
-            vid_artist = vid.get('artistName', '')
-            vid_string = f"{vid_title} {vid_artist}".lower()
-            
-            # Base fuzzy score
-            ratio = difflib.SequenceMatcher(None, query, vid_string).ratio()
-            
-            # 1. STRICT ARTIST CHECK
-            # If the video artist is completely missing from the query, reject it.
-            # Split artist into words, ignore common joiners like &, feat, etc.
-            artist_words = [w for w in vid_artist.lower().replace('&', '').replace(',', '').split() if w not in ['feat', 'feat.', 'featuring', 'the']]
-            if artist_words:
-                # Check if ANY significant artist word is in the query
-                # Exception: If multiple words, requiring at least one is usually safe.
-                if not any(w in query for w in artist_words):
-                    ratio -= 0.5  # Heavy penalty
-            
-            # 2. STRICT TITLE CHECK
-            # The video title must be somewhat present in the query
-            # "Circles" should not match "Wolves"
-            clean_vid_title = vid_title.lower().split('(')[0].strip() # Remove (Official Video) etc
-            if clean_vid_title not in query:
-                 # Try word based: at least the first word of title must be in query?
-                 first_word = clean_vid_title.split()[0] if clean_vid_title else ""
-                 if first_word and first_word not in query:
-                      ratio -= 0.3
-
-            # Boost score if artist matches perfectly
-            if vid_artist.lower() in query:
-                ratio += 0.1
-
+            ratio = ranking.video_match_ratio(query, vid.get('trackName', ''), vid.get('artistName', ''))
             if ratio > best_ratio:
                 best_ratio = ratio
                 best_video = vid
@@ -499,9 +603,9 @@ def get_video_preview(query):
         if "official video" not in query:
             fallback_query = f"{query} official video"
             params['term'] = fallback_query
-            resp = requests.get(url, params=params, timeout=5)
+            resp = upstream.get("itunes", url, params=params)
             if resp.status_code != 200:
-                print(f"   [Meta] iTunes API returned status {resp.status_code}")
+                logger.warning("iTunes API returned status %s", resp.status_code)
             else:
                 try:
                     data = resp.json()
@@ -509,7 +613,7 @@ def get_video_preview(query):
                         vid = data['results'][0]
                         return vid.get('previewUrl')
                 except Exception as e:
-                    print(f"   [Meta] Failed to parse iTunes response: {e}")
+                    logger.warning("Failed to parse iTunes response: %s", e)
 
         # --- FALLBACK 2: Generic Loop ---
         # If no specific video found, return a high-quality abstract loop
@@ -517,11 +621,52 @@ def get_video_preview(query):
         return "https://cdn.pixabay.com/video/2020/04/18/36427-410774786_large.mp4" # Abstract particles loop
 
     except Exception as e:
-        print(f"   [Meta] Error fetching video preview: {e}")
+        logger.error("Error fetching video preview: %s", e)
         return "https://cdn.pixabay.com/video/2020/04/18/36427-410774786_large.mp4" # Fallback on error too
 
 import lastfm_engine
 
+# Curated queries for each category served by get_category_songs
+# (also the list of categories the background refresher materializes)
+CATEGORY_QUERIES = {
+    'top100': [
+        'Bad Bunny', 'Taylor Swift', 'The Weeknd', 'Drake', 
+        'Olivia Rodrigo', 'SZA', 'Morgan Wallen', 'Doja Cat',
+        'Ariana Grande', 'Ed Sheeran', 'Post Malone', 'Billie Eilish'
+    ],
+    'latest': [
+        'new releases 2024', 'latest hits', 'new songs'
+    ],
+    'trending': [
+        'viral hits', 'trending now', 'popular songs 2024'
+    ],
+    'hits': [
+        # Classic legendary artists — fetch songs NOT greatest-hits compilations
+        'Michael Jackson', 'The Beatles', 'Queen', 'Eagles',
+        'Led Zeppelin', 'David Bowie', 'Elton John', 'ABBA',
+        'Elvis Presley', 'Frank Sinatra', 'Fleetwood Mac', 'The Rolling Stones'
+    ],
+    'charts_hindi': [
+        'Arijit Singh', 'Neha Kakkar', 'Atif Aslam', 
+        'Shreya Ghoshal', 'Badshah', 'Yo Yo Honey Singh',
+        'Jubin Nautiyal', 'B Praak', 'Darshan Raval',
+        'Sachet Tandon', 'Vishal Mishra', 'Sidhu Moose Wala'
+    ],
+    'popular_albums': [
+        'Post Malone', 'Taylor Swift', 'The Weeknd', 
+        'SZA', 'Olivia Rodrigo', 'Drake',
+        'Arijit Singh', 'Dua Lipa', 'Travis Scott',
+        'Billie Eilish', 'Bad Bunny', 'Kendrick Lamar'
+    ],
+    'recent_hindi_releases': [
+        # Most popular current Hindi artists (ordered by popularity/recent activity)
+        'Arijit Singh', 'B Praak', 'Jubin Nautiyal',
+        'Vishal Mishra', 'Darshan Raval', 'Sachet Tandon',
+        'Badshah', 'Neha Kakkar', 'Shreya Ghoshal',
+        'Armaan Malik', 'Atif Aslam', 'Tulsi Kumar'
+    ]
+}
+
 @smart_cache(ttl=1800, validator=lambda x: x and (x.get('songs') or x.get('albums')))
 def get_category_songs(category_id):
     """
@@ -531,7 +676,7 @@ def get_category_songs(category_id):
     try:
         # Use Last.fm for global top charts
         if category_id == 'top100':
-            print(f"   [Meta] Fetching Top 100 from Last.fm...")
+            logger.info("Fetching Top 100 from Last.fm...")
             tracks = lastfm_engine.get_global_top_tracks(limit=50)
             if tracks:
                 # Enrich Last.fm tracks with iTunes artwork + album name
@@ -553,47 +698,7 @@ def get_category_songs(category_id):
                 return {"songs": enriched, "albums": []}
         
         # Use iTunes for Hindi categories (Last.fm shows K-pop for India)
-        # Define curated queries for each category
-        category_queries = {
-            'top100': [
-                'Bad Bunny', 'Taylor Swift', 'The Weeknd', 'Drake', 
-                'Olivia Rodrigo', 'SZA', 'Morgan Wallen', 'Doja Cat',
-                'Ariana Grande', 'Ed Sheeran', 'Post Malone', 'Billie Eilish'
-            ],
-            'latest': [
-                'new releases 2024', 'latest hits', 'new songs'
-            ],
-            'trending': [
-                'viral hits', 'trending now', 'popular songs 2024'
-            ],
-            'hits': [
-                # Classic legendary artists — fetch songs NOT greatest-hits compilations
-                'Michael Jackson', 'The Beatles', 'Queen', 'Eagles',
-                'Led Zeppelin', 'David Bowie', 'Elton John', 'ABBA',
-                'Elvis Presley', 'Frank Sinatra', 'Fleetwood Mac', 'The Rolling Stones'
-            ],
-            'charts_hindi': [
-                'Arijit Singh', 'Neha Kakkar', 'Atif Aslam', 
-                'Shreya Ghoshal', 'Badshah', 'Yo Yo Honey Singh',
-                'Jubin Nautiyal', 'B Praak', 'Darshan Raval',
-                'Sachet Tandon', 'Vishal Mishra', 'Sidhu Moose Wala'
-            ],
-            'popular_albums': [
-                'Post Malone', 'Taylor Swift', 'The Weeknd', 
-                'SZA', 'Olivia Rodrigo', 'Drake',
-                'Arijit Singh', 'Dua Lipa', 'Travis Scott',
-                'Billie Eilish', 'Bad Bunny', 'Kendrick Lamar'
-            ],
-            'recent_hindi_releases': [
-                # Most popular current Hindi artists (ordered by popularity/recent activity)
-                'Arijit Singh', 'B Praak', 'Jubin Nautiyal',
-                'Vishal Mishra', 'Darshan Raval', 'Sachet Tandon',
-                'Badshah', 'Neha Kakkar', 'Shreya Ghoshal',
-                'Armaan Malik', 'Atif Aslam', 'Tulsi Kumar'
-            ]
-        }
-        
-        queries = category_queries.get(category_id, [])
+        queries = CATEGORY_QUERIES.get(category_id, [])
         if not queries:
             return None
         
@@ -691,6 +796,7 @@ def get_category_songs(category_id):
                             "album": track.get('collectionName', ''),
                             "image": hq_image,
                             "search_term": search_term,
+                            "track_id": track.get('trackId'),
                             "source": "apple_meta",
                             "type": "song",
                             "release_date": release_date
@@ -755,6 +861,7 @@ def get_category_songs(category_id):
                                 "album": track.get('collectionName', ''),
                                 "image": hq_image,
                                 "search_term": search_term,
+                                "track_id": track.get('trackId'),
                                 "source": "apple_meta",
                                 "type": "song",
                                 "release_date": track.get('releaseDate', '')
@@ -793,6 +900,7 @@ def get_category_songs(category_id):
                         "album": track.get('collectionName', ''),
                         "image": hq_image,
                         "search_term": search_term,
+                        "track_id": track.get('trackId'),
                         "source": "apple_meta",
                         "type": "song",
                         "preview_url": track.get('previewUrl', '')
@@ -806,11 +914,11 @@ def get_category_songs(category_id):
         return {"songs": all_songs, "albums": all_albums}
         
     except RequestException as e:
-        print(f"   [Meta] Connection Error fetching category songs: {e}")
+        logger.warning("Connection Error fetching category songs: %s", e)
         # For category pages, we might want to return None so the UI shows an error
         raise e
     except Exception as e:
-        print(f"   [Meta] Error fetching category songs: {e}")
+        logger.error("Error fetching category songs: %s", e)
         return None
 
 @smart_cache(ttl=86400, validator=lambda x: x and len(x) > 0)
@@ -819,7 +927,7 @@ def get_top_global_artists():
     Returns a curated list of top global streaming artists.
     Lazily fetches high-quality images via lastfm_engine.
     """
-    print(f"   [Meta] Fetching Top Global Artists list...", flush=True)
+    logger.info("Fetching Top Global Artists list...")
     
     # 12 Artists for a massive grid
     top_artists_list = [
@@ -0,0 +1,276 @@
+"""
+Prometheus metrics, aggregated across Gunicorn workers.
+
+    metrics.inc("volt_stream_bytes_total", len(chunk))
+    metrics.observe("volt_http_request_duration_seconds", 0.12, route="/api/play", ...)
+    with metrics.upstream_call("saavn") as call:
+        ...
+
+Each worker keeps its series in memory and a daemon thread writes them to
+METRICS_DIR/<pid>.json every METRICS_FLUSH_INTERVAL seconds. /api/metrics
+(render) sums every worker's file, so whichever worker answers the scrape
+reports the whole server:
+
+- counters and histograms are summed over all files, including workers that
+  have exited (their counts stay part of the total; files of workers dead
+  for longer than METRICS_RETENTION are pruned, which Prometheus sees as a
+  counter reset)
+- gauges (active streams) only count workers that are still alive
+
+Series are declared in METRICS below; recording an undeclared name is a
+programming error and raises KeyError.
+"""
+
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+import requests
+import log
+import ledger
+import deadline
+from provider_health import ProviderUnavailable
+
+METRICS_DIR = os.path.join("cache", "metrics")   # under cache_manager.CACHE_DIR
+FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", "5"))
+RETENTION = float(os.getenv("METRICS_RETENTION", str(86400)))
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+METRICS = {
+    "volt_http_request_duration_seconds": ("histogram", "API request latency by route, method and status (streamed bodies included)."),
+    "volt_upstream_request_duration_seconds": ("histogram", "Outbound provider call latency (HTTP and yt-dlp)."),
+    "volt_upstream_errors_total": ("counter", "Failed or skipped provider calls by kind."),
+    "volt_active_streams": ("gauge", "Audio streams currently relayed by /api/stream."),
+    "volt_stream_bytes_total": ("counter", "Audio bytes relayed by /api/stream."),
+    "volt_cache_lookups_total": ("counter", "smart_cache lookups by cached function and result (memory, disk, miss)."),
+    "volt_cache_hit_ratio": ("gauge", "Share of smart_cache lookups served from memory or disk."),
+    "volt_log_records_dropped_total": ("counter", "Log records dropped because the log queue was full."),
+}
+
+_lock = threading.Lock()
+_series = {}          # (name, labels) -> float, or [bucket counts..., sum, count] for histograms
+_flusher_pid = None
+
+
+def _key(name, labels):
+    METRICS[name]   # KeyError for undeclared series
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def inc(name, value=1, **labels):
+    key = _key(name, labels)
+    with _lock:
+        _series[key] = _series.get(key, 0) + value
+    _ensure_flusher()
+
+
+def gauge_add(name, delta, **labels):
+    inc(name, delta, **labels)
+
+
+def observe(name, seconds, **labels):
+    key = _key(name, labels)
+    with _lock:
+        hist = _series.get(key)
+        if hist is None:
+            hist = _series[key] = [0] * (len(BUCKETS) + 2)
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                hist[i] += 1
+        hist[-2] += seconds
+        hist[-1] += 1
+    _ensure_flusher()
+
+
+def error_kind(exc):
+    if isinstance(exc, deadline.DeadlineExceeded):
+        return "deadline"
+    if isinstance(exc, ProviderUnavailable):
+        return "circuit_open"
+    if isinstance(exc, ledger.CallBudgetExceeded):
+        return "budget"
+    if isinstance(exc, requests.exceptions.Timeout):
+        return "timeout"
+    if isinstance(exc, requests.exceptions.ConnectionError):
+        return "connection"
+    return type(exc).__name__
+
+
+class _Call:
+    __slots__ = ("error",)
+
+    def __init__(self):
+        self.error = None
+
+    def fail(self, kind):
+        self.error = kind
+
+
+SKIPPED = ("deadline", "circuit_open", "budget")
+
+
+@contextmanager
+def upstream_call(provider, endpoint=None):
+    """
+    Times one provider call; an exception or call.fail(kind) also counts an
+    error. Calls skipped by the deadline, an open circuit or the request's
+    call budget are counted but not timed. The call is also noted in the
+    request's ledger.
+    """
+    call = _Call()
+    started = time.perf_counter()
+    try:
+        yield call
+    except Exception as e:
+        call.error = call.error or error_kind(e)
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        if call.error not in SKIPPED:
+            observe("volt_upstream_request_duration_seconds", elapsed, provider=provider)
+        ledger.note_call(provider, endpoint, elapsed, call.error)
+        if call.error:
+            inc("volt_upstream_errors_total", provider=provider, kind=call.error)
+
+
+# ── Per-worker files ──────────────────────────────────────────
+
+def _path(pid):
+    return os.path.join(METRICS_DIR, f"{pid}.json")
+
+
+def _snapshot():
+    with _lock:
+        series = [[name, list(labels), value if isinstance(value, (int, float)) else list(value)]
+                  for (name, labels), value in _series.items()]
+    series.append(["volt_log_records_dropped_total", [], log.dropped()])
+    return {"pid": os.getpid(), "series": series}
+
+
+def flush():
+    """Writes this worker's series to its file."""
+    try:
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        tmp_path = _path(os.getpid()) + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(_snapshot(), f)
+        os.replace(tmp_path, _path(os.getpid()))
+    except OSError as e:
+        log.get("metrics").warning("Flush failed: %s", e)
+
+
+def _flush_loop():
+    while True:
+        time.sleep(FLUSH_INTERVAL)
+        flush()
+
+
+def _ensure_flusher():
+    # Per process: a worker forked after the first record needs its own thread
+    global _flusher_pid
+    if _flusher_pid == os.getpid():
+        return
+    with _lock:
+        if _flusher_pid == os.getpid():
+            return
+        _flusher_pid = os.getpid()
+    threading.Thread(target=_flush_loop, name="metrics-flush", daemon=True).start()
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _collect():
+    """Merged series of all worker files: (name, labels) -> value."""
+    merged = {}
+    now = time.time()
+    try:
+        entries = [e for e in os.scandir(METRICS_DIR) if e.name.endswith(".json")]
+    except OSError:
+        entries = []
+    for entry in entries:
+        try:
+            with open(entry.path, encoding="utf-8") as f:
+                data = json.load(f)
+            alive = _alive(data["pid"])
+            if not alive and now - entry.stat().st_mtime > RETENTION:
+                os.remove(entry.path)
+                continue
+        except (OSError, ValueError, KeyError):
+            continue
+        for name, labels, value in data["series"]:
+            if name not in METRICS or (METRICS[name][0] == "gauge" and not alive):
+                continue
+            key = (name, tuple(tuple(pair) for pair in labels))
+            if isinstance(value, list):
+                total = merged.setdefault(key, [0] * len(value))
+                for i, v in enumerate(value):
+                    total[i] += v
+            else:
+                merged[key] = merged.get(key, 0) + value
+    return merged
+
+
+def _cache_ratios(merged):
+    lookups, hits = {}, {}
+    for (name, labels), value in merged.items():
+        if name == "volt_cache_lookups_total":
+            labels = dict(labels)
+            lookups[labels["cache"]] = lookups.get(labels["cache"], 0) + value
+            if labels["result"] != "miss":
+                hits[labels["cache"]] = hits.get(labels["cache"], 0) + value
+    return {
+        ("volt_cache_hit_ratio", (("cache", cache),)): hits.get(cache, 0) / total
+        for cache, total in lookups.items() if total
+    }
+
+
+def _labels(pairs):
+    if not pairs:
+        return ""
+    escaped = (
+        k + '="' + v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+        for k, v in pairs
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+def _number(value):
+    return str(int(value)) if float(value).is_integer() else repr(round(value, 6))
+
+
+def render():
+    """All workers' metrics in the Prometheus text exposition format."""
+    flush()
+    merged = _collect()
+    merged.update(_cache_ratios(merged))
+
+    by_name = {}
+    for (name, labels), value in merged.items():
+        by_name.setdefault(name, []).append((labels, value))
+
+    lines = []
+    for name, (kind, help_text) in METRICS.items():
+        if name not in by_name:
+            continue
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in sorted(by_name[name]):
+            if kind != "histogram":
+                lines.append(f"{name}{_labels(labels)} {_number(value)}")
+                continue
+            bounds = [f"{b:g}" for b in BUCKETS] + ["+Inf"]
+            for bound, count in zip(bounds, value[:len(BUCKETS)] + [value[-1]]):
+                lines.append(f"{name}_bucket{_labels(labels + (('le', bound),))} {count}")
+            lines.append(f"{name}_sum{_labels(labels)} {value[-2]:.6f}")
+            lines.append(f"{name}_count{_labels(labels)} {value[-1]}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,134 @@
+"""
+Speculative play resolution.
+
+The first click on a search result and every next-track transition used to
+run hub.resolve_track from scratch. Instead, api.py hands us
+
+- the top PREFETCH_SEARCH_TOP songs of every /api/search response
+- the next PREFETCH_QUEUE_AHEAD tracks the player declares via /api/queue
+
+and they are resolved in the background, which fills the play-resolution
+table (resolution_store) — the click then becomes a table hit.
+
+Prefetching never holds a thread the foreground needs, and its load on
+the providers is bounded (it still shares them, and their circuits, with
+foreground plays):
+
+- it runs on its own small pool (PREFETCH_WORKERS), never on request threads;
+  its legs run under hub's per-source caps for bulk resolution
+  (BULK_LEG_LIMITS) on hub's bulk leg pool, not the foreground hedge pool
+- at most PREFETCH_MAX_PENDING jobs are queued; extra songs are dropped
+- each owner (client + "search"/"queue") has one batch: a new search or a
+  new queue cancels the previous batch's jobs that haven't started
+- jobs skip tracks already in the table and give up while both sources'
+  circuits are open; each runs under its own PREFETCH_DEADLINE
+- /api/play for a track that is being prefetched waits for that job
+  (join) instead of resolving it twice; a job that hasn't started yet is
+  cancelled and the track is resolved in the foreground
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+import hub
+import deadline
+import provider_health
+import resolution_store
+import log
+
+PREFETCH_ENABLED = os.getenv("PREFETCH", "true").lower() == "true"
+PREFETCH_SEARCH_TOP = int(os.getenv("PREFETCH_SEARCH_TOP", "3"))
+PREFETCH_QUEUE_AHEAD = int(os.getenv("PREFETCH_QUEUE_AHEAD", "3"))
+PREFETCH_MAX_PENDING = int(os.getenv("PREFETCH_MAX_PENDING", "24"))
+PREFETCH_DEADLINE = float(os.getenv("PREFETCH_DEADLINE", "20"))
+MAX_OWNERS = 1024
+
+logger = log.get("prefetch")
+
+_pool = ThreadPoolExecutor(
+    max_workers=int(os.getenv("PREFETCH_WORKERS", "2")),
+    thread_name_prefix="prefetch"
+)
+_lock = threading.RLock()   # future callbacks can fire while it is held
+_pending = {}               # identity -> Future
+_batches = OrderedDict()    # owner -> [Future] of its latest batch
+
+
+def _identity(search_term, artist, track_id):
+    return resolution_store.identities(search_term, artist, track_id)[0]
+
+
+def _track_args(song):
+    """(search_term, artist, track_id) from a song payload, or None if it can't be played."""
+    search_term = song.get('search_term')
+    if not search_term:
+        return None
+    track_id = str(song.get('track_id') or '')
+    return search_term, song.get('artist'), track_id if track_id.isdigit() else None
+
+
+def _run(search_term, artist, track_id):
+    if not (provider_health.available("saavn") or provider_health.available("youtube")):
+        return
+    if resolution_store.lookup(search_term, artist, track_id):
+        return
+    log.sample_request()
+    logger.debug("Resolving '%s'", search_term)
+    try:
+        with deadline.scope(PREFETCH_DEADLINE):
+            hub.resolve_track(search_term, artist_name=artist, track_id=track_id,
+                              leg_limits=hub.BULK_LEG_LIMITS)
+    except Exception as e:
+        logger.warning("'%s' failed: %s", search_term, e)
+
+
+def schedule(songs, owner):
+    """
+    Queues background resolution for `songs` (search/queue song payloads),
+    replacing `owner`'s previous batch. Returns how many were queued.
+    """
+    if not PREFETCH_ENABLED:
+        return 0
+    queued = []
+    with _lock:
+        for future in _batches.pop(owner, []):
+            future.cancel()   # no-op for jobs already running
+        for song in songs:
+            args = _track_args(song)
+            if not args:
+                continue
+            key = _identity(*args)
+            if key in _pending or len(_pending) >= PREFETCH_MAX_PENDING:
+                continue
+            future = _pool.submit(_run, *args)
+            _pending[key] = future
+            future.add_done_callback(lambda f, key=key: _forget(key, f))
+            queued.append(future)
+        _batches[owner] = queued
+        while len(_batches) > MAX_OWNERS:
+            _batches.popitem(last=False)
+    return len(queued)
+
+
+def _forget(key, future):
+    with _lock:
+        if _pending.get(key) is future:
+            del _pending[key]
+
+
+def join(search_term, artist=None, track_id=None):
+    """
+    Called by /api/play before resolving: if this track is being prefetched,
+    waits for that job (up to half the request's remaining budget) so the
+    table answers; a job still queued is cancelled instead.
+    """
+    with _lock:
+        future = _pending.get(_identity(search_term, artist, track_id))
+    if future is None or future.cancel():
+        return
+    logger.info("Waiting for in-flight prefetch of '%s'", search_term)
+    try:
+        future.result(timeout=deadline.remaining(default=PREFETCH_DEADLINE) / 2)
+    except FutureTimeout:
+        pass
@@ -0,0 +1,181 @@
+"""
+On-demand cProfile of single API requests.
+
+api.py profiles a request when an admin sends `X-Profile: 1`, or for a
+sampled share of API requests (PROFILE_SAMPLE_RATE, off by default). The
+request thread runs under cProfile from before_request until teardown, so
+a streamed body is included. Work that hub hands to its pools is
+submitted through run(), which profiles it on the pool thread too; the
+per-thread profiles are merged when the request finishes.
+
+Profiles are written to PROFILE_DIR as standard .prof files (pstats /
+snakeviz / `python -m pstats`), newest PROFILE_KEEP kept, and served by
+/api/profile/<id>. The response of a profiled request carries
+`X-Profile-Id`. Each worker profiles one request at a time; a request that
+asks while another is being profiled simply runs unprofiled.
+"""
+
+import io
+import os
+import json
+import time
+import uuid
+import pstats
+import random
+import cProfile
+import threading
+import contextvars
+import log
+
+PROFILE_DIR = os.path.join("cache", "profiles")   # under cache_manager.CACHE_DIR
+SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "100"))
+
+_session = contextvars.ContextVar("profile_session", default=None)
+_busy = threading.Lock()       # one profiled request per worker
+_thread = threading.local()    # set while a thread already runs under a profiler
+logger = log.get("profile")
+
+
+class Session:
+    def __init__(self, name):
+        self.id = uuid.uuid4().hex[:16]
+        self.name = name
+        self.started_at = time.time()
+        self.t0 = time.perf_counter()
+        self.profiles = []
+        self.closed = False
+        self.main = cProfile.Profile()
+
+
+def sampled(force=False):
+    return force or (SAMPLE_RATE > 0 and random.random() < SAMPLE_RATE)
+
+
+def start(name):
+    """Starts profiling the calling thread; None if this worker is already profiling."""
+    if not _busy.acquire(blocking=False):
+        return None
+    session = Session(name)
+    try:
+        session.main.enable()
+    except ValueError:   # Python 3.12+: another profiler is active in this process
+        _busy.release()
+        return None
+    _session.set(session)
+    _thread.active = True
+    return session
+
+
+def current():
+    return _session.get()
+
+
+def run(fn, *args, **kwargs):
+    """fn(*args, **kwargs), profiled when called inside a profiled request's context."""
+    session = _session.get()
+    if session is None or session.closed or getattr(_thread, "active", False):
+        return fn(*args, **kwargs)
+    profile = cProfile.Profile()
+    try:
+        profile.enable()
+    except ValueError:
+        return fn(*args, **kwargs)
+    _thread.active = True
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        profile.disable()
+        _thread.active = False
+        if not session.closed:
+            session.profiles.append(profile)
+
+
+def finish():
+    """Stops the current request's profile, if any, and writes it out."""
+    session = _session.get()
+    if session is None:
+        return None
+    session.main.disable()
+    session.closed = True
+    _session.set(None)
+    _thread.active = False
+    _busy.release()
+    try:
+        _write(session, time.perf_counter() - session.t0)
+    except (OSError, TypeError, ValueError) as e:
+        logger.warning("Write failed: %s", e)
+    return session
+
+
+# ── Storage ───────────────────────────────────────────────────
+
+def _path(profile_id, ext):
+    return os.path.join(PROFILE_DIR, f"{profile_id}.{ext}")
+
+
+def _write(session, duration):
+    stats = pstats.Stats(session.main)
+    for profile in session.profiles:
+        stats.add(profile)
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    stats.dump_stats(_path(session.id, "prof"))
+    with open(_path(session.id, "json"), "w", encoding="utf-8") as f:
+        json.dump({
+            "id": session.id,
+            "name": session.name,
+            "started_at": session.started_at,
+            "duration_ms": round(duration * 1000, 1),
+            "threads": 1 + len(session.profiles),
+        }, f)
+    _prune()
+
+
+def _prune():
+    entries = sorted(
+        (e for e in os.scandir(PROFILE_DIR) if e.name.endswith(".json")),
+        key=lambda e: e.stat().st_mtime, reverse=True
+    )
+    for entry in entries[PROFILE_KEEP:]:
+        for ext in ("json", "prof"):
+            try:
+                os.remove(_path(entry.name[:-5], ext))
+            except OSError:
+                pass
+
+
+def path(profile_id):
+    """Path of a stored .prof file, or None."""
+    if not profile_id.isalnum():
+        return None
+    p = _path(profile_id, "prof")
+    return p if os.path.exists(p) else None
+
+
+def recent(limit=50):
+    """[{id, name, started_at, duration_ms, threads}] for the newest stored profiles."""
+    try:
+        entries = sorted(
+            (e for e in os.scandir(PROFILE_DIR) if e.name.endswith(".json")),
+            key=lambda e: e.stat().st_mtime, reverse=True
+        )[:limit]
+    except OSError:
+        return []
+    out = []
+    for entry in entries:
+        try:
+            with open(entry.path, encoding="utf-8") as f:
+                out.append(json.load(f))
+        except (OSError, json.JSONDecodeError):
+            continue
+    return out
+
+
+def summary(profile_id, sort="cumulative", limit=40):
+    """pstats text report of a stored profile, or None."""
+    p = path(profile_id)
+    if p is None:
+        return None
+    out = io.StringIO()
+    pstats.Stats(p, stream=out).strip_dirs().sort_stats(sort).print_stats(limit)
+    return out.getvalue()
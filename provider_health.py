@@ -0,0 +1,196 @@
+"""
+Per-provider health tracking: circuit breakers + adaptive timeouts.
+
+Every upstream (iTunes, Saavn, Last.fm, Deezer, YouTube/yt-dlp and the
+YouTube CDN behind /api/stream) gets a ProviderHealth that:
+
+- records the latency of successful calls and derives the next timeout from
+  their p95 (TIMEOUT_MULTIPLIER x p95, clamped between the provider's floor
+  and its old fixed timeout — a healthy provider gets a tighter timeout, a
+  slow one never waits longer than before)
+- opens the circuit after FAILURE_THRESHOLD consecutive failures (timeouts,
+  connection errors, 5xx, 429); while open, calls fail immediately with
+  ProviderUnavailable so callers go straight to their fallback
+- after COOLDOWN seconds lets a single probe call through (half-open); a
+  successful probe closes the circuit, a failed one re-opens it with the
+  cooldown doubled (capped at MAX_COOLDOWN)
+
+State is per process (each Gunicorn worker learns on its own).
+"""
+
+import os
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+from requests.exceptions import RequestException
+import deadline
+import ledger
+import log
+
+FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+COOLDOWN = float(os.getenv("CIRCUIT_COOLDOWN", "30"))
+MAX_COOLDOWN = float(os.getenv("CIRCUIT_MAX_COOLDOWN", "300"))
+TIMEOUT_MULTIPLIER = float(os.getenv("UPSTREAM_TIMEOUT_MULTIPLIER", "3"))
+MIN_SAMPLES = 20          # below this the fixed timeout is used
+LATENCY_WINDOW = 200      # successful calls kept for the percentile
+
+logger = log.get("health")
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class ProviderUnavailable(RequestException):
+    """Raised instead of calling a provider whose circuit is open."""
+
+
+class ProviderHealth:
+    def __init__(self, name, max_timeout, min_timeout=1.0):
+        self.name = name
+        self.max_timeout = max_timeout
+        self.min_timeout = min_timeout
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._cooldown = COOLDOWN
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+
+    # ── Timeouts ───────────────────────────────────────────────
+    def _percentile(self, pct):
+        ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+    def timeout(self):
+        """Timeout (seconds) for the next call."""
+        with self._lock:
+            if len(self._latencies) < MIN_SAMPLES:
+                return self.max_timeout
+            adaptive = self._percentile(0.95) * TIMEOUT_MULTIPLIER
+        return max(self.min_timeout, min(self.max_timeout, adaptive))
+
+    def typical_latency(self):
+        """Median latency of recent successful calls (0 until MIN_SAMPLES are in)."""
+        with self._lock:
+            if len(self._latencies) < MIN_SAMPLES:
+                return 0.0
+            return self._percentile(0.5)
+
+    # ── Circuit breaker ────────────────────────────────────────
+    def available(self):
+        """True if a call would be let through right now (does not claim the probe)."""
+        with self._lock:
+            if self._state == OPEN:
+                return time.time() - self._opened_at >= self._cooldown
+            return not (self._state == HALF_OPEN and self._probe_in_flight)
+
+    def before_call(self):
+        """Raises ProviderUnavailable if the circuit rejects this call."""
+        with self._lock:
+            if self._state == OPEN and time.time() - self._opened_at >= self._cooldown:
+                self._state = HALF_OPEN
+                self._probe_in_flight = False
+                logger.info("%s: half-open, sending a probe", self.name)
+            if self._state == OPEN:
+                raise ProviderUnavailable(f"{self.name} circuit is open")
+            if self._state == HALF_OPEN:
+                if self._probe_in_flight:
+                    raise ProviderUnavailable(f"{self.name} is being probed")
+                self._probe_in_flight = True
+
+    def record_success(self, latency):
+        with self._lock:
+            self._latencies.append(latency)
+            self._failures = 0
+            if self._state != CLOSED:
+                logger.info("%s: probe succeeded, circuit closed", self.name)
+            self._state = CLOSED
+            self._probe_in_flight = False
+            self._cooldown = COOLDOWN
+
+    def record_failure(self, reason=""):
+        with self._lock:
+            self._failures += 1
+            if self._state == HALF_OPEN:
+                self._cooldown = min(self._cooldown * 2, MAX_COOLDOWN)
+                self._open(f"probe failed ({reason})")
+            elif self._state == CLOSED and self._failures >= FAILURE_THRESHOLD:
+                self._open(f"{self._failures} consecutive failures ({reason})")
+
+    def release(self):
+        """
+        Ends a call without a verdict (e.g. it was cut short by the request
+        deadline, not by the provider). Frees the half-open probe slot.
+        """
+        with self._lock:
+            self._probe_in_flight = False
+
+    def _open(self, why):
+        self._state = OPEN
+        self._opened_at = time.time()
+        self._probe_in_flight = False
+        logger.warning("%s: circuit OPEN for %.0fs — %s", self.name, self._cooldown, why)
+
+    @contextmanager
+    def guard(self, is_failure=None):
+        """
+        Wraps a non-HTTP call (e.g. yt-dlp): checks the circuit, times the
+        call and records the outcome. Any exception counts as a failure,
+        unless the request's deadline or call budget ran out meanwhile (the
+        call was cut short by us, which says nothing about the provider), or
+        is_failure(e) says the provider answered and the error is about the
+        item asked for (the HTTP equivalent of a 404).
+        """
+        self.before_call()
+        started = time.monotonic()
+        try:
+            yield
+        except Exception as e:
+            if isinstance(e, (deadline.DeadlineExceeded, ledger.CallBudgetExceeded)) \
+                    or deadline.remaining(default=1) <= 0:
+                self.release()
+            elif is_failure is None or is_failure(e):
+                self.record_failure(type(e).__name__)
+            else:
+                self.record_success(time.monotonic() - started)
+            raise
+        self.record_success(time.monotonic() - started)
+
+    def snapshot(self):
+        with self._lock:
+            samples = len(self._latencies)
+            p50 = self._percentile(0.5) if samples else None
+            p95 = self._percentile(0.95) if samples else None
+            state, failures = self._state, self._failures
+        return {
+            "state": state,
+            "consecutive_failures": failures,
+            "latency_p50_ms": round(p50 * 1000) if p50 is not None else None,
+            "latency_p95_ms": round(p95 * 1000) if p95 is not None else None,
+            "samples": samples,
+            "timeout_s": round(self.timeout(), 2),
+        }
+
+
+# Fixed timeouts the engines used before become each provider's ceiling
+PROVIDERS = {
+    "itunes":      ProviderHealth("itunes", max_timeout=5),
+    "saavn":       ProviderHealth("saavn", max_timeout=10),
+    "lastfm":      ProviderHealth("lastfm", max_timeout=10),
+    "deezer":      ProviderHealth("deezer", max_timeout=6),
+    "youtube":     ProviderHealth("youtube", max_timeout=20, min_timeout=5),   # yt-dlp extraction
+    "youtube_cdn": ProviderHealth("youtube_cdn", max_timeout=15, min_timeout=3),
+}
+
+
+def get(name):
+    return PROVIDERS[name]
+
+
+def available(name):
+    return PROVIDERS[name].available()
+
+
+def snapshot():
+    return {name: health.snapshot() for name, health in PROVIDERS.items()}
@@ -0,0 +1,303 @@
+"""
+Match scoring shared by the play and preview paths.
+
+- score_saavn():      ranks Saavn search results (saavn_engine.search_saavn_enhanced)
+- fuzzy_match_ratio(): title+artist similarity for generic results (hub._find_best_match)
+- video_match_ratio(): iTunes music-video matching (metadata_engine.get_video_preview)
+
+The rules are the ones those functions always used; what changes is the
+cost. Keyword lists are compiled once into alternation regexes (a regex
+alternation matches exactly when `any(kw in text ...)` does), per-candidate
+and per-query features are computed once and memoized, and the
+SequenceMatcher similarity is memoized per string pair. SequenceMatcher
+itself is kept so scores — and therefore orderings — are unchanged.
+"""
+
+import re
+import difflib
+from functools import lru_cache
+
+
+def keyword_matcher(keywords):
+    """Compiles `keywords` into a search function: truthy iff any keyword is a substring."""
+    alternation = '|'.join(re.escape(kw) for kw in sorted(keywords, key=len, reverse=True))
+    return re.compile(alternation).search
+
+
+@lru_cache(maxsize=8192)
+def similarity(a, b):
+    """difflib ratio of a vs b (argument order matters, as in SequenceMatcher)."""
+    return difflib.SequenceMatcher(None, a, b).ratio()
+
+
+# ── Saavn ranking ─────────────────────────────────────────────────────────────
+
+# Keywords that indicate non-original tracks
+JUNK_KEYWORDS = [
+    "karaoke", "cover", "instrumental", "remix",
+    "originally performed", "tribute", "vibe2vibe",
+    "soundtrack wonder", "backing", "cover mix",
+    "jersey club", "jersey remix", "jersey mix",
+    "club mix", "club remix", "drill remix",
+    "sped up", "slowed", "lofi", "lo-fi", "nightcore"
+]
+
+# Album image CDN priority (higher priority = lower rank number)
+# Used to prefer Official Soundtracks for movie songs
+IMAGE_PRIORITY = [
+    "Spider-Man-Into-the-Spider-Verse-Soundtrack",   # rank 0 — official OST
+    "Spider-Man-Into-the-Spider-Verse-Deluxe",       # rank 1 — deluxe OST
+    "Hollywood",                                      # rank 2 — Post Malone's album
+]
+
+SAAVN_VERSION_KEYWORDS = ['remix', 'mix', 'acoustic', 'cover', 'instrumental', 'slowed', 'sped', 'lofi', 'nightcore']
+
+# Performers that only release covers / karaoke
+COVER_ARTIST_KEYWORDS = ["cover", "tribute", "karaoke", "we rabbitz", "romy wave",
+                         "robert mendoza", "lemongrass", "vibe2vibe"]
+
+_has_junk = keyword_matcher(JUNK_KEYWORDS)
+_has_saavn_version = keyword_matcher(SAAVN_VERSION_KEYWORDS)
+_has_cover_artist = keyword_matcher(COVER_ARTIST_KEYWORDS)
+_NON_WORD = re.compile(r"[^a-z0-9 ]")
+_ARTIST_SPLIT = re.compile(r'[,&]')
+_TITLE_NOISE = re.compile(r'[\-\:]')
+
+
+def is_junk(result: dict) -> bool:
+    """Returns True if the result is a cover, karaoke, remix, etc."""
+    return bool(_has_junk(result.get("title", "").lower()) or _has_junk(result.get("artist", "").lower()))
+
+
+def rank_result(result: dict) -> int:
+    """Lower score = better result. Ranks by album image URL priority."""
+    return _image_rank(result.get("image", ""))
+
+
+@lru_cache(maxsize=4096)
+def _image_rank(image):
+    for i, keyword in enumerate(IMAGE_PRIORITY):
+        if keyword in image:
+            return i
+    return len(IMAGE_PRIORITY)  # lowest priority
+
+
+@lru_cache(maxsize=8192)
+def artist_words(text):
+    """Lower-cased word set used for artist matching ('Alan Walker, Isak' -> {'alan', 'walker', 'isak'})."""
+    return frozenset(_NON_WORD.sub("", text.lower()).split())
+
+
+def artist_words_match(query_artist: str, track_artist_str: str) -> bool:
+    """
+    Word-level artist match. Returns True if ALL words of query_artist appear
+    in the full track artist string (case-insensitive). This prevents 'al'
+    from matching 'Alan Walker', while still matching 'alan walker' in
+    'alan walker, isak' correctly.
+    """
+    q_words = artist_words(query_artist)
+    return bool(q_words) and q_words <= artist_words(track_artist_str)
+
+
+@lru_cache(maxsize=64)
+def _artist_pattern(artist):
+    # Word-boundary pattern so 'al' won't strip from 'alan'
+    return re.compile(rf'\b{re.escape(artist)}\b', re.IGNORECASE)
+
+
+@lru_cache(maxsize=1024)
+def saavn_query_features(query, artist_filter=()):
+    """
+    (query_title, query_artists, wants_version, wants_cover) for a play query.
+    `artist_filter` must be a tuple (it is part of the memo key).
+    """
+    query_lower = query.lower()
+    query_artists = tuple(a.strip().lower() for a in artist_filter if a)
+
+    # Remove ALL known artist names from query to isolate the title
+    query_title = query_lower
+    for qa in query_artists:
+        query_title = _artist_pattern(qa).sub(' ', query_title)
+
+    # Clean up any leftover noise (trailing dashes, extra spaces)
+    query_title = _TITLE_NOISE.sub(' ', query_title)
+    query_title = ' '.join(query_title.split()).strip()
+
+    # Version info is read from the ORIGINAL query so brackets like
+    # [Joe Stone Remix] still count after the artist name is stripped
+    wants_version = bool(_has_saavn_version(query_lower))
+    return query_title, query_artists, wants_version, "cover" in query_lower
+
+
+@lru_cache(maxsize=4096)
+def _saavn_track_features(title, artist, image):
+    title = title.lower()
+    artist = artist.lower()
+    primary_artist = _ARTIST_SPLIT.split(artist)[0].strip()
+    return {
+        "title": title,
+        "artist_words": artist_words(artist),
+        "primary_words": artist_words(primary_artist),
+        "has_version": bool(_has_saavn_version(title)),
+        "is_junk": bool(_has_junk(title) or _has_junk(artist)),
+        "cover_artist": bool(_has_cover_artist(artist)),
+        "image_rank": _image_rank(image),
+    }
+
+
+def _saavn_score(f, query_title, query_artists, query_artist_words, wants_version, wants_cover):
+    score = 0
+
+    # ── PASS 1: Title matching ────────────────────────────
+    if f["has_version"] != wants_version:
+        score -= 50
+
+    track_title = f["title"]
+    if track_title == query_title:
+        score += 100
+    elif query_title and query_title in track_title:
+        # Partial containment — penalise proportional to extra length
+        extra_ratio = len(track_title) / max(len(query_title), 1)
+        score += max(20, int(50 / extra_ratio))
+    else:
+        score += int(similarity(query_title, track_title) * 40)
+
+    # ── PASS 2: Artist matching ───────────────────────────
+    if query_artists and query_artists[0]:
+        if query_artist_words[0] and query_artist_words[0] <= f["artist_words"]:
+            score += 50
+            # Extra boost if primary artist (first in the comma-separated list)
+            if query_artist_words[0] <= f["primary_words"]:
+                score += 50
+        else:
+            # Artist specified but not found — strong penalty
+            score -= 150
+
+    # Extra reward if ALL query artists appear in the track
+    if len(query_artists) > 1:
+        score += 20 * sum(1 for words in query_artist_words if words and words <= f["artist_words"])
+
+    # ── PASS 3: Cover / karaoke artist penalties ──────────
+    if f["cover_artist"] and not wants_cover:
+        score -= 80
+
+    # ── PASS 4: Title-based junk keywords ────────────────
+    if f["is_junk"] and not wants_version:
+        score -= 60
+
+    # ── PASS 5: Image / album priority (tie-breaker) ──────
+    score -= f["image_rank"] * 2
+    return score
+
+
+def score_saavn(candidates, query, artist_filter=None):
+    """
+    Scores all Saavn candidates against one play query.
+    Returns [{"track": candidate, "score": int}] sorted best first
+    (stable, so equal scores keep Saavn's order).
+    """
+    query_title, query_artists, wants_version, wants_cover = saavn_query_features(
+        query, tuple(artist_filter or ()))
+    query_artist_words = tuple(artist_words(qa) for qa in query_artists)
+
+    scored = []
+    for track in candidates:
+        features = _saavn_track_features(track["title"], track["artist"], track.get("image", ""))
+        score = _saavn_score(features, query_title, query_artists, query_artist_words,
+                             wants_version, wants_cover)
+        scored.append({"track": track, "score": score})
+
+    scored.sort(key=lambda x: x["score"], reverse=True)
+    return scored
+
+
+# ── Generic fuzzy matching (hub) ──────────────────────────────────────────────
+
+FUZZY_VERSION_KEYWORDS = ['remix', 'mix', 'acoustic', 'cover', 'tribute', 'version', 'edit', 'instrumental']
+FUZZY_VERSION_PENALTY = 0.15
+
+_has_fuzzy_version = keyword_matcher(FUZZY_VERSION_KEYWORDS)
+_FUZZY_ARTIST_SPLIT = re.compile(r',|&|feat\.|feat')
+
+
+@lru_cache(maxsize=8192)
+def _clean_str(s):
+    s = s.lower()
+    # Remove common junk (sequential replaces: 'featuring' loses 'feat' first, as it always has)
+    for x in ['feat.', 'feat', 'featuring', '&', ',', 'dashed']:
+        s = s.replace(x, '')
+    return ' '.join(s.split())
+
+
+def fuzzy_match_ratio(search_term, title, artist):
+    """
+    Similarity in [0, 1] between a search term and a result's title + artist.
+    Handles word reordering, long artist lists and unrequested versions.
+    """
+    search_term = search_term.lower()
+    clean_search = _clean_str(search_term)
+    clean_res = _clean_str(f"{title} {artist}".lower())
+
+    # Token Sort Ratio (Handles word reordering)
+    sorted_search = ' '.join(sorted(clean_search.split()))
+    sorted_res = ' '.join(sorted(clean_res.split()))
+
+    if sorted_search in sorted_res or sorted_res in sorted_search:
+        ratio = max(0.9, similarity(sorted_search, sorted_res))
+    else:
+        ratio = similarity(clean_search, clean_res)
+
+        # Truncated artist check: "Wolves - Marshmello, Selena Gomez, Andrew Wotman..."
+        # is compared as "Wolves - Marshmello, Selena Gomez"
+        artists = _FUZZY_ARTIST_SPLIT.split(artist)
+        if len(artists) > 1:
+            # Prefer artists that share a word with the query, otherwise the first two
+            query_words = set(search_term.split())
+            matching_artists = [a for a in artists if set(a.lower().split()) & query_words]
+            short_artist = ' '.join(matching_artists or artists[:2])
+            clean_short = _clean_str(f"{title} {short_artist}".lower())
+            ratio = max(ratio, similarity(clean_search, clean_short))
+
+    # Version preference: penalize remixes/acoustic/covers when not requested
+    if _has_fuzzy_version(title.lower()) and not _has_fuzzy_version(search_term):
+        ratio = max(0, ratio - FUZZY_VERSION_PENALTY)
+    return ratio
+
+
+# ── iTunes music-video matching (video preview) ───────────────────────────────
+
+_VIDEO_ARTIST_STOPWORDS = frozenset(['feat', 'feat.', 'featuring', 'the'])
+
+
+@lru_cache(maxsize=4096)
+def _video_features(title, artist):
+    artist_lower = artist.lower()
+    artist_tokens = tuple(w for w in artist_lower.replace('&', '').replace(',', '').split()
+                          if w not in _VIDEO_ARTIST_STOPWORDS)
+    clean_title = title.lower().split('(')[0].strip()  # Remove (Official Video) etc
+    return {
+        "string": f"{title} {artist}".lower(),
+        "artist": artist_lower,
+        "artist_tokens": artist_tokens,
+        "clean_title": clean_title,
+        "first_word": clean_title.split()[0] if clean_title else "",
+    }
+
+
+def video_match_ratio(query, title, artist):
+    """Score of an iTunes music video (title, artist) for a lower-cased query; > 0.6 is a match."""
+    f = _video_features(title, artist)
+    ratio = similarity(query, f["string"])
+
+    # STRICT ARTIST CHECK: no significant artist word in the query -> heavy penalty
+    if f["artist_tokens"] and not any(w in query for w in f["artist_tokens"]):
+        ratio -= 0.5
+
+    # STRICT TITLE CHECK: "Circles" should not match "Wolves"
+    if f["clean_title"] not in query and f["first_word"] and f["first_word"] not in query:
+        ratio -= 0.3
+
+    # Boost score if artist matches perfectly
+    if f["artist"] in query:
+        ratio += 0.1
+    return ratio
@@ -0,0 +1,220 @@
+"""
+Background refresher for home-page data.
+
+Runs as its own process (never inside a Gunicorn web worker) and rebuilds
+the payloads behind /api/category/<id>, /api/top-artists and /api/home on a
+schedule, writing them to the SnapshotStore. The API serves those routes from the
+snapshots only, so request threads never pay for a category rebuild.
+
+Jobs are staggered on startup, each run is jittered so rebuilds don't line
+up, and failed builds are retried with exponential backoff while the last
+good snapshot keeps being served.
+
+Usage:
+    python refresher.py               # run forever
+    python refresher.py --supervise   # run forever in a child, restarted when it
+                                      # crashes (spawned by gunicorn_config.py)
+    python refresher.py --once        # build every snapshot once and exit
+"""
+
+import os
+import sys
+import time
+import heapq
+import fcntl
+import random
+import signal
+import subprocess
+from dotenv import load_dotenv
+load_dotenv()
+
+import log
+from cache_manager import CACHE_DIR, SnapshotStore
+
+# ── Schedule (seconds) ─────────────────────────────────────────────────────────
+CATEGORY_INTERVAL = int(os.getenv("REFRESH_CATEGORY_INTERVAL", "1800"))
+TOP_ARTISTS_INTERVAL = int(os.getenv("REFRESH_TOP_ARTISTS_INTERVAL", "21600"))
+STARTUP_STAGGER = float(os.getenv("REFRESH_STAGGER", "5"))        # gap between first builds
+JITTER_FRACTION = float(os.getenv("REFRESH_JITTER", "0.1"))       # ±10% of the interval
+RETRY_BASE = float(os.getenv("REFRESH_RETRY_BASE", "30"))         # 30s, 60s, 120s ...
+RETRY_MAX_ATTEMPTS = int(os.getenv("REFRESH_RETRY_MAX", "4"))
+RESPAWN_DELAY = float(os.getenv("REFRESHER_RESPAWN_DELAY", "10"))  # 10s, 20s, 40s ... after a crash
+RESPAWN_MAX_DELAY = 300
+
+LOCK_PATH = os.path.join(CACHE_DIR, "refresher.lock")
+logger = log.get("refresher")
+
+
+def _valid_category(payload):
+    return bool(payload and (payload.get('songs') or payload.get('albums')))
+
+
+def _valid_artists(payload):
+    return bool(payload and payload.get('artists'))
+
+
+def _valid_home_section(payload):
+    return bool(payload and any(payload.values()))
+
+
+def _build_jobs():
+    """
+    One job per materialized payload. Builders call the undecorated engine
+    functions (`__wrapped__`) so a rebuild is never answered by smart_cache.
+    """
+    # Imported here so the --supervise process stays small
+    import metadata_engine
+    import home_feed
+
+    jobs = []
+    for category_id in metadata_engine.CATEGORY_QUERIES:
+        jobs.append({
+            "name": f"category:{category_id}",
+            "build": lambda cid=category_id: metadata_engine.get_category_songs.__wrapped__(cid),
+            "valid": _valid_category,
+            "interval": CATEGORY_INTERVAL,
+        })
+    jobs.append({
+        "name": "top_artists",
+        "build": metadata_engine.get_top_global_artists.__wrapped__,
+        "valid": _valid_artists,
+        "interval": TOP_ARTISTS_INTERVAL,
+    })
+    # Search-derived home sections (the rest of /api/home reuses the jobs above)
+    for section in home_feed.SECTIONS.values():
+        if section.get("build"):
+            jobs.append({
+                "name": section["snapshot"],
+                "build": section["build"],
+                "valid": _valid_home_section,
+                "interval": section["max_age"],
+            })
+    return jobs
+
+
+def _jittered(interval):
+    return interval * (1 + random.uniform(-JITTER_FRACTION, JITTER_FRACTION))
+
+
+def run_job(job, store):
+    """Builds one payload and writes its snapshot. Returns True on success."""
+    started = time.time()
+    try:
+        payload = job["build"]()
+    except Exception as e:
+        logger.warning("'%s' build failed: %s", job['name'], e)
+        return False
+
+    if not job["valid"](payload):
+        logger.warning("'%s' build returned no data; keeping previous snapshot", job['name'])
+        return False
+
+    if not store.write(job["name"], payload):
+        return False
+
+    logger.info("'%s' refreshed in %.1fs", job['name'], time.time() - started)
+    return True
+
+
+def _initial_schedule(jobs, store, now):
+    """
+    Jobs whose snapshot is still fresh wait for their next jittered slot;
+    missing/stale ones are built first, spaced STARTUP_STAGGER apart.
+    """
+    queue = []
+    slot = 0
+    for index, job in enumerate(jobs):
+        entry = store.read(job["name"])
+        if entry and now - entry["generated_at"] < job["interval"]:
+            due = entry["generated_at"] + _jittered(job["interval"])
+        else:
+            due = now + slot * STARTUP_STAGGER
+            slot += 1
+        heapq.heappush(queue, (due, index, 0))  # (due time, job index, failed attempts)
+    return queue
+
+
+def run_forever(jobs, store):
+    queue = _initial_schedule(jobs, store, time.time())
+    logger.info("Scheduling %d snapshot job(s)", len(jobs))
+
+    while True:
+        due, index, attempts = heapq.heappop(queue)
+        delay = due - time.time()
+        if delay > 0:
+            time.sleep(delay)
+
+        job = jobs[index]
+        if run_job(job, store):
+            heapq.heappush(queue, (time.time() + _jittered(job["interval"]), index, 0))
+        elif attempts + 1 < RETRY_MAX_ATTEMPTS:
+            backoff = min(RETRY_BASE * (2 ** attempts), job["interval"])
+            logger.info("Retrying '%s' in %.0fs (attempt %d/%d)", job['name'], backoff, attempts + 2, RETRY_MAX_ATTEMPTS)
+            heapq.heappush(queue, (time.time() + _jittered(backoff), index, attempts + 1))
+        else:
+            logger.warning("Giving up on '%s' until its next interval", job['name'])
+            heapq.heappush(queue, (time.time() + _jittered(job["interval"]), index, 0))
+
+
+def supervise():
+    """
+    Runs the refresher in a child process and restarts it after a crash,
+    with backoff while it keeps crashing. A clean exit (e.g. another
+    refresher holds the lock) ends supervision; SIGTERM stops both.
+    """
+    child = None
+
+    def stop(signum, frame):
+        if child and child.poll() is None:
+            child.terminate()
+            child.wait()
+        sys.exit(0)
+
+    signal.signal(signal.SIGTERM, stop)
+    delay = RESPAWN_DELAY
+    while True:
+        started = time.time()
+        child = subprocess.Popen([sys.executable, os.path.abspath(__file__)])
+        try:
+            code = child.wait()
+        except KeyboardInterrupt:
+            return 0
+        if code == 0:
+            return 0
+        if time.time() - started > RESPAWN_MAX_DELAY:
+            delay = RESPAWN_DELAY
+        logger.warning("Refresher exited with %s; restarting in %.0fs", code, delay)
+        time.sleep(delay)
+        delay = min(delay * 2, RESPAWN_MAX_DELAY)
+
+
+def main(argv):
+    if "--supervise" in argv:
+        return supervise()
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+
+    # Only one refresher per cache directory (e.g. several gunicorn masters on one host)
+    lock_file = open(LOCK_PATH, 'w')
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        logger.info("Another refresher holds the lock; exiting.")
+        return 0
+
+    store = SnapshotStore()
+    jobs = _build_jobs()
+
+    if "--once" in argv:
+        failed = [job["name"] for job in jobs if not run_job(job, store)]
+        return 1 if failed else 0
+
+    try:
+        run_forever(jobs, store)
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
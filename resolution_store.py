@@ -0,0 +1,125 @@
+"""
+Durable play-resolution table.
+
+Maps a track's metadata identity to the playable source that won for it,
+so a repeat /api/play is one indexed SQLite lookup instead of a Saavn
+search + decrypt + rank (or a YouTube search).
+
+Identities:
+- "itunes:<trackId>"            when the frontend sends the iTunes track id
+- "q:<search term>|<artist>"    normalized, always recorded
+
+Each row stores the source ('saavn' or 'youtube'), the Saavn song id and
+stream URL or the YouTube video id, a confidence in [0, 1] and when it was
+last verified. Rows older than RESOLUTION_TTL or below
+RESOLUTION_MIN_CONFIDENCE are ignored and re-resolved. YouTube rows expire
+after RESOLUTION_YOUTUBE_TTL instead: an unranked first search hit, often
+won only because Saavn was slow once, shouldn't pin the track for a week.
+
+The database lives in CACHE_DIR and runs in WAL mode, so every Gunicorn
+worker (and thread — one connection each) can read while another writes.
+"""
+
+import os
+import re
+import time
+import sqlite3
+import threading
+import unicodedata
+import log
+from cache_manager import CACHE_DIR
+
+DB_PATH = os.path.join(CACHE_DIR, "resolutions.db")
+RESOLUTION_TTL = int(os.getenv("RESOLUTION_TTL", str(7 * 86400)))        # re-verify weekly
+YOUTUBE_TTL = int(os.getenv("RESOLUTION_YOUTUBE_TTL", str(6 * 3600)))   # give Saavn another go
+MIN_CONFIDENCE = float(os.getenv("RESOLUTION_MIN_CONFIDENCE", "0.5"))
+logger = log.get("resolutions")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS resolutions (
+    identity    TEXT PRIMARY KEY,
+    source      TEXT NOT NULL,
+    saavn_id    TEXT,
+    url         TEXT,
+    video_id    TEXT,
+    confidence  REAL NOT NULL,
+    verified_at REAL NOT NULL
+)
+"""
+
+_local = threading.local()
+
+
+def _connect():
+    conn = getattr(_local, 'conn', None)
+    if conn is None:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        conn = sqlite3.connect(DB_PATH, timeout=5, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(_SCHEMA)
+        _local.conn = conn
+    return conn
+
+
+def normalize(text):
+    """Case/punctuation-insensitive form used in identities ('Starboy!' == 'starboy')."""
+    text = unicodedata.normalize('NFKC', text or '').casefold()
+    text = re.sub(r'[^\w\s]', ' ', text)
+    return ' '.join(text.split())
+
+
+def identities(search_term, artist=None, track_id=None):
+    """Keys a track is stored under, most specific first."""
+    keys = []
+    if track_id:
+        keys.append(f"itunes:{track_id}")
+    keys.append(f"q:{normalize(search_term)}|{normalize(artist)}")
+    return keys
+
+
+def lookup(search_term, artist=None, track_id=None):
+    """
+    Returns the stored resolution as a dict (source, saavn_id, url,
+    video_id, confidence, verified_at) or None when there is no fresh,
+    confident entry.
+    """
+    now = time.time()
+    try:
+        conn = _connect()
+        for identity in identities(search_term, artist, track_id):
+            row = conn.execute(
+                "SELECT source, saavn_id, url, video_id, confidence, verified_at "
+                "FROM resolutions WHERE identity = ?", (identity,)
+            ).fetchone()
+            if not row or row['confidence'] < MIN_CONFIDENCE:
+                continue
+            ttl = YOUTUBE_TTL if row['source'] == 'youtube' else RESOLUTION_TTL
+            if row['verified_at'] >= now - ttl:
+                return dict(row)
+    except sqlite3.Error as e:
+        logger.warning("Lookup failed: %s", e)
+    return None
+
+
+def record(search_term, artist, track_id, source, url=None, saavn_id=None, video_id=None, confidence=0.0):
+    """Stores (or re-verifies) the winning source under every identity of the track."""
+    if confidence < MIN_CONFIDENCE:
+        return False
+    now = time.time()
+    rows = [
+        (identity, source, saavn_id, url, video_id, confidence, now)
+        for identity in identities(search_term, artist, track_id)
+    ]
+    try:
+        _connect().executemany(
+            "INSERT OR REPLACE INTO resolutions "
+            "(identity, source, saavn_id, url, video_id, confidence, verified_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)", rows
+        )
+        return True
+    except sqlite3.Error as e:
+        logger.warning("Write failed: %s", e)
+        return False
+
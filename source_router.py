@@ -0,0 +1,165 @@
+"""
+Learned Saavn-vs-YouTube ordering for /api/play.
+
+hub used to try Saavn first for every track, even for query classes where
+Saavn nearly always misses (remixes, covers, Western tracks whose artist
+Saavn doesn't carry), paying a useless Saavn round trip each time.
+
+Every finished resolution leg is recorded against the query's classes:
+
+- "artist:<name>|v<0/1>"          per artist hint (+ whether a version was asked for)
+- "v<0/1>|a<0/1>|<latin/native>"  coarse: version keywords, artist hint, script
+
+Per (class, source) we keep exponentially decayed counts (ROUTE_DECAY per
+new sample, so old behaviour fades out): attempts, hits (the leg found a
+playable stream), total latency and total match score. Hits are not judged
+by confidence: YouTube's is a flat YOUTUBE_MATCH_CONFIDENCE that would
+count every YouTube result while Saavn is held to its real score. order() uses the most specific class where both sources have
+ROUTE_MIN_SAMPLES and puts first the source with the lower expected time
+to a hit:
+
+    cost(A then B) = latency(A) + (1 - hit_rate(A)) * latency(B)
+
+Saavn stays first on ties and whenever stats are thin. With probability
+ROUTE_EXPLORE the default order is used anyway so Saavn keeps being
+sampled in classes that have been routed to YouTube.
+"""
+
+import os
+import time
+import random
+import sqlite3
+import threading
+import ranking
+import resolution_store
+import log
+from cache_manager import CACHE_DIR
+
+DB_PATH = os.path.join(CACHE_DIR, "routing.db")
+ROUTING_ENABLED = os.getenv("SOURCE_ROUTING", "true").lower() == "true"
+EXPLORE = float(os.getenv("ROUTE_EXPLORE", "0.1"))
+MIN_SAMPLES = float(os.getenv("ROUTE_MIN_SAMPLES", "10"))
+DECAY = float(os.getenv("ROUTE_DECAY", "0.98"))
+
+SOURCES = ("saavn", "youtube")
+DEFAULT_ORDER = SOURCES
+logger = log.get("router")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS route_stats (
+    query_class TEXT NOT NULL,
+    source      TEXT NOT NULL,
+    attempts    REAL NOT NULL,
+    hits        REAL NOT NULL,
+    latency     REAL NOT NULL,
+    score       REAL NOT NULL,
+    updated_at  REAL NOT NULL,
+    PRIMARY KEY (query_class, source)
+)
+"""
+
+_local = threading.local()
+
+
+def _connect():
+    conn = getattr(_local, 'conn', None)
+    if conn is None:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        conn = sqlite3.connect(DB_PATH, timeout=5, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(_SCHEMA)
+        _local.conn = conn
+    return conn
+
+
+def _script(text):
+    """'latin' for Latin-script queries, 'native' for Devanagari, Tamil, etc."""
+    return "latin" if all(ord(c) < 0x250 for c in text if c.isalpha()) else "native"
+
+
+def query_classes(search_term, artist=None):
+    """Classes a play query is counted under, most specific first."""
+    wants_version = ranking.saavn_query_features(search_term)[2]
+    coarse = f"v{int(wants_version)}|a{int(bool(artist))}|{_script(search_term)}"
+    if artist and resolution_store.normalize(artist):
+        return [f"artist:{resolution_store.normalize(artist)}|v{int(wants_version)}", coarse]
+    return [coarse]
+
+
+def _load(classes):
+    rows = _connect().execute(
+        f"SELECT * FROM route_stats WHERE query_class IN ({','.join('?' * len(classes))})", classes
+    ).fetchall()
+    stats = {}
+    for row in rows:
+        stats.setdefault(row['query_class'], {})[row['source']] = dict(row)
+    return stats
+
+
+def _cost(first, second):
+    hit_rate = (first['hits'] + 1) / (first['attempts'] + 2)
+    return first['latency'] / first['attempts'] + (1 - hit_rate) * second['latency'] / second['attempts']
+
+
+def order(search_term, artist=None):
+    """
+    (first, second) source order for a play query, plus the class that
+    decided it (None when the default order is used).
+    """
+    if not ROUTING_ENABLED or random.random() < EXPLORE:
+        return DEFAULT_ORDER, None
+    classes = query_classes(search_term, artist)
+    try:
+        stats = _load(classes)
+    except sqlite3.Error as e:
+        logger.warning("Stats lookup failed: %s", e)
+        return DEFAULT_ORDER, None
+
+    for query_class in classes:
+        by_source = stats.get(query_class, {})
+        if all(by_source.get(s, {}).get('attempts', 0) >= MIN_SAMPLES for s in SOURCES):
+            saavn, youtube = by_source['saavn'], by_source['youtube']
+            if _cost(youtube, saavn) < _cost(saavn, youtube):
+                return ("youtube", "saavn"), query_class
+            return DEFAULT_ORDER, query_class
+    return DEFAULT_ORDER, None
+
+
+def record(search_term, artist, source, result, latency):
+    """Counts one finished leg: `result` is the leg's resolution dict or None."""
+    hit = bool(result)
+    score = result['confidence'] if result else 0.0
+    now = time.time()
+    rows = [
+        (query_class, source, float(hit), latency, score, now, DECAY)
+        for query_class in query_classes(search_term, artist)
+    ]
+    try:
+        _connect().executemany(
+            "INSERT INTO route_stats (query_class, source, attempts, hits, latency, score, updated_at) "
+            "VALUES (?1, ?2, 1, ?3, ?4, ?5, ?6) "
+            "ON CONFLICT (query_class, source) DO UPDATE SET "
+            "attempts = attempts * ?7 + 1, hits = hits * ?7 + ?3, "
+            "latency = latency * ?7 + ?4, score = score * ?7 + ?5, updated_at = ?6", rows
+        )
+    except sqlite3.Error as e:
+        logger.warning("Stats write failed: %s", e)
+
+
+def snapshot(limit=50):
+    """Most recently updated classes with hit rate / mean latency / mean score per source."""
+    rows = _connect().execute(
+        "SELECT * FROM route_stats ORDER BY updated_at DESC LIMIT ?", (limit,)
+    ).fetchall()
+    out = {}
+    for row in rows:
+        attempts = row['attempts']
+        out.setdefault(row['query_class'], {})[row['source']] = {
+            "samples": round(attempts, 1),
+            "hit_rate": round(row['hits'] / attempts, 3),
+            "latency_ms": round(row['latency'] / attempts * 1000),
+            "match_score": round(row['score'] / attempts, 3),
+        }
+    return out
@@ -0,0 +1,213 @@
+"""
+Lightweight per-request tracing.
+
+api.py starts a trace for a sampled share of API requests (TRACE_SAMPLE_RATE,
+or any request an admin sends with `X-Trace: 1`). Pipeline stages and
+upstream calls open spans:
+
+    with tracing.span("saavn.search", query=q) as s:
+        ...
+        s.set(results=len(results))
+
+Spans nest through a contextvar (the hub hedge/batch pools copy the
+caller's context, so legs show up under the request). Outside a sampled
+request span() is a no-op, so instrumented code costs a contextvar lookup.
+
+Finished traces are written to TRACE_DIR as JSON (shared by all Gunicorn
+workers, newest TRACE_KEEP kept) and served by /api/trace/<id> as a
+waterfall. The response of a traced request carries `X-Trace-Id`.
+"""
+
+import os
+import json
+import time
+import uuid
+import random
+import threading
+import contextvars
+from contextlib import contextmanager
+import log  # log imports tracing too: only call log.get() at run time
+
+TRACE_DIR = os.path.join("cache", "traces")   # under cache_manager.CACHE_DIR
+SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0.01"))
+TRACE_KEEP = int(os.getenv("TRACE_KEEP", "500"))
+MAX_SPANS = 2000        # per trace; a runaway batch stops recording past this
+
+_trace = contextvars.ContextVar("trace", default=None)
+_parent = contextvars.ContextVar("trace_parent", default=None)
+_writes = 0
+_writes_lock = threading.Lock()
+
+
+class Trace:
+    def __init__(self, name, attrs):
+        self.id = uuid.uuid4().hex[:16]
+        self.name = name
+        self.attrs = attrs
+        self.started_at = time.time()
+        self.t0 = time.perf_counter()
+        self.duration = None
+        self.spans = []       # list.append is atomic; legs append from pool threads
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "name": self.name,
+            "attrs": self.attrs,
+            "started_at": self.started_at,
+            "duration_ms": round(self.duration * 1000, 1) if self.duration is not None else None,
+            "spans": sorted(self.spans, key=lambda s: s["start_ms"]),
+        }
+
+
+class Span:
+    __slots__ = ("record",)
+
+    def __init__(self, record):
+        self.record = record
+
+    def set(self, **attrs):
+        self.record["attrs"].update(attrs)
+
+
+class _NoopSpan:
+    def set(self, **attrs):
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+def sampled(force=False):
+    return force or random.random() < SAMPLE_RATE
+
+
+def start(name, **attrs):
+    """Makes a new trace current and returns it (None-safe: see finish)."""
+    trace = Trace(name, attrs)
+    _trace.set(trace)
+    _parent.set(None)
+    return trace
+
+
+def current():
+    return _trace.get()
+
+
+def finish():
+    """Ends the current trace, if any, and writes it out."""
+    trace = _trace.get()
+    if trace is None:
+        return None
+    _trace.set(None)
+    _parent.set(None)
+    trace.duration = time.perf_counter() - trace.t0
+    _write(trace)
+    return trace
+
+
+@contextmanager
+def span(name, **attrs):
+    trace = _trace.get()
+    if trace is None or len(trace.spans) >= MAX_SPANS:
+        yield _NOOP
+        return
+
+    record = {
+        "id": uuid.uuid4().hex[:8],
+        "parent": _parent.get(),
+        "name": name,
+        "thread": threading.current_thread().name,
+        "start_ms": round((time.perf_counter() - trace.t0) * 1000, 2),
+        "duration_ms": None,
+        "attrs": attrs,
+    }
+    trace.spans.append(record)
+    token = _parent.set(record["id"])
+    started = time.perf_counter()
+    try:
+        yield Span(record)
+    except BaseException as e:
+        record["error"] = type(e).__name__
+        raise
+    finally:
+        record["duration_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        _parent.reset(token)
+
+
+# ── Storage ───────────────────────────────────────────────────
+
+def _path(trace_id):
+    return os.path.join(TRACE_DIR, f"{trace_id}.json")
+
+
+def _write(trace):
+    global _writes
+    try:
+        os.makedirs(TRACE_DIR, exist_ok=True)
+        tmp_path = _path(trace.id) + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(trace.to_dict(), f, default=str)
+        os.replace(tmp_path, _path(trace.id))
+    except OSError as e:
+        log.get("trace").warning("Write failed: %s", e)
+        return
+    with _writes_lock:
+        _writes += 1
+        prune = _writes % 50 == 0
+    if prune:
+        _prune()
+
+
+def _prune():
+    try:
+        entries = sorted(os.scandir(TRACE_DIR), key=lambda e: e.stat().st_mtime, reverse=True)
+        for entry in entries[TRACE_KEEP:]:
+            os.remove(entry.path)
+    except OSError as e:
+        log.get("trace").warning("Prune failed: %s", e)
+
+
+def load(trace_id):
+    """The stored trace dict, or None."""
+    if not trace_id.isalnum():
+        return None
+    try:
+        with open(_path(trace_id), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+
+def recent(limit=50):
+    """[{id, name, started_at, duration_ms}] for the newest stored traces."""
+    try:
+        entries = sorted(
+            (e for e in os.scandir(TRACE_DIR) if e.name.endswith(".json")),
+            key=lambda e: e.stat().st_mtime, reverse=True
+        )[:limit]
+    except OSError:
+        return []
+    out = []
+    for entry in entries:
+        trace = load(entry.name[:-5])
+        if trace:
+            out.append({k: trace[k] for k in ("id", "name", "started_at", "duration_ms")})
+    return out
+
+
+def waterfall(trace, width=50):
+    """Plain-text waterfall: one line per span, indented by depth, bar on the request timeline."""
+    total = trace["duration_ms"] or max((s["start_ms"] + (s["duration_ms"] or 0) for s in trace["spans"]), default=1)
+    depth = {None: -1}
+    lines = [f"{trace['name']}  {trace['duration_ms']} ms  (trace {trace['id']})"]
+    for s in trace["spans"]:
+        depth[s["id"]] = depth.get(s["parent"], -1) + 1
+        duration = s["duration_ms"] or 0
+        offset = int(s["start_ms"] / total * width)
+        bar = "█" * max(1, int(duration / total * width))
+        attrs = " ".join(f"{k}={v}" for k, v in s["attrs"].items())
+        error = f" !{s['error']}" if s.get("error") else ""
+        label = ("  " * depth[s["id"]] + s["name"])[:40]
+        lines.append(f"{label:40s} |{' ' * offset}{bar:{width - offset}s}| {duration:8.1f} ms {attrs}{error}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,89 @@
+"""
+Single entry point for outbound HTTP calls to music providers.
+
+    resp = upstream.get("itunes", url, params=params)
+
+Consults provider_health: fails fast with ProviderUnavailable (a
+RequestException, so existing `except RequestException` fallbacks apply)
+while the provider's circuit is open, applies the provider's adaptive
+timeout unless the caller passes one, and records latency/failures.
+Timeouts, connection errors, 5xx and 429 count as failures; other 4xx
+mean the provider is up.
+
+Inside a request deadline (deadline.scope) the timeout is also capped to
+the remaining budget, and the call is skipped with DeadlineExceeded when
+less than the provider's typical latency is left. A call that times out
+only because of that cap is not held against the provider.
+
+A streamed relay (stream=True) gets a (connect, read) timeout instead: the
+adaptive, deadline-capped value for the connect, and a fixed
+STREAM_READ_TIMEOUT for the headers and for every chunk after them.
+
+Every call is a tracing span (provider, endpoint, timeout, status, bytes)
+and is counted in the provider's latency histogram / error counters
+(metrics.py); calls skipped by the circuit or the deadline count as errors.
+Each call is charged to the request's outbound call budget (ledger.py)
+before anything else. With CASSETTE_MODE set, the HTTP itself is recorded
+or replayed by cassette.py.
+"""
+
+import os
+import time
+from urllib.parse import urlsplit
+import requests
+import cassette
+import deadline
+import tracing
+import ledger
+import metrics
+import provider_health
+from provider_health import ProviderUnavailable  # noqa: F401 (re-exported for callers)
+
+# Longest wait for the next bytes of a streamed relay; a CDN pause shorter
+# than this must not cut off a listener's audio
+STREAM_READ_TIMEOUT = max(float(os.getenv("STREAM_READ_TIMEOUT", "30")), 15)
+
+
+def _is_failure(status_code):
+    return status_code >= 500 or status_code == 429
+
+
+def _endpoint(url):
+    parts = urlsplit(url)
+    return f"{parts.netloc}{parts.path}"
+
+
+def get(provider, url, **kwargs):
+    with tracing.span(f"http {provider}", endpoint=_endpoint(url)) as span:
+        health = provider_health.get(provider)
+        with metrics.upstream_call(provider, _endpoint(url)) as call:
+            ledger.charge(provider)
+            deadline.check(provider, needed=health.typical_latency())
+            health.before_call()
+            timeout = kwargs.get("timeout", health.timeout())
+            connect_timeout = deadline.cap(timeout)
+            capped = connect_timeout < timeout
+            if kwargs.get("stream") and "timeout" not in kwargs:
+                kwargs["timeout"] = (connect_timeout, STREAM_READ_TIMEOUT)
+            else:
+                kwargs["timeout"] = connect_timeout
+            span.set(timeout=round(connect_timeout, 2))
+
+            started = time.monotonic()
+            try:
+                resp = cassette.get(provider, url, **kwargs)
+            except Exception as e:
+                if capped and isinstance(e, requests.exceptions.Timeout):
+                    health.release()
+                    raise deadline.exceeded(f"{provider}: request deadline reached") from e
+                health.record_failure(type(e).__name__)
+                raise
+            if _is_failure(resp.status_code):
+                health.record_failure(f"HTTP {resp.status_code}")
+                call.fail(f"http_{resp.status_code}")
+            else:
+                # For stream=True this is time-to-headers, which is what the timeout bounds
+                health.record_success(time.monotonic() - started)
+        span.set(status=resp.status_code,
+                 bytes=resp.headers.get("Content-Length") if kwargs.get("stream") else len(resp.content))
+        return resp
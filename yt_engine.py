@@ -4,6 +4,25 @@ import os
 import json
 import tempfile
 from cache_manager import smart_cache
+import provider_health
+import deadline
+import tracing
+import log
+import ledger
+import metrics
+import cassette
+from provider_health import ProviderUnavailable
+from yt_dlp.networking.exceptions import HTTPError, TransportError
+
+# Every yt-dlp call runs under the "youtube" circuit breaker
+_youtube = provider_health.get("youtube")
+logger = log.get("youtube")
+
+FORMAT_FALLBACKS = [
+    'bestaudio/best',
+    'audio/best',
+    'best',
+]
 
 def _get_ydl_opts():
     """Build yt-dlp options with optional cookie support from env var"""
@@ -42,41 +61,140 @@ def _get_ydl_opts():
             with tempfile.NamedTemporaryFile(mode='w', suffix='.txt', delete=False) as f:
                 f.write(netscape_content)
                 opts['cookiefile'] = f.name
-                print(f"   [YouTube] Using cookies from environment variable (JSON format)")
+                logger.info("Using cookies from environment variable (JSON format)")
         except json.JSONDecodeError:
             # Not JSON, treat as Netscape format
             with tempfile.NamedTemporaryFile(mode='w', suffix='.txt', delete=False) as f:
                 f.write(cookies_content)
                 opts['cookiefile'] = f.name
-                print(f"   [YouTube] Using cookies from environment variable (Netscape format)")
+                logger.info("Using cookies from environment variable (Netscape format)")
     
     return opts
 
 # Get base options (will include cookies if available)
 YDL_OPTS_BASE = _get_ydl_opts()
 
+def _extract_info(target, opts):
+    """
+    ydl.extract_info(); recorded/replayed in cassette mode (keyed by target
+    and format). Errors are raised rather than ignored, so _is_failure can
+    tell a network failure from a bad video.
+    """
+    def extract():
+        with yt_dlp.YoutubeDL({**opts, 'ignoreerrors': False}) as ydl:
+            return ydl.extract_info(target, download=False)
+    return cassette.call("youtube", [target, opts.get('format'), bool(opts.get('extract_flat'))], extract)
+
+def _is_failure(error):
+    """
+    True when a yt-dlp error means YouTube itself is failing: a network
+    error, a timeout or HTTP 5xx/429 anywhere in its causes, as
+    upstream._is_failure for HTTP. Per-video errors (unavailable,
+    age-gated, no playable format) leave the circuit alone.
+    """
+    for _ in range(10):
+        if error is None:
+            break
+        if isinstance(error, HTTPError):
+            return error.status >= 500 or error.status == 429
+        if isinstance(error, (TransportError, TimeoutError, ConnectionError)):
+            return True
+        # DownloadError/ExtractorError keep the original exception in exc_info or cause
+        exc_info = getattr(error, 'exc_info', None)
+        error = ((exc_info[1] if exc_info else None) or getattr(error, 'cause', None)
+                 or error.__cause__ or error.__context__)
+    return False
+
+def _socket_timeout():
+    """
+    The adaptive timeout, capped to the request's remaining budget. Raises
+    DeadlineExceeded when less than a typical extraction's worth is left,
+    CallBudgetExceeded when the request may make no more outbound calls.
+    """
+    ledger.charge("youtube")
+    deadline.check("youtube", needed=_youtube.typical_latency())
+    return deadline.cap(_youtube.timeout())
+
+def _extract(target, opts):
+    """
+    ydl.extract_info() under the circuit breaker, using the provider's
+    adaptive timeout as socket timeout. A None result is raised as a
+    DownloadError, which counts against the video, not the provider.
+    """
+    with metrics.upstream_call("youtube", "yt-dlp extract"):
+        timeout = _socket_timeout()
+        with tracing.span("yt-dlp extract", target=target[:80], timeout=round(timeout, 2)), \
+                _youtube.guard(_is_failure):
+            info = _extract_info(target, {**opts, 'socket_timeout': timeout})
+            if info is None:
+                raise yt_dlp.utils.DownloadError(f"No info returned for {target}")
+    return info
+
+def _extract_url(target, pick, formats=FORMAT_FALLBACKS):
+    """
+    Tries `formats` in order and returns pick(info) for the first one that
+    yields a URL, or None. The whole attempt is one call for the circuit
+    breaker: it only counts as a failure when no format works and the last
+    error was YouTube's, not the video's (see _is_failure). Formats that no
+    longer fit in the request's deadline are skipped.
+    """
+    try:
+        with _youtube.guard(_is_failure):
+            last_error = None
+            for fmt in formats:
+                timeout = _socket_timeout()
+                with tracing.span("yt-dlp resolve", target=target[:80], format=fmt, timeout=round(timeout, 2)) as span, \
+                        metrics.upstream_call("youtube", "yt-dlp resolve") as call:
+                    try:
+                        opts = {
+                            **YDL_OPTS_BASE,
+                            'format': fmt,
+                            'noplaylist': True,
+                            'socket_timeout': timeout,
+                        }
+                        info = _extract_info(target, opts)
+                        url = pick(info) if info else None
+                        if url:
+                            return url
+                        span.set(result="no url")
+                        call.fail("no_url")
+                    except Exception as e:
+                        last_error = e
+                        span.set(result=type(e).__name__)
+                        call.fail(metrics.error_kind(e))
+                        logger.debug("Format '%s' failed: %s", fmt, e)
+            raise yt_dlp.utils.DownloadError(f"No playable format for {target}") from last_error
+    except (ProviderUnavailable, deadline.DeadlineExceeded, ledger.CallBudgetExceeded) as e:
+        metrics.inc("volt_upstream_errors_total", provider="youtube", kind=metrics.error_kind(e))
+        logger.warning("Skipped: %s", e)
+    except yt_dlp.utils.DownloadError:
+        pass
+    return None
+
+def _first_entry_url(info):
+    entries = info.get('entries') or []
+    return entries[0].get('url') if entries and entries[0] else None
+
 def smart_autocorrect(query):
     """Uses YouTube search to find the correct title (best effort)."""
     try:
-        print(f"   [YouTube] Autocorrecting '{query}'...")
+        logger.debug("Autocorrecting '%s'...", query)
         opts = {**YDL_OPTS_BASE, 'extract_flat': True}
-        with yt_dlp.YoutubeDL(opts) as ydl:
-            info = ydl.extract_info(f"ytsearch1:{query}", download=False)
-            if 'entries' in info and info['entries']:
-                title = info['entries'][0]['title']
-                clean = re.sub(r'\(.*?Lyrics.*?\)|\[.*?Video.*?\]|\(Official.*?\)', '', title, flags=re.IGNORECASE).strip()
-                print(f"   [YouTube] Fixed -> '{clean}'")
-                return clean
+        info = _extract(f"ytsearch1:{query}", opts)
+        if 'entries' in info and info['entries']:
+            title = info['entries'][0]['title']
+            clean = re.sub(r'\(.*?Lyrics.*?\)|\[.*?Video.*?\]|\(Official.*?\)', '', title, flags=re.IGNORECASE).strip()
+            logger.debug("Fixed -> '%s'", clean)
+            return clean
     except: pass
     return query
 
 def search_youtube(query):
     """Returns a list of YouTube videos (Fallback)"""
-    print(f"   [YouTube] Searching for: '{query}'")
+    logger.debug("Searching for: '%s'", query)
     try:
         opts = {**YDL_OPTS_BASE, 'extract_flat': True}
-        with yt_dlp.YoutubeDL(opts) as ydl:
-            info = ydl.extract_info(f"ytsearch5:{query}", download=False)
+        info = _extract(f"ytsearch5:{query}", opts)
             
         if not info or 'entries' not in info: 
             return []
@@ -85,6 +203,7 @@ def search_youtube(query):
         for vid in info['entries']:
             if vid:  # Make sure vid is not None
                 songs.append({
+                    "id": vid.get('id'),
                     "title": vid.get('title'),
                     "artist": vid.get('uploader'),
                     "image": f"https://img.youtube.com/vi/{vid.get('id')}/hqdefault.jpg",
@@ -94,88 +213,43 @@ def search_youtube(query):
                 })
         return songs
     except Exception as e:
-        print(f"   [YouTube] Search failed: {e}")
+        logger.warning("Search failed: %s", e)
         return []
 
 def resolve_yt_stream(watch_url):
     """Resolves a Watch URL to a temporary audio stream URL using yt-dlp"""
-    format_fallbacks = [
-        'bestaudio/best',
-        'audio/best',
-        'best',
-    ]
-    
-    for fmt in format_fallbacks:
-        try:
-            opts = {
-                **YDL_OPTS_BASE, 
-                'format': fmt,
-                'noplaylist': True
-            }
-            with yt_dlp.YoutubeDL(opts) as ydl:
-                info = ydl.extract_info(watch_url, download=False)
-                if info:
-                    url = info.get('url')
-                    if url:
-                        return url
-        except Exception as e:
-            print(f"   [YouTube] Format '{fmt}' failed: {e}")
-            continue
-    
-    print(f"   [YouTube] Stream resolution failed for: {watch_url}")
-    return None
+    url = _extract_url(watch_url, lambda info: info.get('url'))
+    if not url:
+        logger.warning("Stream resolution failed for: %s", watch_url)
+    return url
 
+@smart_cache(ttl=600, validator=lambda x: x is not None)
+def get_stream_by_id(video_id):
+    """
+    Resolves a known video id (from the play resolution table) to a fresh
+    audio stream URL, skipping the ytsearch step.
+    """
+    logger.debug("Resolving video id: '%s'", video_id)
+    return resolve_yt_stream(f"https://www.youtube.com/watch?v={video_id}")
+
 @smart_cache(ttl=600, validator=lambda x: x is not None)
 def get_audio_link(search_term):
     """
     SINGLE-CALL Optimized search + resolve.
     """
-    print(f"   [YouTube] Speed-matching: '{search_term}'")
-    
-    format_fallbacks = [
-        'bestaudio/best',
-        'audio/best',
-        'best',
-    ]
-    
-    for fmt in format_fallbacks:
-        try:
-            opts = {
-                **YDL_OPTS_BASE,
-                'format': fmt,
-                'noplaylist': True,
-            }
-            with yt_dlp.YoutubeDL(opts) as ydl:
-                info = ydl.extract_info(f"ytsearch1:{search_term}", download=False)
-                
-            if info and 'entries' in info and info['entries']:
-                url = info['entries'][0].get('url')
-                if url:
-                    return url
-        except Exception as e:
-            print(f"   [YouTube] Format '{fmt}' failed: {e}")
-            continue
-            
-    return None
+    logger.debug("Speed-matching: '%s'", search_term)
+    return _extract_url(f"ytsearch1:{search_term}", _first_entry_url)
 
 @smart_cache(ttl=7200, validator=lambda x: x is not None)
 def get_video_url(search_term):
     """
     Finds a video stream URL (MP4) for background playback.
     """
-    print(f"   [YouTube] Fetching Video: '{search_term}'")
-    try:
-        opts = {
-            **YDL_OPTS_BASE,
-            'format': 'bestvideo[ext=mp4]/bestvideo[ext=webm]/best[ext=mp4]/best',
-            'noplaylist': True,
-        }
-        with yt_dlp.YoutubeDL(opts) as ydl:
-            info = ydl.extract_info(f"ytsearch1:{search_term}", download=False)
-            
-        if info and 'entries' in info and info['entries']:
-            return info['entries'][0].get('url')
-    except Exception as e:
-        print(f"   [YouTube] Video URL extraction failed: {e}")
-        
-    return None
\ No newline at end of file
+    logger.debug("Fetching Video: '%s'", search_term)
+    url = _extract_url(
+        f"ytsearch1:{search_term}", _first_entry_url,
+        formats=['bestvideo[ext=mp4]/bestvideo[ext=webm]/best[ext=mp4]/best']
+    )
+    if not url:
+        logger.warning("Video URL extraction failed for: '%s'", search_term)
+    return url
\ No newline at end of file